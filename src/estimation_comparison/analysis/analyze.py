@@ -17,15 +17,14 @@ import logging
 from dataclasses import dataclass
 from pathlib import Path
 from timeit import default_timer
-from typing import List
+from typing import List, Optional
 
 import pandas as pd
-import sklearn
-from sklearn.linear_model import LinearRegression
-from sklearn.model_selection import cross_validate
-from sklearn.pipeline import make_pipeline
-from sklearn.preprocessing import PolynomialFeatures
 
+from estimation_comparison.analysis.features import FeatureMatrixCache
+from estimation_comparison.analysis.fit import series_fit
+from estimation_comparison.analysis.kfold import drop_short_series, kfold_scores_parallel, split_series
+from estimation_comparison.analysis.screening import screen_correlations, top_configs
 from estimation_comparison.database import BenchmarkDatabase
 
 
@@ -43,43 +42,33 @@ class Fit:
 
 
 class Analyze:
-    def __init__(self, input_dir: str, output_dir: str):
+    def __init__(self, input_dir: str, output_dir: str, jobs: Optional[int] = None, top: Optional[int] = None):
         self._init_time = default_timer()
         self.input_dir = input_dir
         self.output_dir = output_dir
-        self.database = BenchmarkDatabase(Path(self.input_dir) / "benchmark.sqlite")
+        self.jobs = jobs
+        self.top = top
+        self.database = BenchmarkDatabase(Path(self.input_dir) / "benchmark.sqlite", read_only=True)
 
     def run(self):
-        linear_results: List[Fit] = []
-        quad_results = []
-
         combinations = self.database.get_combinations()
+        if self.top is not None:
+            cache = FeatureMatrixCache(Path(self.output_dir) / "feature_cache")
+            combinations = top_configs(screen_correlations(self.database, cache), self.top)
+            logging.info(f"Cross-validating the {len(combinations)} best correlated configs")
         compressor_names = [c[1] for c in self.database.get_compressors()]
 
-        linear_pipeline = make_pipeline(LinearRegression())
-        quad_pipeline = make_pipeline(PolynomialFeatures(2), LinearRegression())
-
-        for (preprocessor_name, estimator_name, block_summary_func_name, file_summary_func_name) in combinations:
-            for compressor_name in compressor_names:
-                desc, rec = self.database.get_solo_plot_dataframe(preprocessor_name, estimator_name,
-                                                                  compressor_name,
-                                                                  block_summary_func_name,
-                                                                  file_summary_func_name)
-                data = pd.DataFrame.from_records(rec, columns=[item[0] for item in desc])
-                data["percent_size_reduction"] = (1.0 - (data["final_size"] / data["initial_size"])) * 100.0
-
-                kfold = sklearn.model_selection.KFold(n_splits=10, shuffle=True, random_state=1337)
-                scoring = ["r2", "neg_mean_squared_error"]
-                linear_scores = cross_validate(linear_pipeline, data[["metric"]], data["percent_size_reduction"],
-                                               cv=kfold, scoring=scoring)
-                quad_scores = cross_validate(quad_pipeline, data[["metric"]], data["percent_size_reduction"], cv=kfold,
-                                             scoring=scoring)
-                linear_results.append(
-                    Fit(preprocessor_name, estimator_name, block_summary_func_name, file_summary_func_name,
-                        compressor_name, linear_scores))
-                quad_results.append(
-                    Fit(preprocessor_name, estimator_name, block_summary_func_name, file_summary_func_name,
-                        compressor_name, quad_scores))
+        series = [(preprocessor_name, estimator_name, block_summary_func_name, file_summary_func_name, compressor_name)
+                  for (preprocessor_name, estimator_name, block_summary_func_name, file_summary_func_name)
+                  in combinations for compressor_name in compressor_names]
+        names, points = drop_short_series(
+            series, split_series(self.database.get_series_points(series, columnar=True), len(series)))
+
+        # Same KFold(n_splits=10, shuffle=True, random_state=1337) splits as the former per-series cross_validate
+        linear_results: List[Fit] = [Fit(*n, {"test_r2": s.r2, "test_neg_mean_squared_error": -s.mse})
+                                     for n, s in zip(names, kfold_scores_parallel(points, 1, jobs=self.jobs))]
+        quad_results: List[Fit] = [Fit(*n, {"test_r2": s.r2, "test_neg_mean_squared_error": -s.mse})
+                                   for n, s in zip(names, kfold_scores_parallel(points, 2, jobs=self.jobs))]
 
         print("=== Linear Fit ===")
         for x in linear_results:
@@ -89,6 +78,21 @@ class Analyze:
         for x in quad_results:
             print(x)
 
+    def run_in_sample(self):
+        """In-sample linear and quadratic fits of every series, served from the series statistics table"""
+        stats = self.database.get_all_series_statistics(columnar=True).to_pandas()
+        series = ["preprocessor", "estimator", "block_summary_func", "file_summary_func", "compressor"]
+        sums = stats.columns[len(series):]
+
+        fits = stats[series].copy()
+        for degree, label in [(1, "linear"), (2, "quadratic")]:
+            results = [series_fit(*row, degree=degree) for row in stats[sums].itertuples(index=False)]
+            fits[f"{label} r2"] = [r.r2 for r in results]
+            fits[f"{label} rmse"] = [r.rmse for r in results]
+
+        with pd.option_context("display.max_rows", None, "display.width", None):
+            print(fits.sort_values("linear rmse"))
+
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
@@ -97,10 +101,19 @@ if __name__ == "__main__":
                         help="directory to load benchmark data from")
     parser.add_argument("-o", "--output_dir", type=Path, dest="output_dir", default="./analysis",
                         help="analysis output directory")
+    parser.add_argument("-j", "--jobs", type=int, dest="jobs", default=None,
+                        help="worker processes for cross-validation, all cores by default")
+    parser.add_argument("-k", "--top", type=int, dest="top", default=None,
+                        help="only cross-validate the k configs best correlated with a compressor")
+    parser.add_argument("-s", "--in-sample", dest="in_sample", action="store_true",
+                        help="print in-sample fits from the stored series statistics instead of cross-validating")
     args = parser.parse_args()
 
     logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO)
 
-    analyze = Analyze(args.input_dir, args.output_dir)
+    analyze = Analyze(args.input_dir, args.output_dir, args.jobs, args.top)
 
-    analyze.run()
+    if args.in_sample:
+        analyze.run_in_sample()
+    else:
+        analyze.run()
@@ -12,20 +12,23 @@
 #
 #  You should have received a copy of the GNU General Public License
 #  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import asyncio
+from dataclasses import dataclass, field
 from pathlib import Path
+from typing import Dict, List, Tuple
 
 import colorcet as cc
 import pandas as pd
 import panel as pn
 import param
-from bokeh.models import ColumnDataSource, Band, Range1d
+from bokeh.models import ColumnDataSource, Band, GlyphRenderer, Legend, LegendItem, Range1d
 from bokeh.plotting import figure
 
-from estimation_comparison.analysis.fit import quadratic_fit, linear_fit
+from estimation_comparison.analysis.panel_data import load_series, run
 from estimation_comparison.analysis.panel_model import Series
 from estimation_comparison.database import BenchmarkDatabase
 
-db = BenchmarkDatabase(Path("benchmarks/benchmark.sqlite"))
+db = BenchmarkDatabase(Path("benchmarks/benchmark.sqlite"), read_only=True)
 
 
 class SeriesPlots(pn.viewable.Viewer):
@@ -75,60 +78,111 @@ class SeriesInput(pn.viewable.Viewer):
         return plot_controls
 
 
+_fit_prefixes = {"lin": "lin_fit_show", "quad": "quad_fit_show"}
+
+
+@dataclass
+class _SeriesGlyphs:
+    """Renderers of one plotted series, kept while the series stays in the list"""
+    key: tuple  # get_solo_plot_dataframe arguments
+    revision: int
+    index: pd.Index  # Row order of the source
+    source: ColumnDataSource
+    scatter: GlyphRenderer
+    legend_item: LegendItem
+    fits: Dict[str, Tuple[GlyphRenderer, Band]] = field(default_factory=dict)
+
+
+def _series_key(series: Series) -> tuple:
+    return series.preprocessor, series.estimator, series.compressor, series.block_summary_fn, series.file_summary_fn
+
+
 class PlotEditor(pn.viewable.Viewer):
+    """One figure for the whole session. Edits of the series list only add, remove or patch the renderers and data
+    sources of the series that changed, so the browser is sent the change instead of every series again."""
     value: SeriesPlots = param.ClassSelector(class_=SeriesPlots)
 
-    @param.depends("value.value")
-    def _layout(self):
-        series = self.value.value
-        return self._plot(series)
-
-    @staticmethod
-    def _plot(series):
-        fig = figure(x_range=Range1d(0, 100), width=800, height=600, x_axis_label="Percent Size Reduction",
-                     y_axis_label="Estimator Metric")
-
-        for index, s in enumerate(series):
-            desc, rec = db.get_solo_plot_dataframe(s.preprocessor, s.estimator, s.compressor, s.block_summary_fn,
-                                                   s.file_summary_fn)
-
-            data = pd.DataFrame.from_records(rec, columns=[item[0] for item in desc])
-
-            data["percent_size_reduction"] = (1.0 - (data["final_size"] / data["initial_size"])) * 100.0
-            data.sort_values("percent_size_reduction", inplace=True)
-            fig.scatter(x="percent_size_reduction", y="metric",
-                        legend_label=f"{s.estimator} ({s.preprocessor}), {s.compressor}",
-                        color=cc.b_glasbey_hv[index], source=data, alpha=0.2)
-
-            if s.lin_fit_show:
-                linear = linear_fit(data["percent_size_reduction"], data["metric"])
-                lin_conf = linear.eval_uncertainty(x=data["percent_size_reduction"], sigma=2)
-                data["lin_fit"] = linear.best_fit
-                data["lin_conf_lower"] = data["lin_fit"] - lin_conf
-                data["lin_conf_upper"] = data["lin_fit"] + lin_conf
-
-            if s.quad_fit_show:
-                quadratic = quadratic_fit(data["percent_size_reduction"], data["metric"])
-                quad_conf = quadratic.eval_uncertainty(x=data["percent_size_reduction"], sigma=2)
-                data["quad_fit"] = quadratic.best_fit
-                data["quad_conf_lower"] = data["quad_fit"] - quad_conf
-                data["quad_conf_upper"] = data["quad_fit"] + quad_conf
-
-            source = ColumnDataSource(data)
-
-            if s.lin_fit_show:
-                fig.line(x="percent_size_reduction", y="lin_fit", source=source, color=cc.b_glasbey_hv[index])
-                lin_band = Band(base="percent_size_reduction", lower="lin_conf_lower", upper="lin_conf_upper",
-                                source=source, fill_color=cc.b_glasbey_hv[index], fill_alpha=0.5)
-                fig.add_layout(lin_band)
-
-            if s.quad_fit_show:
-                fig.line(x="percent_size_reduction", y="quad_fit", source=source, color=cc.b_glasbey_hv[index])
-                quad_band = Band(base="percent_size_reduction", lower="quad_conf_lower", upper="quad_conf_upper",
-                                 source=source, fill_color=cc.b_glasbey_hv[index], fill_alpha=0.5)
-                fig.add_layout(quad_band)
-
-        return fig
+    def __init__(self, **params):
+        super().__init__(**params)
+        self._figure = figure(x_range=Range1d(0, 100), width=800, height=600, x_axis_label="Percent Size Reduction",
+                              y_axis_label="Estimator Metric")
+        self._legend = Legend(items=[])
+        self._figure.add_layout(self._legend)
+        self._glyphs: List[_SeriesGlyphs] = []
+        self._pane = pn.pane.Bokeh(self._figure)
+        self._lock = asyncio.Lock()
+
+    @param.depends("value.value", watch=True)
+    async def _update(self):
+        # Edits arriving while series load are applied in turn, each against the list as it is by then
+        async with self._lock:
+            self._pane.loading = True
+            try:
+                await self._apply(list(self.value.value))
+            finally:
+                self._pane.loading = False
+
+    async def _apply(self, series: List[Series]):
+        revision = await run(db.get_revision)
+        keep = 0
+        while (keep < min(len(series), len(self._glyphs)) and self._glyphs[keep].key == _series_key(series[keep])
+               and self._glyphs[keep].revision == revision):
+            keep += 1
+
+        # New series, and kept ones with a fit that was never shown before
+        loads = [(index, s) for index, s in enumerate(series)
+                 if index >= keep or any(getattr(s, show) and prefix not in self._glyphs[index].fits
+                                         for prefix, show in _fit_prefixes.items())]
+        frames = await asyncio.gather(*(load_series(db, "get_solo_plot_dataframe", *_series_key(s),
+                                                    show_linear=s.lin_fit_show, show_quadratic=s.quad_fit_show)
+                                        for _, s in loads))
+
+        with pn.io.hold():
+            for glyphs in self._glyphs[keep:]:
+                self._remove(glyphs)
+            del self._glyphs[keep:]
+            for (index, s), data in zip(loads, frames):
+                if index < keep:
+                    self._add_fits(self._glyphs[index], s, data.loc[self._glyphs[index].index], index)
+                else:
+                    self._glyphs.append(self._add(s, data, revision, index))
+            for glyphs, s in zip(self._glyphs, series):
+                for prefix, (line, band) in glyphs.fits.items():
+                    line.visible = band.visible = getattr(s, _fit_prefixes[prefix])
+
+    def _add(self, series: Series, data: pd.DataFrame, revision: int, index: int) -> _SeriesGlyphs:
+        source = ColumnDataSource({"percent_size_reduction": data["percent_size_reduction"].to_numpy(),
+                                   "metric": data["metric"].to_numpy()})
+        scatter = self._figure.scatter(x="percent_size_reduction", y="metric", color=cc.b_glasbey_hv[index],
+                                       source=source, alpha=0.2)
+        legend_item = LegendItem(label=f"{series.estimator} ({series.preprocessor}), {series.compressor}",
+                                 renderers=[scatter])
+        self._legend.items = [*self._legend.items, legend_item]
+        glyphs = _SeriesGlyphs(_series_key(series), revision, data.index, source, scatter, legend_item)
+        self._add_fits(glyphs, series, data, index)
+        return glyphs
+
+    def _add_fits(self, glyphs: _SeriesGlyphs, series: Series, data: pd.DataFrame, index: int):
+        """Sends only the columns of fits the series has not shown yet"""
+        new = [prefix for prefix, show in _fit_prefixes.items() if getattr(series, show) and prefix not in glyphs.fits]
+        if not new:
+            return
+        glyphs.source.data.update({f"{prefix}_{column}": data[f"{prefix}_{column}"].to_numpy()
+                                   for prefix in new for column in ("fit", "conf_lower", "conf_upper")})
+        for prefix in new:
+            line = self._figure.line(x="percent_size_reduction", y=f"{prefix}_fit", source=glyphs.source,
+                                     color=cc.b_glasbey_hv[index])
+            band = Band(base="percent_size_reduction", lower=f"{prefix}_conf_lower", upper=f"{prefix}_conf_upper",
+                        source=glyphs.source, fill_color=cc.b_glasbey_hv[index], fill_alpha=0.5)
+            self._figure.add_layout(band)
+            glyphs.fits[prefix] = (line, band)
+
+    def _remove(self, glyphs: _SeriesGlyphs):
+        lines = [glyphs.scatter, *(line for line, _ in glyphs.fits.values())]
+        bands = [band for _, band in glyphs.fits.values()]
+        self._figure.renderers = [r for r in self._figure.renderers if not any(r is line for line in lines)]
+        self._figure.center = [r for r in self._figure.center if not any(r is band for band in bands)]
+        self._legend.items = [item for item in self._legend.items if item is not glyphs.legend_item]
 
     def __panel__(self):
         series_input = SeriesInput()
@@ -144,7 +198,7 @@ class PlotEditor(pn.viewable.Viewer):
 
         controls = pn.Column(series_input, button_row)
 
-        return pn.Row(controls, self._layout)
+        return pn.Row(controls, self._pane)
 
 
 series_list = SeriesPlots(value=[])
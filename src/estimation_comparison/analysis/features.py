@@ -0,0 +1,140 @@
+#  Copyright (C) 2025 Julian Nowaczek.
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import json
+import logging
+import os
+import shutil
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, List
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from estimation_comparison.database import BenchmarkDatabase
+
+CONFIG_COLUMNS = ["preprocessor", "estimator", "block_summary_func", "file_summary_func"]
+
+
+@dataclass
+class FeatureMatrix:
+    """Per-file metrics of every config side by side, with the size reductions of every compressor aligned to the
+    same rows. Missing results are NaN."""
+    files: pd.Index  # file_hash of each row
+    features: pd.DataFrame  # CONFIG_COLUMNS of each column of x
+    compressors: List[str]  # Compressor of each column of y
+    x: np.ndarray  # (files × features) metric
+    y: np.ndarray  # (files × compressors) percent_size_reduction
+
+    def feature(self, preprocessor: str, estimator: str, block_summary_fn: str, file_summary_fn: str) -> np.ndarray:
+        index = pd.MultiIndex.from_frame(self.features).get_loc(
+            (preprocessor, estimator, block_summary_fn, file_summary_fn))
+        return self.x[:, index]
+
+    def target(self, compressor: str) -> np.ndarray:
+        return self.y[:, self.compressors.index(compressor)]
+
+
+def _scatter(matrix: np.ndarray, chunks: Iterable[pa.Table], rows: pd.Index, columns: pd.MultiIndex, values: str):
+    """Writes each chunk's values into matrix at its (row, column), skipping rows and columns not in the indexes"""
+    for chunk in chunks:
+        frame = chunk.to_pandas()
+        row = rows.get_indexer(frame["file_hash"])
+        column = columns.get_indexer(pd.MultiIndex.from_frame(frame[list(columns.names)]))
+        keep = (row >= 0) & (column >= 0)
+        matrix[row[keep], column[keep]] = frame[values].to_numpy()[keep]
+
+
+def build_feature_matrix(db: BenchmarkDatabase, dtype=np.float32) -> FeatureMatrix:
+    """FeatureMatrix of every file with a compression result, in one pass over the estimation results"""
+    # No chunks at all without compression results, the matrix then has no rows
+    compressions = list(db.iter_named_compressions())
+    files = pd.Index(pd.unique(np.concatenate([np.empty(0, dtype=object),
+                                               *(chunk["file_hash"].to_numpy() for chunk in compressions)])))
+    compressors = pd.MultiIndex.from_arrays([[name for _, name in db.get_compressors()]], names=["compressor"])
+    y = np.full((len(files), len(compressors)), np.nan, dtype=dtype)
+    _scatter(y, compressions, files, compressors, "percent_size_reduction")
+
+    configs = pd.MultiIndex.from_tuples(db.get_combinations(), names=CONFIG_COLUMNS)
+    x = np.full((len(files), len(configs)), np.nan, dtype=dtype)
+    _scatter(x, db.iter_named_estimations(), files, configs, "metric")
+
+    # Combinations nothing was estimated for yet
+    measured = ~np.isnan(x).all(axis=0)
+    if not measured.all():
+        x = x[:, measured]
+    return FeatureMatrix(files, configs[measured].to_frame(index=False), list(compressors.get_level_values(0)), x, y)
+
+
+class FeatureMatrixCache:
+    """FeatureMatrix of a database kept on disk and read back memory-mapped
+
+    Each build is stored under <root>/<database id>/<data revision>/ and served until the database's revision counter
+    moves on, so new results are picked up on the next load. The build is written to a temporary directory and renamed
+    into place, so readers never see a partial one.
+    """
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+
+    def _directory(self, db: BenchmarkDatabase) -> Path:
+        # Revisions of different databases count independently, also of one recreated at the same path
+        return self.root / db.get_database_id()
+
+    def load(self, db: BenchmarkDatabase) -> FeatureMatrix:
+        revision = db.get_revision()
+        directory = self._directory(db)
+        path = directory / str(revision)
+        if path.exists():
+            return self._read(path)
+        matrix = build_feature_matrix(db)
+        self._store(matrix, path)
+        if not path.exists():
+            return matrix
+        self._prune(directory, revision)
+        return self._read(path)
+
+    @staticmethod
+    def _store(matrix: FeatureMatrix, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = Path(tempfile.mkdtemp(dir=path.parent, prefix=".build-"))
+        try:
+            np.save(tmp_path / "x.npy", matrix.x)
+            np.save(tmp_path / "y.npy", matrix.y)
+            with open(tmp_path / "labels.json", "w") as f:
+                json.dump({"files": list(matrix.files), "features": matrix.features.values.tolist(),
+                           "compressors": matrix.compressors}, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            # Another process finished the same revision first, or the disk is full
+            if not path.exists():
+                logging.exception(f"Error storing feature matrix in {path}: {e}")
+            shutil.rmtree(tmp_path, ignore_errors=True)
+
+    @staticmethod
+    def _prune(directory: Path, revision: int):
+        for old in directory.iterdir():
+            if old.is_dir() and old.name.isdigit() and int(old.name) < revision:
+                shutil.rmtree(old, ignore_errors=True)
+
+    @staticmethod
+    def _read(path: Path) -> FeatureMatrix:
+        with open(path / "labels.json") as f:
+            labels = json.load(f)
+        return FeatureMatrix(pd.Index(labels["files"]), pd.DataFrame(labels["features"], columns=CONFIG_COLUMNS),
+                             labels["compressors"], np.load(path / "x.npy", mmap_mode="r"),
+                             np.load(path / "y.npy", mmap_mode="r"))
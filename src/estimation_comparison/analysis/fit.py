@@ -12,20 +12,109 @@
 #
 #  You should have received a copy of the GNU General Public License
 #  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+import numpy as np
 from lmfit.models import ExponentialModel, LinearModel, QuadraticModel
+from scipy.special import erf
+from scipy.stats import t
+
+# lmfit's parameter names, lowest power first
+_parameter_names = {1: ("intercept", "slope"), 2: ("c", "b", "a")}
+
+
+@dataclass
+class PolynomialFitResult:
+    """Weighted least squares polynomial fit, with the parts of lmfit's ModelResult the panels use"""
+    coefficients: np.ndarray  # Lowest power first
+    covariance: np.ndarray  # Of the coefficients, scaled by the reduced chi-square like lmfit's covar
+    x: np.ndarray
+    best_fit: np.ndarray
+    weights: Optional[np.ndarray]
+    ndata: int
+    redchi: float
+
+    @property
+    def nvarys(self) -> int:
+        return len(self.coefficients)
+
+    @property
+    def best_values(self) -> Dict[str, float]:
+        names = _parameter_names.get(self.nvarys - 1, [f"c{i}" for i in range(self.nvarys)])
+        return {name: float(c) for name, c in zip(names, self.coefficients)}
+
+    def eval(self, x=None) -> np.ndarray:
+        return self._basis(x) @ self.coefficients
+
+    def eval_uncertainty(self, x=None, sigma: float = 1) -> np.ndarray:
+        """Half width of the sigma confidence band of the fit at x, the same band as ModelResult.eval_uncertainty"""
+        basis = self._basis(x)
+        variance = np.einsum("ij,jk,ik->i", basis, self.covariance, basis)
+        prob = sigma if sigma < 1 else erf(sigma / np.sqrt(2))
+        return t.ppf((prob + 1) / 2, self.ndata - self.nvarys) * np.sqrt(np.maximum(variance, 0.0))
+
+    def _basis(self, x) -> np.ndarray:
+        return np.vander(self.x if x is None else np.asarray(x, dtype=np.float64), self.nvarys, increasing=True)
 
 
-def linear_fit(x, y):
+def polynomial_fit(x, y, degree: int, weights=None) -> PolynomialFitResult:
+    """Closed form fit of y on a polynomial of x. weights multiply the residuals, as in lmfit."""
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    basis = np.vander(x, degree + 1, increasing=True)
+    w = None if weights is None else np.asarray(weights, dtype=np.float64)
+    a = basis if w is None else basis * w[:, None]
+    b = y if w is None else y * w
+
+    # The SVD gives the coefficients and their covariance without squaring the condition number
+    u, s, vt = np.linalg.svd(a, full_matrices=False)
+    s_inv = np.divide(1.0, s, out=np.zeros_like(s), where=s > s.max(initial=0.0) * len(y) * np.finfo(float).eps)
+    coefficients = vt.T @ (s_inv * (u.T @ b))
+    residual = b - a @ coefficients
+    dof = len(y) - (degree + 1)
+    redchi = float(residual @ residual / dof) if dof > 0 else np.nan
+    scaled = vt.T * s_inv
+    return PolynomialFitResult(coefficients, scaled @ scaled.T * redchi, x, basis @ coefficients, w, len(y), redchi)
+
+
+def linear_fit(x, y, weights=None, use_lmfit: bool = False):
+    if not use_lmfit:
+        return polynomial_fit(x, y, 1, weights)
     model = LinearModel()
     params = model.make_params()
-    return model.fit(y, x=x, params=params)
+    return model.fit(y, x=x, params=params, weights=weights)
 
-def quadratic_fit(x, y):
+def quadratic_fit(x, y, weights=None, use_lmfit: bool = False):
+    if not use_lmfit:
+        return polynomial_fit(x, y, 2, weights)
     model = QuadraticModel()
     params = model.make_params()
-    return model.fit(y, x=x, params=params)
+    return model.fit(y, x=x, params=params, weights=weights)
 
 def exponential_fit(x, y):
     model = ExponentialModel()
     params = model.make_params()
     return model.fit(y, x=x, params=params)
+
+
+@dataclass
+class SeriesFit:
+    coefficients: np.ndarray  # Lowest power first
+    r2: float
+    rmse: float
+
+
+def series_fit(n, sum_x, sum_y, sum_xx, sum_xy, sum_yy, sum_xxx, sum_xxxx, sum_xxy, degree: int = 1) -> SeriesFit:
+    """Least squares fit of y on x from a series' sufficient statistics (see BenchmarkDatabase.get_series_statistics),
+    without touching the points themselves"""
+    if degree not in (1, 2):
+        raise ValueError(f"Sufficient statistics only cover degree 1 and 2 fits, not {degree}")
+    moments = [n, sum_x, sum_xx, sum_xxx, sum_xxxx]
+    xtx = np.array([[moments[i + j] for j in range(degree + 1)] for i in range(degree + 1)], dtype=np.float64)
+    xty = np.array([sum_y, sum_xy, sum_xxy][:degree + 1], dtype=np.float64)
+    coefficients = np.linalg.lstsq(xtx, xty, rcond=None)[0]
+    # The residual sum of squares follows from the normal equations, clamp the rounding noise of a perfect fit
+    sse = max(sum_yy - coefficients @ xty, 0.0)
+    sst = sum_yy - sum_y * sum_y / n
+    return SeriesFit(coefficients, float(1.0 - sse / sst) if sst > 0 else np.nan, float(np.sqrt(sse / n)))
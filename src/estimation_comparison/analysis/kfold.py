@@ -0,0 +1,217 @@
+#  Copyright (C) 2025 Julian Nowaczek.
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import functools
+import itertools
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import List, Tuple, Optional, Callable, Iterable
+
+import numpy as np
+import pyarrow as pa
+from sklearn.model_selection import KFold
+
+# Series per kfold_scores call in kfold_scores_ragged, bounds the (series, n, 2 * degree + 1) power matrix
+BATCH_SERIES = 128
+
+# Permuted targets scored at once by permutation_test, bounds the (permutations, n, degree + 1) prediction matrix
+BATCH_PERMUTATIONS = 256
+
+
+@dataclass
+class KFoldScores:
+    """Test fold scores of a k-fold cross-validated polynomial fit, one row per series and one column per fold"""
+    r2: np.ndarray
+    mse: np.ndarray
+
+    @property
+    def rmse(self) -> np.ndarray:
+        return np.sqrt(self.mse)
+
+    def __getitem__(self, index) -> "KFoldScores":
+        return KFoldScores(self.r2[index], self.mse[index])
+
+
+def fold_indices(n: int, n_splits: int = 10, random_state: int = 1337) -> np.ndarray:
+    """Test fold of each of n points under KFold(shuffle=True), the splits sklearn's cross_validate uses"""
+    folds = np.empty(n, dtype=np.intp)
+    for fold, (_, test) in enumerate(KFold(n_splits=n_splits, shuffle=True, random_state=random_state).split(
+            np.empty((n, 1)))):
+        folds[test] = fold
+    return folds
+
+
+def _one_hot(folds: np.ndarray, n_splits: int) -> np.ndarray:
+    one_hot = np.zeros((len(folds), n_splits))
+    one_hot[np.arange(len(folds)), folds] = 1.0
+    return one_hot
+
+
+def _fold_sums(values: np.ndarray, folds: np.ndarray, n_splits: int) -> np.ndarray:
+    """Per fold sums along the last axis of a (..., n) array"""
+    return values @ _one_hot(folds, n_splits)
+
+
+def _standardize(x: np.ndarray) -> np.ndarray:
+    # Standardizing x and centering y spans the same polynomials, but keeps the normal equations well-conditioned
+    scale = x.std(axis=-1, keepdims=True)
+    return (x - x.mean(axis=-1, keepdims=True)) / np.where(scale > 0, scale, 1.0)
+
+
+def _test_scores(y: np.ndarray, predicted: np.ndarray, folds: np.ndarray, n_splits: int) -> KFoldScores:
+    counts = np.bincount(folds, minlength=n_splits)
+    sse = _fold_sums((y - predicted) ** 2, folds, n_splits)
+    sst = _fold_sums(y ** 2, folds, n_splits) - _fold_sums(y, folds, n_splits) ** 2 / counts
+    # r2_score's force_finite convention for a constant test fold
+    with np.errstate(divide="ignore", invalid="ignore"):
+        r2 = np.where(sst > 0, 1.0 - sse / sst, np.where(sse > 0, 0.0, 1.0))
+    return KFoldScores(r2, sse / counts)
+
+
+def kfold_scores(x: np.ndarray, y: np.ndarray, degree: int = 1, n_splits: int = 10,
+                 random_state: int = 1337) -> KFoldScores:
+    """Cross-validates the least squares polynomial fit of y on x for every row of the (series, n) matrices at once.
+
+    Each fold's training fit only needs the power sums of its training points, which are the series totals minus
+    the sums over the test fold, so no fold is ever fitted point by point. Scores match sklearn's cross_validate of
+    make_pipeline(PolynomialFeatures(degree), LinearRegression()) with the same KFold, up to rounding."""
+    x = np.atleast_2d(np.asarray(x, dtype=np.float64))
+    y = np.atleast_2d(np.asarray(y, dtype=np.float64))
+    folds = fold_indices(x.shape[1], n_splits, random_state)
+
+    z = _standardize(x)
+    y = y - y.mean(axis=1, keepdims=True)
+
+    powers = z[..., None] ** np.arange(2 * degree + 1)  # (series, n, 2 * degree + 1)
+    moments = powers.transpose(0, 2, 1)
+    y_moments = moments[:, :degree + 1] * y[:, None, :]
+    train_moments = moments.sum(axis=2, keepdims=True) - _fold_sums(moments, folds, n_splits)
+    train_y_moments = y_moments.sum(axis=2, keepdims=True) - _fold_sums(y_moments, folds, n_splits)
+
+    # Normal equations of every (series, fold), XtX[a, b] = sum z^(a + b) and Xty[a] = sum z^a y
+    exponents = np.add.outer(np.arange(degree + 1), np.arange(degree + 1))
+    xtx = train_moments.transpose(0, 2, 1)[..., exponents]  # (series, folds, degree + 1, degree + 1)
+    xty = train_y_moments.transpose(0, 2, 1)[..., None]
+    # lstsq-like handling of a singular fold (e.g. constant x) through the pseudo-inverse
+    coefficients = (np.linalg.pinv(xtx) @ xty)[..., 0]  # (series, folds, degree + 1)
+
+    predicted = np.einsum("snd,snd->sn", coefficients[:, folds], powers[..., :degree + 1])
+    return _test_scores(y, predicted, folds, n_splits)
+
+
+def kfold_scores_ragged(series: List[Tuple[np.ndarray, np.ndarray]], degree: int = 1, n_splits: int = 10,
+                        random_state: int = 1337) -> List[KFoldScores]:
+    """kfold_scores of (x, y) series of any lengths, stacking the series of equal length into one batch"""
+    by_length = {}
+    for index, (x, _) in enumerate(series):
+        by_length.setdefault(len(x), []).append(index)
+
+    scores = [None] * len(series)
+    for length_indices in by_length.values():
+        for start in range(0, len(length_indices), BATCH_SERIES):
+            indices = length_indices[start:start + BATCH_SERIES]
+            batch = kfold_scores(np.stack([series[i][0] for i in indices]),
+                                 np.stack([series[i][1] for i in indices]), degree, n_splits, random_state)
+            for row, i in enumerate(indices):
+                scores[i] = batch[row]
+    return scores
+
+
+def _shared_x_scores(x: np.ndarray, y: np.ndarray, degree: int, folds: np.ndarray, n_splits: int) -> KFoldScores:
+    """kfold_scores for many targets (rows of y) against the same x, the fold normal matrices are inverted once"""
+    powers = _standardize(x)[:, None] ** np.arange(2 * degree + 1)  # (n, 2 * degree + 1)
+    train = 1.0 - _one_hot(folds, n_splits)  # (n, folds)
+    exponents = np.add.outer(np.arange(degree + 1), np.arange(degree + 1))
+    inverse = np.linalg.pinv((powers.T @ train).T[:, exponents])  # (folds, degree + 1, degree + 1)
+
+    y = y - y.mean(axis=1, keepdims=True)
+    xty = np.stack([(y * powers[:, a]) @ train for a in range(degree + 1)], axis=-1)  # (targets, folds, degree + 1)
+    coefficients = np.einsum("fab,tfb->tfa", inverse, xty)
+    predicted = np.einsum("tna,na->tn", coefficients[:, folds], powers[:, :degree + 1])
+    return _test_scores(y, predicted, folds, n_splits)
+
+
+def permutation_test(x: np.ndarray, y: np.ndarray, degree: int = 1, n_permutations: int = 100, n_splits: int = 10,
+                     random_state: int = 1337) -> Tuple[float, np.ndarray, float]:
+    """sklearn's permutation_test_score of the polynomial fit with scoring="neg_root_mean_squared_error" and
+    cv=KFold(n_splits, shuffle=True, random_state), scoring every permuted target as a row of one batch.
+
+    Permutations are drawn from RandomState(random_state) in the same order as sklearn does, so score, permutation
+    scores and p-value match sklearn's for the same seed up to rounding."""
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    folds = fold_indices(len(x), n_splits, random_state)
+    score = -_shared_x_scores(x, y[None, :], degree, folds, n_splits).rmse.mean()
+
+    rng = np.random.RandomState(random_state)
+    permutation_scores = np.empty(n_permutations)
+    for start in range(0, n_permutations, BATCH_PERMUTATIONS):
+        count = min(BATCH_PERMUTATIONS, n_permutations - start)
+        permuted = np.stack([y[rng.permutation(len(y))] for _ in range(count)])
+        scores = _shared_x_scores(x, permuted, degree, folds, n_splits)
+        permutation_scores[start:start + count] = -scores.rmse.mean(axis=1)
+    pvalue = (np.sum(permutation_scores >= score) + 1.0) / (n_permutations + 1)
+    return score, permutation_scores, pvalue
+
+
+def split_series(points: pa.Table, count: int) -> List[Tuple[np.ndarray, np.ndarray]]:
+    """(metric, percent_size_reduction) of each of count series from a BenchmarkDatabase.get_series_points table"""
+    index = points["series_index"].to_numpy()
+    metric = points["metric"].to_numpy()
+    percent_size_reduction = points["percent_size_reduction"].to_numpy()
+    bounds = np.searchsorted(index, np.arange(count + 1))
+    return [(metric[start:end], percent_size_reduction[start:end]) for start, end in zip(bounds[:-1], bounds[1:])]
+
+
+def drop_short_series(names: List[tuple], points: List[Tuple[np.ndarray, np.ndarray]],
+                      n_splits: int = 10) -> Tuple[List[tuple], List[Tuple[np.ndarray, np.ndarray]]]:
+    """names and points of the series with enough points for n_splits folds, logging the ones left out"""
+    kept_names = []
+    kept_points = []
+    for name, (x, y) in zip(names, points):
+        if len(x) < n_splits:
+            logging.warning(f"Skipping {', '.join(name)}: {len(x)} points are too few for {n_splits} folds")
+            continue
+        kept_names.append(name)
+        kept_points.append((x, y))
+    return kept_names, kept_points
+
+
+def _pool_map(fn: Callable, items: List, jobs: Optional[int], chunk: int) -> List:
+    """fn over chunks of items in a process pool of jobs workers (all cores for None), in order"""
+    chunks = [items[start:start + chunk] for start in range(0, len(items), chunk)]
+    if jobs == 1:
+        return list(itertools.chain.from_iterable(map(fn, chunks)))
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        return list(itertools.chain.from_iterable(executor.map(fn, chunks)))
+
+
+def _permutation_tests(series: Iterable[Tuple[np.ndarray, np.ndarray]], **kwargs) -> List:
+    return [permutation_test(x, y, **kwargs) for x, y in series]
+
+
+def kfold_scores_parallel(series: List[Tuple[np.ndarray, np.ndarray]], degree: int = 1, n_splits: int = 10,
+                          random_state: int = 1337, jobs: Optional[int] = None) -> List[KFoldScores]:
+    """kfold_scores_ragged spread over a process pool, BATCH_SERIES series per task"""
+    return _pool_map(functools.partial(kfold_scores_ragged, degree=degree, n_splits=n_splits,
+                                       random_state=random_state), series, jobs, BATCH_SERIES)
+
+
+def permutation_tests_parallel(series: List[Tuple[np.ndarray, np.ndarray]], degree: int = 1,
+                               n_permutations: int = 100, n_splits: int = 10, random_state: int = 1337,
+                               jobs: Optional[int] = None) -> List[Tuple[float, np.ndarray, float]]:
+    """permutation_test of every series spread over a process pool, one series per task"""
+    return _pool_map(functools.partial(_permutation_tests, degree=degree, n_permutations=n_permutations,
+                                       n_splits=n_splits, random_state=random_state), series, jobs, 1)
@@ -0,0 +1,135 @@
+#  Copyright (C) 2025 Julian Nowaczek.
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import asyncio
+import functools
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Hashable, Optional, Tuple
+
+import pandas as pd
+
+from estimation_comparison.analysis.fit import quadratic_fit, linear_fit
+from estimation_comparison.database import BenchmarkDatabase
+
+# Queries and fits run here instead of on the Bokeh event loop, so one session loading a series does not stall the
+# others. Threads rather than processes: BenchmarkDatabase keeps a connection per thread, and SQLite and numpy release
+# the GIL for the heavy parts.
+DATA_WORKERS = 4
+
+# Memory the cached series and fits of all sessions may take up together
+CACHE_BYTES = 512 * 2 ** 20
+
+executor = ThreadPoolExecutor(max_workers=DATA_WORKERS, thread_name_prefix="panel-data")
+
+
+class SeriesCache:
+    """Least recently used DataFrames, bounded by their total memory. Keys carry the database revision they were
+    computed at, entries of older revisions are dropped as soon as a newer one is seen."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.revision = None
+        self._entries: OrderedDict[Hashable, (pd.DataFrame, int)] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _check_revision(self, revision: int):
+        if revision != self.revision:
+            self._entries.clear()
+            self.bytes = 0
+            self.revision = revision
+
+    def get(self, revision: int, key: Hashable) -> Optional[pd.DataFrame]:
+        with self._lock:
+            self._check_revision(revision)
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, revision: int, key: Hashable, value: pd.DataFrame):
+        size = int(value.memory_usage(deep=True).sum())
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            self._check_revision(revision)
+            if key in self._entries:
+                self.bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                self.bytes -= self._entries.popitem(last=False)[1][1]
+
+    def __len__(self):
+        return len(self._entries)
+
+
+cache = SeriesCache(CACHE_BYTES)
+
+
+async def run(fn, *args, **kwargs):
+    return await asyncio.get_running_loop().run_in_executor(executor, functools.partial(fn, *args, **kwargs))
+
+
+_fits = {"lin": linear_fit, "quad": quadratic_fit}
+
+
+def fit_columns(data: pd.DataFrame, prefix: str) -> pd.DataFrame:
+    """Fit line and two sigma band of the lin or quad fit to a series"""
+    result = _fits[prefix](data["percent_size_reduction"], data["metric"])
+    conf = result.eval_uncertainty(x=data["percent_size_reduction"], sigma=2)
+    return pd.DataFrame({f"{prefix}_fit": result.best_fit,
+                         f"{prefix}_conf_lower": result.best_fit - conf,
+                         f"{prefix}_conf_upper": result.best_fit + conf}, index=data.index)
+
+
+def _grouped_fit_columns(data: pd.DataFrame, prefix: str, by: Optional[Tuple[str, ...]]) -> pd.DataFrame:
+    if not by:
+        return fit_columns(data, prefix)
+    return pd.concat([fit_columns(group, prefix) for _, group in data.groupby(list(by), sort=False)])
+
+
+def _load_series(db: BenchmarkDatabase, query: str, args: tuple, show_linear: bool, show_quadratic: bool,
+                 by: Optional[Tuple[str, ...]]) -> pd.DataFrame:
+    # Shared by every database opened on the same file, e.g. the module level ones of different panels
+    revision = db.get_revision()
+    key = (str(db.db_path), query, args)
+    data = cache.get(revision, key)
+    if data is None:
+        data = getattr(db, query)(*args, columnar=True).to_pandas()
+        data.sort_values("percent_size_reduction", inplace=True)
+        cache.put(revision, key, data)
+
+    columns = []
+    for show, prefix in ((show_linear, "lin"), (show_quadratic, "quad")):
+        if not show:
+            continue
+        fit = cache.get(revision, (*key, prefix, by))
+        if fit is None:
+            fit = _grouped_fit_columns(data, prefix, by)
+            cache.put(revision, (*key, prefix, by), fit)
+        columns.append(fit)
+    # Cached frames are shared between sessions, hand out a copy
+    return pd.concat([data, *columns], axis=1)
+
+
+async def load_series(db: BenchmarkDatabase, query: str, *args, show_linear: bool = False,
+                      show_quadratic: bool = False, by: Optional[Tuple[str, ...]] = None) -> pd.DataFrame:
+    """Runs the named BenchmarkDatabase plot query and the requested fits off the event loop, or takes them from the
+    cache if the database has not changed since. With by set the rows hold several series and each group of those
+    columns is fitted separately. Arguments must be hashable, pass lists as tuples."""
+    return await run(_load_series, db, query, args, show_linear, show_quadratic, by)
@@ -0,0 +1,83 @@
+#  Copyright (C) 2025 Julian Nowaczek.
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import argparse
+import functools
+import logging
+from pathlib import Path
+from typing import Iterable, List
+
+import numpy as np
+import pandas as pd
+from imagecodecs import tiff_decode
+
+from estimation_comparison.data_collection.estimator import EstimatorBase, Autocorrelation
+from estimation_comparison.data_collection.preprocessor import FlattenSampler
+from estimation_comparison.data_collection.summary_stats import autocorrelation_lag, mean_inside_middle_notch, \
+    proportion_above_metric_cutoff
+from estimation_comparison.model import BlockSummaryFunc
+
+
+def precision_report(estimator: EstimatorBase, block_summary_funcs: List[BlockSummaryFunc],
+                     samples: Iterable[np.ndarray], file_summary_func=np.mean) -> pd.DataFrame:
+    """Compares every reduced precision policy of an estimator against its float64 reference on the given samples
+
+    The error is measured on the per-file metric, i.e. after the block and file summary functions, since that is the
+    value that ends up in the database and the published tables.
+    """
+    reference = type(estimator)(**{**estimator.trait_values(), "precision": "float64"})
+    candidates = {p: type(estimator)(**{**estimator.trait_values(), "precision": p})
+                  for p in EstimatorBase.class_traits()["precision"].values if p != "float64"}
+
+    errors = {(p, f.name): [] for p in candidates for f in block_summary_funcs}
+    output_errors = {p: 0.0 for p in candidates}
+    for sample in samples:
+        expected = reference.estimate(sample)
+        for precision, candidate in candidates.items():
+            actual = candidate.estimate(sample)
+            output_errors[precision] = max(output_errors[precision], float(np.max(np.abs(actual - expected))))
+            for f in block_summary_funcs:
+                summarize = functools.partial(f.instance, **(f.parameters if f.parameters is not None else {}))
+                errors[(precision, f.name)].append(
+                    (file_summary_func(np.apply_along_axis(summarize, 1, expected)),
+                     file_summary_func(np.apply_along_axis(summarize, 1, actual))))
+
+    rows = []
+    for (precision, name), values in errors.items():
+        expected, actual = np.asarray(values, dtype=np.float64).T
+        rows.append([precision, name, output_errors[precision], np.max(np.abs(actual - expected)),
+                     np.mean(np.abs(actual - expected)), np.mean(np.round(actual, 2) != np.round(expected, 2))])
+    return pd.DataFrame(rows, columns=["precision", "summary statistic", "max output error", "max metric error",
+                                       "mean metric error", "changed at 2 d.p."])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report the metric error of reduced precision estimator policies")
+    parser.add_argument("files", type=Path, nargs="+", help="TIFF images to estimate")
+    parser.add_argument("-b", "--block-size", type=int, dest="block_size", default=972)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    funcs = [BlockSummaryFunc(name=f"lag_{lag}", instance=autocorrelation_lag, parameters={"lag": lag})
+             for lag in (0, 1, 3)]
+    funcs += [BlockSummaryFunc(name="mean_inside_middle_notch_64", instance=mean_inside_middle_notch,
+                               parameters={"notch_width": 64}),
+              BlockSummaryFunc(name="proportion_above_metric_cutoff_0.2", instance=proportion_above_metric_cutoff,
+                               parameters={"cutoff": 0.2})]
+
+    sampler = FlattenSampler()
+    report = precision_report(Autocorrelation(block_size=args.block_size), funcs,
+                              (sampler.run(tiff_decode(f.read_bytes())) for f in args.files))
+    print(report.to_string(index=False))
@@ -15,7 +15,6 @@
 from pathlib import Path
 from sklearn.linear_model import LinearRegression
 
-import pandas as pd
 import panel as pn
 from sklearn.pipeline import make_pipeline
 from sklearn.preprocessing import PolynomialFeatures
@@ -24,16 +23,13 @@ from wat import wat
 from estimation_comparison.analysis.fit import linear_fit, quadratic_fit
 from estimation_comparison.database import BenchmarkDatabase
 
-db = BenchmarkDatabase(Path("benchmarks/benchmark.sqlite"))
+db = BenchmarkDatabase(Path("benchmarks/benchmark.sqlite"), read_only=True)
 
 
 def fit(preprocessor: str, estimator: str, compressor: str, block_summary_fn: str, file_summary_fn: str):
-    desc, rec = db.get_solo_plot_dataframe(preprocessor, estimator, compressor, block_summary_fn,
-                                           file_summary_fn)
+    data = db.get_solo_plot_dataframe(preprocessor, estimator, compressor, block_summary_fn,
+                                      file_summary_fn, columnar=True).to_pandas()
 
-    data = pd.DataFrame.from_records(rec, columns=[item[0] for item in desc])
-
-    data["percent_size_reduction"] = (1.0 - (data["final_size"] / data["initial_size"])) * 100.0
     data.sort_values("percent_size_reduction", inplace=True)
 
     linear_model = linear_fit(data["percent_size_reduction"], data["metric"])
@@ -19,18 +19,15 @@ from typing import List
 import matplotlib
 import numpy as np
 import pandas as pd
-import sklearn
 from bokeh.models import Range1d
 from bokeh.plotting import figure
 from matplotlib import pyplot as plt
-from sklearn.linear_model import LinearRegression
-from sklearn.model_selection import permutation_test_score
-from sklearn.pipeline import make_pipeline
 
+from estimation_comparison.analysis.kfold import drop_short_series, permutation_tests_parallel, split_series
 from estimation_comparison.data_collection.estimator import Autocorrelation
 from estimation_comparison.database import BenchmarkDatabase
 
-db = BenchmarkDatabase(Path("benchmarks/benchmark.sqlite"))
+db = BenchmarkDatabase(Path("benchmarks/benchmark.sqlite"), read_only=True)
 
 
 @dataclass
@@ -50,10 +47,9 @@ def render(graph: GraphSpec):
     fig = figure(x_range=Range1d(0, 100), width=800, height=600, x_axis_label="Percent Size Reduction",
                  y_axis_label="Estimator Metric")
 
-    desc, rec = db.get_plot_dataframe(graph.preprocessor_names, graph.estimator_names, graph.compressor_names,
-                                      graph.block_summary_func_names, graph.file_summary_func_names, graph.qualities,
-                                      graph.tags)
-    data = pd.DataFrame.from_records(rec, columns=[item[0] for item in desc])
+    data = db.get_plot_dataframe(graph.preprocessor_names, graph.estimator_names, graph.compressor_names,
+                                 graph.block_summary_func_names, graph.file_summary_func_names, graph.qualities,
+                                 graph.tags, columnar=True).to_pandas()
 
     # for index, s in enumerate(series):
     #
@@ -95,41 +91,26 @@ def render(graph: GraphSpec):
 
 
 def build_table(combinations: list[tuple[str, str, str]]):
-    linear_results = pd.DataFrame(
-        columns=["Compression Algorithm", "NRMSE", "p-value", "estimator", "summary statistic", "preprocessor"])
     # quad_results = pd.DataFrame(columns=["Compression Algorithm", "NRMSE", "p-value", "estimator", "summary statistic"])
 
     compressor_names = [c[1] for c in db.get_compressors()]
 
-    linear_pipeline = make_pipeline(LinearRegression())
-    # quad_pipeline = make_pipeline(PolynomialFeatures(2), LinearRegression())
-
-    for (preprocessor_name, estimator_name, block_summary_func_name, file_summary_func_name) in combinations:
-        for compressor_name in compressor_names:
-            desc, rec = db.get_solo_plot_dataframe(preprocessor_name, estimator_name,
-                                                   compressor_name,
-                                                   block_summary_func_name,
-                                                   file_summary_func_name)
-            data = pd.DataFrame.from_records(rec, columns=[item[0] for item in desc])
-            data["percent_size_reduction"] = (1.0 - (data["final_size"] / data["initial_size"])) * 100.0
-
-            kfold = sklearn.model_selection.KFold(n_splits=10, shuffle=True, random_state=1337)
-            scoring = ["neg_mean_squared_error"]
-            linear_score, _, pvalue_linear = permutation_test_score(linear_pipeline, data[["metric"]],
-                                                                    data["percent_size_reduction"],
-                                                                    cv=kfold,
-                                                                    scoring="neg_root_mean_squared_error",
-                                                                    random_state=1337)
-            # quad_score, _, pvalue_quad = permutation_test_score(quad_pipeline, data[["metric"]],
-            #                                                     data["percent_size_reduction"],
-            #                                                     cv=kfold,
-            #                                                     scoring="neg_root_mean_squared_error",
-            #                                                     random_state=1337)
-
-            linear_results.loc[len(linear_results)] = [compressor_name, linear_score, pvalue_linear, estimator_name,
-                                                       block_summary_func_name, preprocessor_name]
-            # quad_results.loc[len(linear_results)] = [compressor_name, quad_score, pvalue_quad, estimator_name,
-            #                                          block_summary_func_name]
+    series = [(preprocessor_name, estimator_name, block_summary_func_name, file_summary_func_name, compressor_name)
+              for (preprocessor_name, estimator_name, block_summary_func_name, file_summary_func_name) in combinations
+              for compressor_name in compressor_names]
+    # Series not estimated yet, e.g. of newly added preprocessors, would fail the 10 folds
+    series, points = drop_short_series(series, split_series(db.get_series_points(series, columnar=True), len(series)))
+
+    # Same splits, permutations and p-values as sklearn's permutation_test_score with KFold(10, shuffle=True,
+    # random_state=1337), neg_root_mean_squared_error scoring and random_state=1337
+    linear_tests = permutation_tests_parallel(points, degree=1)
+    # quad_tests = permutation_tests_parallel(points, degree=2)
+
+    rows = [[compressor_name, linear_score, pvalue_linear, estimator_name, block_summary_func_name, preprocessor_name]
+            for (preprocessor_name, estimator_name, block_summary_func_name, _, compressor_name),
+            (linear_score, _, pvalue_linear) in zip(series, linear_tests)]
+    linear_results = pd.DataFrame(
+        rows, columns=["Compression Algorithm", "NRMSE", "p-value", "estimator", "summary statistic", "preprocessor"])
 
     # SKL uses negative RMSE, fix that
     linear_results["RMSE"] = abs(linear_results["NRMSE"])
@@ -165,6 +146,28 @@ def build_basic_ac_table():
     return table
 
 
+def build_downsample_table():
+    print("Autocorrelation 972 downsampled vs entire file")
+    autocorrelation_972_downsample = filter(
+        lambda c: (c[0] == "entire_file" or c[0].startswith("downsample_")) and c[1] == "autocorrelation_972",
+        db.get_combinations())
+
+    table = build_table(list(autocorrelation_972_downsample))
+    table.to_csv("~/ac972_downsample.csv")
+    return table
+
+
+def build_stratified_table():
+    print("Autocorrelation 972 stratified/jittered vs random sampling")
+    autocorrelation_972_stratified = filter(
+        lambda c: c[0].startswith(("patch_", "linear_")) and c[1] == "autocorrelation_972",
+        db.get_combinations())
+
+    table = build_table(list(autocorrelation_972_stratified))
+    table.to_csv("~/ac972_stratified.csv")
+    return table
+
+
 def heatmap_helper(grouped, grouped_p, name, size, ylabels=None, yaxis=None):
     fig, ax = plt.subplots(figsize=size, dpi=300, layout="constrained")
     im = ax.imshow(grouped, cmap="Greys", vmin=0, vmax=15)
@@ -380,6 +383,31 @@ if __name__ == "__main__":
             ["max_outside_middle_notch_64"], f"patch/max_outside_{x}", (6, 3),
             ylabels=["64"], yaxis="max_outside_middle_notch")
 
+    # autocorrelation_downsample_table = build_downsample_table()
+    autocorrelation_downsample_table = pd.read_csv("~/ac972_downsample.csv")
+    downsample_preprocessors = ["entire_file", "downsample_mean_2x", "downsample_mean_4x", "downsample_mean_8x",
+                                "downsample_decimate_4x", "downsample_mean_2x_patch_random_25%",
+                                "downsample_mean_4x_patch_random_25%"]
+    for bsf in ["lag_1", "proportion_above_metric_cutoff_0.2", "mean_inside_middle_notch_64"]:
+        sampled_error_heatmap(
+            autocorrelation_downsample_table[autocorrelation_downsample_table["summary statistic"] == bsf],
+            downsample_preprocessors, f"downsample/{bsf}", (6, 4),
+            ylabels=["1/16 (decimate)", "1/4", "1/16 (2x, 25%)", "1/16", "1/64 (4x, 25%)", "1/64", "1"],
+            yaxis="fraction of pixels")
+
+    # Fraction sweep: evenly spread samples at 10-25% against uniform random draws at 25-75%
+    # autocorrelation_stratified_table = build_stratified_table()
+    autocorrelation_stratified_table = pd.read_csv("~/ac972_stratified.csv")
+    for kind in ["patch", "linear"]:
+        sweep_preprocessors = [f"{kind}_{strategy}_{x}%" for strategy, fractions in
+                               [("jittered", ["10", "25"]), ("random", ["25", "50", "75"]),
+                                ("stratified", ["10", "25"])] for x in fractions]
+        for bsf in ["lag_1", "proportion_above_metric_cutoff_0.2"]:
+            table = autocorrelation_stratified_table[autocorrelation_stratified_table["summary statistic"] == bsf]
+            present = sorted(set(sweep_preprocessors) & set(table["preprocessor"]))
+            sampled_error_heatmap(table, present, f"{kind}/fraction_sweep_{bsf}", (6, 4),
+                                  ylabels=[p.removeprefix(f"{kind}_") for p in present], yaxis=f"{kind} sampling")
+
     bytecount = filter(
         lambda c: c[0] == "entire_file" and c[1] == "bytecount_file", db.get_combinations())
     entropy = filter(
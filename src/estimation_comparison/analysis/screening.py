@@ -0,0 +1,72 @@
+#  Copyright (C) 2025 Julian Nowaczek.
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from scipy.stats import rankdata
+
+from estimation_comparison.analysis.features import CONFIG_COLUMNS, FeatureMatrixCache, build_feature_matrix
+from estimation_comparison.database import BenchmarkDatabase
+
+
+def pairwise_correlation(x: np.ndarray, y: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Pearson correlation and pair count of every column of x with every column of y, each pair over the rows
+    where both are present"""
+    present_x = ~np.isnan(x)
+    present_y = ~np.isnan(y)
+    # Centering first keeps the sums of squares from cancelling
+    x = np.where(present_x, x - np.nanmean(x, axis=0), 0.0)
+    y = np.where(present_y, y - np.nanmean(y, axis=0), 0.0)
+    present_x = present_x.astype(float)
+    present_y = present_y.astype(float)
+
+    n = present_x.T @ present_y
+    sum_x = x.T @ present_y
+    sum_y = present_x.T @ y
+    with np.errstate(divide="ignore", invalid="ignore"):
+        covariance = x.T @ y - sum_x * sum_y / n
+        variance_x = np.maximum((x ** 2).T @ present_y - sum_x ** 2 / n, 0.0)
+        variance_y = np.maximum(present_x.T @ y ** 2 - sum_y ** 2 / n, 0.0)
+        r = covariance / np.sqrt(variance_x * variance_y)
+    return np.clip(r, -1.0, 1.0), n.astype(np.int64)
+
+
+def screen_correlations(db: BenchmarkDatabase, cache: Optional[FeatureMatrixCache] = None) -> pd.DataFrame:
+    """Pearson and Spearman correlation of every config's metric with every compressor's size reduction,
+    strongest first. With a cache the feature matrix is only rebuilt after new results."""
+    matrix = build_feature_matrix(db) if cache is None else cache.load(db)
+    # Summed in double precision, the float32 inputs only limit the correlations to about 7 digits
+    metrics = np.asarray(matrix.x, dtype=np.float64)
+    reductions = np.asarray(matrix.y, dtype=np.float64)
+
+    pearson, n = pairwise_correlation(metrics, reductions)
+    # Ranked over each column's own files, so exact for pairs without missing results
+    spearman, _ = pairwise_correlation(rankdata(metrics, axis=0, nan_policy="omit"),
+                                       rankdata(reductions, axis=0, nan_policy="omit"))
+
+    result = matrix.features.loc[matrix.features.index.repeat(len(matrix.compressors))].reset_index(drop=True)
+    result["compressor"] = np.tile(matrix.compressors, len(matrix.features))
+    result["n"] = n.ravel()
+    result["pearson"] = pearson.ravel()
+    result["spearman"] = spearman.ravel()
+    result["score"] = np.fmax(np.abs(result["pearson"]), np.abs(result["spearman"]))
+    return result.sort_values("score", ascending=False, na_position="last", ignore_index=True)
+
+
+def top_configs(screen: pd.DataFrame, k: int) -> List[Tuple[str, str, str, str]]:
+    """The k configs with the strongest correlation against any compressor"""
+    best = screen.groupby(CONFIG_COLUMNS, sort=False)["score"].max()
+    return list(best.sort_values(ascending=False, na_position="last").index[:k])
@@ -17,16 +17,15 @@ from pathlib import Path
 from typing import List
 
 import colorcet as cc
-import pandas as pd
 import panel as pn
 from bokeh.models import Band, ColumnDataSource
 from bokeh.plotting import figure
 from bokeh.transform import factor_mark
 
-from estimation_comparison.analysis.fit import quadratic_fit, linear_fit
+from estimation_comparison.analysis.panel_data import load_series
 from estimation_comparison.database import BenchmarkDatabase
 
-db = BenchmarkDatabase(Path("benchmarks/benchmark.sqlite"))
+db = BenchmarkDatabase(Path("benchmarks/benchmark.sqlite"), read_only=True)
 
 tag_name_to_id: {str, int} = {row[1]: row[0] for row in db.get_tags()}
 quality_name_to_id: {str, int} = {row[1]: row[0] for row in db.get_qualities()}
@@ -50,42 +49,33 @@ template = pn.template.BootstrapTemplate(
              y_axis_range])
 
 
-def plot(preprocessor: str, estimator: str, compressor: str, tags: List[str], qualities: List[str],
-         x_range: (int, int), y_range: (int, int), show_linear: bool = False, show_quadratic: bool = False):
+async def plot(preprocessor: str, estimator: str, compressor: str, tags: List[str], qualities: List[str],
+               x_range: (int, int), y_range: (int, int), show_linear: bool = False, show_quadratic: bool = False):
     fig = figure(y_range=y_range, x_range=x_range, output_backend="webgl",
                  x_axis_label="Percent Size Reduction", y_axis_label="Estimator Metric",
                  width=1600, height=1200, sizing_mode="fixed")
 
+    groups = {}
     if not tags or not qualities:
         fig.scatter()
+    else:
+        # One query for all pairs, split back into series here
+        data = await load_series(db, "get_multi_tag_plot_dataframe", preprocessor, estimator, compressor, tuple(tags),
+                                 tuple(qualities), show_linear=show_linear, show_quadratic=show_quadratic,
+                                 by=("tag", "quality"))
+        groups = dict(iter(data.groupby(["tag", "quality"], sort=False)))
 
     for tag_name, quality in itertools.product(tags, qualities):
-        desc, rec = db.get_solo_tag_plot_dataframe(preprocessor, estimator, compressor, tag_name, quality)
-        data = pd.DataFrame.from_records(rec, columns=[item[0] for item in desc])
-
+        data = groups.get((tag_name, quality))
+        if data is None:
+            continue
         tag_color = cc.glasbey_dark[tag_name_to_id[tag_name]]
 
-        data["percent_size_reduction"] = (1.0 - (data["final_size"] / data["initial_size"])) * 100.0
-        data.sort_values("percent_size_reduction", inplace=True)
         fig.scatter(x="percent_size_reduction", y="metric", source=data, alpha=0.6, color=tag_color,
                     marker=factor_mark(field_name="quality",
                                        markers=["star", "circle", "inverted_triangle"],
                                        factors=list(quality_name_to_id.keys())))
 
-        if show_quadratic:
-            quadratic = quadratic_fit(data["percent_size_reduction"], data["metric"])
-            quad_conf = quadratic.eval_uncertainty(x=data["percent_size_reduction"], sigma=2)
-            data["quad_fit"] = quadratic.best_fit
-            data["quad_conf_lower"] = data["quad_fit"] - quad_conf
-            data["quad_conf_upper"] = data["quad_fit"] + quad_conf
-
-        if show_linear:
-            linear = linear_fit(data["percent_size_reduction"], data["metric"])
-            lin_conf = linear.eval_uncertainty(x=data["percent_size_reduction"], sigma=2)
-            data["lin_fit"] = linear.best_fit
-            data["lin_conf_lower"] = data["lin_fit"] - lin_conf
-            data["lin_conf_upper"] = data["lin_fit"] + lin_conf
-
         source = ColumnDataSource(data)
 
         if show_linear:
@@ -111,8 +101,8 @@ home_button = pn.widgets.Button(name="Index", button_type="primary")
 home_button.js_on_click(code="window.location.href='/panel/'")
 template.header.append(home_button)
 
-bokeh_pane = pn.bind(plot, pre_select, est_select, comp_select, tag_select, quality_select, x_axis_range, y_axis_range,
-                     lin_fit_show, quad_fit_show)
+bokeh_pane = pn.panel(pn.bind(plot, pre_select, est_select, comp_select, tag_select, quality_select, x_axis_range,
+                              y_axis_range, lin_fit_show, quad_fit_show), loading_indicator=True)
 
 template.main.append(bokeh_pane)
 
@@ -24,15 +24,18 @@ class Autocorrelation(EstimatorBase):
     block_size = Int(1024)
 
     def estimate(self, data: np.ndarray) -> np.ndarray:
-        def autocorrelate(block):
-            mean = np.mean(block)
-            var = np.var(block)
-            if var == 0:
-                # if the variance is zero it should have an autocorrelation of 1
-                return np.ones(shape=(block.shape[0] * 2 - 1))
-            zero_mean = np.subtract(block, mean)
-            correlation = signal.correlate(zero_mean, zero_mean)
-            return np.divide(correlation, (var * self.block_size))
+        return self.estimate_batch(data[np.newaxis])[0]
 
-        data_array = np.reshape(data[:len(data) // self.block_size * self.block_size], (-1, self.block_size))
-        return np.apply_along_axis(autocorrelate, 1, data_array)
+    def estimate_batch(self, data: np.ndarray) -> np.ndarray:
+        data = np.reshape(data, (data.shape[0], -1))
+        data_array = np.reshape(data[:, :data.shape[1] // self.block_size * self.block_size],
+                                (data.shape[0], -1, self.block_size))
+        blocks = data_array.astype(self.float_dtype)
+
+        mean = np.mean(blocks, axis=-1, keepdims=True)
+        var = np.var(blocks, axis=-1, keepdims=True)
+        zero_mean = np.subtract(blocks, mean, out=blocks)
+        correlation = signal.fftconvolve(zero_mean, zero_mean[..., ::-1], axes=-1)
+
+        # if the variance is zero it should have an autocorrelation of 1
+        return np.divide(correlation, var * self.block_size, out=np.ones_like(correlation), where=var != 0)
@@ -24,11 +24,14 @@ class Autocovariance(EstimatorBase):
     block_size = Int(1024)
 
     def estimate(self, data: np.ndarray) -> np.ndarray:
-        def autocovariance(block):
-            mean = np.mean(block)
-            zero_mean = np.subtract(block, mean)
-            correlation = signal.correlate(zero_mean, zero_mean)
-            return np.divide(correlation, self.block_size)
+        return self.estimate_batch(data[np.newaxis])[0]
 
-        data_array = np.reshape(data[:len(data) // self.block_size * self.block_size], (-1, self.block_size))
-        return np.apply_along_axis(autocovariance, 1, data_array)
+    def estimate_batch(self, data: np.ndarray) -> np.ndarray:
+        data = np.reshape(data, (data.shape[0], -1))
+        data_array = np.reshape(data[:, :data.shape[1] // self.block_size * self.block_size],
+                                (data.shape[0], -1, self.block_size))
+        blocks = data_array.astype(self.float_dtype)
+
+        zero_mean = np.subtract(blocks, np.mean(blocks, axis=-1, keepdims=True), out=blocks)
+        correlation = signal.fftconvolve(zero_mean, zero_mean[..., ::-1], axes=-1)
+        return np.divide(correlation, self.block_size, out=correlation)
@@ -19,13 +19,16 @@ import numpy as np
 # noinspection PyProtectedMember
 from traitlets import Int
 
-from estimation_comparison.data_collection.estimator.base import EstimatorBase
+from estimation_comparison.data_collection.estimator.base import EstimatorBase, byte_histograms
 
 
 class ByteCount(EstimatorBase):
     block_size = Int(None, allow_none=True)
 
     def estimate(self, data: np.ndarray) -> [int]:
+        if data.dtype == np.uint8:
+            return self.estimate_batch(data[np.newaxis])[0]
+
         if self.block_size:
             data = data.reshape((-1, self.block_size))
         else:
@@ -40,3 +43,14 @@ class ByteCount(EstimatorBase):
             results.append(len(np.where(counts > threshold)[0]))
 
         return results
+
+    def estimate_batch(self, data: np.ndarray) -> list[[int]]:
+        if data.dtype != np.uint8:
+            return super().estimate_batch(data)
+
+        data = data.reshape((data.shape[0], -1))
+        blocks = data.reshape((-1, self.block_size if self.block_size else data.shape[1]))
+        # Integer-only histogram path
+        threshold = blocks.shape[1] // 256
+        counts = byte_histograms(blocks)
+        return np.count_nonzero(counts > threshold, axis=1).reshape((data.shape[0], -1)).tolist()
@@ -26,5 +26,5 @@ class Entropy(EstimatorBase):
     # I do kinda wish I could take credit for how simple this is, but...
     # https://stackoverflow.com/a/45091961
     def estimate(self, data: bytes) -> [int]:
-        word, appearances = np.unique(np.frombuffer(data, dtype=np.dtype("B")), return_counts=True)
-        return entropy(appearances, base=self.base)
+        appearances = np.bincount(np.frombuffer(data, dtype=np.dtype("B")), minlength=256)
+        return entropy(appearances[appearances > 0], base=self.base)
@@ -12,5 +12,7 @@
 #
 #  You should have received a copy of the GNU General Public License
 #  along with this program.  If not, see <https://www.gnu.org/licenses/>.
-from .sampler_base import BaseSampler, FlattenSampler
+from .sampler_base import BaseSampler, FlattenSampler, ChainSampler
 from .patch_sample import PatchSampler
+from .downsample import DownsampleSampler
+from .stratified_sample import StratifiedPatchSampler, StratifiedLinearSampler
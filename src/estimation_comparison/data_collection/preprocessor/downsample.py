@@ -0,0 +1,53 @@
+#  Copyright (C) 2025 Julian Nowaczek.
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import numpy as np
+# noinspection PyProtectedMember
+from traitlets import Int, Enum
+
+from estimation_comparison.data_collection.preprocessor import BaseSampler
+
+
+class DownsampleSampler(BaseSampler[np.ndarray]):
+    """Reduces the resolution of a decoded image by an integer factor along both spatial axes
+
+    "mean" averages each factor x factor block, "decimate" keeps the top-left pixel of each block. The channel axis
+    and dtype are preserved so the result can be fed to any other sampler or estimator.
+    """
+    factor = Int(2)
+    method = Enum(["mean", "decimate"], default_value="mean")
+
+    def run(self, data: np.ndarray) -> np.ndarray:
+        spatial_axes = min(data.ndim, 2)
+        for axis in range(spatial_axes):
+            if self.factor > data.shape[axis]:
+                raise ValueError(
+                    f"Requested downsample factor is too large for supplied data: {self.factor} > {data.shape[axis]}")
+
+        if self.method == "decimate":
+            return np.ascontiguousarray(data[(slice(None, None, self.factor),) * spatial_axes])
+
+        # Crop to a whole number of blocks, then split each spatial axis into (blocks, factor) and reduce the factors
+        cropped_shape = tuple(data.shape[axis] // self.factor for axis in range(spatial_axes))
+        data = data[tuple(slice(0, n * self.factor) for n in cropped_shape)]
+        blocked_shape = sum(((n, self.factor) for n in cropped_shape), ()) + data.shape[spatial_axes:]
+        block_axes = tuple(range(1, 2 * spatial_axes, 2))
+        blocks = data.reshape(blocked_shape)
+
+        if np.issubdtype(data.dtype, np.integer):
+            # Integer sum and round-half-up division keeps this exact and avoids a float64 temporary
+            count = self.factor ** spatial_axes
+            sums = blocks.sum(axis=block_axes, dtype=np.int64)
+            return ((sums + count // 2) // count).astype(data.dtype)
+        return blocks.mean(axis=block_axes, dtype=data.dtype)
@@ -0,0 +1,81 @@
+#  Copyright (C) 2025 Julian Nowaczek.
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import threading
+from collections import OrderedDict, namedtuple
+from typing import Callable, Tuple
+
+import numpy as np
+# noinspection PyProtectedMember
+from traitlets import HasTraits
+
+CacheInfo = namedtuple("CacheInfo", ["hits", "misses", "maxsize", "currsize"])
+
+
+class SampleIndexCache:
+    """Bounded LRU cache of sample indexes, keyed by sampler class, sampler parameters and input shape
+
+    Samplers with a fixed seed pick the same patches for every input of the same shape, so the indexes only need to
+    be computed once per process. Cached arrays are read-only since they are shared between callers.
+    """
+
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[tuple, np.ndarray] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(sampler: HasTraits, shape: Tuple[int, ...]) -> tuple:
+        return type(sampler).__qualname__, tuple(sorted(sampler.trait_values().items())), tuple(shape)
+
+    def get(self, sampler: HasTraits, shape: Tuple[int, ...],
+            compute: Callable[[Tuple[int, ...]], np.ndarray]) -> np.ndarray:
+        key = self.key(sampler, shape)
+        with self._lock:
+            if key in self._entries:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return self._entries[key]
+            self.misses += 1
+
+        indexes = np.asarray(compute(tuple(shape)))
+        indexes.setflags(write=False)
+
+        with self._lock:
+            self._entries[key] = indexes
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return indexes
+
+    def cache_info(self) -> CacheInfo:
+        with self._lock:
+            return CacheInfo(self.hits, self.misses, self.maxsize, len(self._entries))
+
+    def cache_clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+# One cache per process, shared by every sampler (and every thread) in a Dask worker
+sample_index_cache = SampleIndexCache()
+
+
+def sample_index_cache_info() -> CacheInfo:
+    """Module level accessor so the counters can be collected from workers with Client.run"""
+    return sample_index_cache.cache_info()
@@ -20,6 +20,7 @@ import numpy as np
 from traitlets import Int, Float
 
 from estimation_comparison.data_collection.preprocessor import BaseSampler
+from estimation_comparison.data_collection.preprocessor.index_cache import sample_index_cache
 
 
 class LinearSampler(BaseSampler[np.ndarray]):
@@ -34,9 +35,12 @@ class LinearSampler(BaseSampler[np.ndarray]):
             raise ValueError(
                 f"Requested patch length is too long for supplied data: {self.patch_len} > {data.shape[0]}")
 
-        patch_start_indexes = list(filter(lambda x: x + self.patch_len < data.shape[0],
-                                          range(0, data.shape[0], self.patch_len)))
-        random.seed(self.seed)
-        sample_patches = random.sample(patch_start_indexes,
-                                       max(math.floor(len(patch_start_indexes) * self.fraction), 1))
+        sample_patches = sample_index_cache.get(self, data.shape, self._sample_patches)
         return np.hstack([data[coord:coord + self.patch_len] for coord in sample_patches])
+
+    def _sample_patches(self, shape: tuple[int, ...]) -> np.ndarray:
+        patch_start_indexes = list(filter(lambda x: x + self.patch_len < shape[0],
+                                          range(0, shape[0], self.patch_len)))
+        sample_patches = random.Random(self.seed).sample(patch_start_indexes,
+                                                         max(math.floor(len(patch_start_indexes) * self.fraction), 1))
+        return np.asarray(sample_patches, dtype=np.intp)
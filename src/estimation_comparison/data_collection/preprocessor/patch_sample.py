@@ -21,6 +21,7 @@ import numpy as np
 from traitlets import Int, Float
 
 from estimation_comparison.data_collection.preprocessor import BaseSampler
+from estimation_comparison.data_collection.preprocessor.index_cache import sample_index_cache
 
 
 class PatchSampler(BaseSampler[np.ndarray]):
@@ -37,15 +38,18 @@ class PatchSampler(BaseSampler[np.ndarray]):
             raise ValueError(
                 f"Requested patch width is too wide for supplied data: {self.patch_dim} > {data.shape[1]}")
 
-        patch_start_rows = range(0, data.shape[0], self.patch_dim)
-        patch_start_cols = range(0, data.shape[1], self.patch_dim)
-        all_patches = list(itertools.product(patch_start_rows, patch_start_cols))
-        random.seed(self.seed)
-        sample_patches = random.sample(all_patches, math.floor(len(all_patches) * self.fraction))
+        sample_patches = sample_index_cache.get(self, data.shape, self._sample_patches)
         return np.hstack(
             [data[coord[0]:coord[0] + self.patch_dim, coord[1]:coord[1] + self.patch_dim, :].flatten() for coord in
              sample_patches])
 
+    def _sample_patches(self, shape: tuple[int, ...]) -> np.ndarray:
+        patch_start_rows = range(0, shape[0], self.patch_dim)
+        patch_start_cols = range(0, shape[1], self.patch_dim)
+        all_patches = list(itertools.product(patch_start_rows, patch_start_cols))
+        sample_patches = random.Random(self.seed).sample(all_patches, math.floor(len(all_patches) * self.fraction))
+        return np.asarray(sample_patches, dtype=np.intp).reshape((-1, 2))
+
 # class PatchSamplerBytes(BaseSampler[bytes]):
 #     seed = Int(1337)
 #     patch_dim = Int(18)
@@ -16,7 +16,7 @@ from abc import ABC
 
 import numpy as np
 # noinspection PyProtectedMember
-from traitlets import HasTraits
+from traitlets import HasTraits, Instance, List
 
 
 class BaseSamplerMeta(type(ABC), type(HasTraits)):
@@ -29,3 +29,13 @@ class BaseSampler[T](ABC, HasTraits, metaclass=BaseSamplerMeta):
 class FlattenSampler(BaseSampler[np.ndarray]):
     def run(self, data: np.ndarray) -> np.ndarray:
         return data.flatten()
+
+
+class ChainSampler(BaseSampler[np.ndarray]):
+    """Runs each stage on the output of the previous one, e.g. downsample and then take patches"""
+    stages = List(Instance(BaseSampler))
+
+    def run(self, data: np.ndarray) -> np.ndarray:
+        for stage in self.stages:
+            data = stage.run(data)
+        return data
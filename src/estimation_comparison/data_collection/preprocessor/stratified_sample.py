@@ -0,0 +1,110 @@
+#  Copyright (C) 2025 Julian Nowaczek.
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import math
+
+import numpy as np
+# noinspection PyProtectedMember
+from traitlets import Int, Float, Bool
+
+from estimation_comparison.data_collection.preprocessor import BaseSampler
+from estimation_comparison.data_collection.preprocessor.index_cache import sample_index_cache
+
+
+def _stratum_indexes(count: int, step: float, offsets: np.ndarray, axis: int = 0) -> np.ndarray:
+    # Stratum i covers [i * step, (i + 1) * step), pick the index at the given offset inside it
+    shape = [1] * offsets.ndim
+    shape[axis] = -1
+    starts = np.arange(offsets.shape[axis]).reshape(shape) * step
+    return np.minimum(np.floor(starts + offsets).astype(np.intp), count - 1)
+
+
+def _stratum_widths(count: int, step: float, strata: int) -> np.ndarray:
+    # The last stratum is cut short where the data ends
+    return np.minimum(step, count - np.arange(strata) * step)
+
+
+class StratifiedPatchSampler(BaseSampler[np.ndarray]):
+    """Like PatchSampler, but takes one patch from each cell of an evenly spaced grid instead of a uniform draw
+
+    With jitter the patch is placed at a random position inside its cell (jittered/blue-noise sampling), otherwise
+    the centre of each cell is used.
+    """
+    seed = Int(1337)
+    # An (18, 18, 3) patch is 972 bytes
+    patch_dim = Int(18)
+    fraction = Float(0.1)
+    jitter = Bool(False)
+
+    def run(self, data: np.ndarray) -> np.ndarray:
+        if self.patch_dim > data.shape[0]:
+            raise ValueError(
+                f"Requested patch height is too tall for supplied data: {self.patch_dim} > {data.shape[0]}")
+        if self.patch_dim > data.shape[1]:
+            raise ValueError(
+                f"Requested patch width is too wide for supplied data: {self.patch_dim} > {data.shape[1]}")
+
+        sample_patches = sample_index_cache.get(self, data.shape, self._sample_patches)
+        return np.hstack(
+            [data[row:row + self.patch_dim, col:col + self.patch_dim, :].flatten() for row, col in sample_patches])
+
+    def _sample_patches(self, shape: tuple[int, ...]) -> np.ndarray:
+        patch_rows = math.ceil(shape[0] / self.patch_dim)
+        patch_cols = math.ceil(shape[1] / self.patch_dim)
+        # Split the fraction evenly between both axes so the cells stay square
+        step = 1 / math.sqrt(self.fraction)
+        cells = (math.ceil(patch_rows / step), math.ceil(patch_cols / step))
+
+        if self.jitter:
+            # Uniform over each cell's actual extent, so a partial last cell does not favour the final patch
+            rng = np.random.default_rng(self.seed)
+            row_offsets = rng.random(cells) * _stratum_widths(patch_rows, step, cells[0])[:, None]
+            col_offsets = rng.random(cells) * _stratum_widths(patch_cols, step, cells[1])[None, :]
+        else:
+            row_offsets = col_offsets = np.full(cells, step / 2)
+
+        rows = _stratum_indexes(patch_rows, step, row_offsets, axis=0).flatten()
+        cols = _stratum_indexes(patch_cols, step, col_offsets, axis=1).flatten()
+        # Neighbouring cells can land on the same patch when a cell is narrower than two patches
+        return np.unique(np.stack([rows, cols], axis=1), axis=0) * self.patch_dim
+
+
+class StratifiedLinearSampler(BaseSampler[np.ndarray]):
+    """Like LinearSampler, but takes one run from each of a set of evenly spaced strata of the flattened data"""
+    seed = Int(1337)
+    # An (18, 18, 3) patch is 972 bytes
+    patch_len = Int(18 * 18)
+    fraction = Float(0.1)
+    jitter = Bool(False)
+
+    def run(self, data: np.ndarray) -> np.ndarray:
+        data = data.flatten()
+        if self.patch_len > data.shape[0]:
+            raise ValueError(
+                f"Requested patch length is too long for supplied data: {self.patch_len} > {data.shape[0]}")
+
+        sample_patches = sample_index_cache.get(self, data.shape, self._sample_patches)
+        return np.hstack([data[start:start + self.patch_len] for start in sample_patches])
+
+    def _sample_patches(self, shape: tuple[int, ...]) -> np.ndarray:
+        patch_count = len(range(0, shape[0] - self.patch_len, self.patch_len))
+        step = 1 / self.fraction
+        strata = math.ceil(patch_count / step)
+
+        if self.jitter:
+            offsets = np.random.default_rng(self.seed).random(strata) * _stratum_widths(patch_count, step, strata)
+        else:
+            offsets = np.full(strata, step / 2)
+
+        return np.unique(_stratum_indexes(patch_count, step, offsets)) * self.patch_len
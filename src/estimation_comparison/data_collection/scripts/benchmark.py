@@ -17,13 +17,15 @@ import functools
 import itertools
 import logging
 import pathlib
+from collections import defaultdict
 from pathlib import Path
 from timeit import default_timer
-from typing import List, Optional
+from typing import List, Optional, Tuple, Iterator
 
 import dask.array as da
 import numpy as np
 from dask.distributed import Client, as_completed
+from distributed.system import MEMORY_LIMIT
 from imagecodecs import tiff_check, tiff_decode
 
 from estimation_comparison.data_collection.compressor.general import *
@@ -31,23 +33,39 @@ from estimation_comparison.data_collection.compressor.image import *
 from estimation_comparison.data_collection.compressor.image.webp import WebPCompressor
 from estimation_comparison.data_collection.estimator import *
 from estimation_comparison.data_collection.estimator.byte_count_gte import ByteCountGte
-from estimation_comparison.data_collection.preprocessor import FlattenSampler, PatchSampler
+from estimation_comparison.data_collection.preprocessor import FlattenSampler, PatchSampler, DownsampleSampler, \
+    ChainSampler, StratifiedPatchSampler, StratifiedLinearSampler
+from estimation_comparison.data_collection.preprocessor.index_cache import sample_index_cache_info
 from estimation_comparison.data_collection.preprocessor.linear_sample import LinearSampler
 from estimation_comparison.data_collection.summary_stats import max_outside_middle_notch, autocorrelation_lag, \
     proportion_above_metric_cutoff, mean_inside_middle_notch
 from estimation_comparison.database import BenchmarkDatabase
+from estimation_comparison.intermediate_store import IntermediateStore
+from estimation_comparison.parquet_sink import ParquetSink
 from estimation_comparison.model import Compressor, Estimator, Preprocessor, InputFile, IntermediateEstimationResult, \
     EstimationResult, LoadedData, BlockSummaryFunc, FileSummaryFunc, PreprocessedData
 
 
+# Worker memory needed per byte of input file when estimating in batches, this covers the decoded image, the
+# preprocessed copy, the float64 blocks and the double length correlation output
+BATCH_MEMORY_FACTOR = 32
+# Share of a worker thread's memory that a single batch may use
+BATCH_MEMORY_FRACTION = 0.5
+MAX_BATCH_FILES = 64
+
+
 class Benchmark:
-    def __init__(self, input_dir: List[str], output_dir: str, tags_csv: str, skip_hash_check: bool):
+    def __init__(self, input_dir: List[str], output_dir: str, tags_csv: str, skip_hash_check: bool,
+                 intermediate_store: Optional[IntermediateStore] = None,
+                 parquet_sink: Optional[ParquetSink] = None):
         self._init_time = default_timer()
         self._tags_csv: Optional[pathlib.Path] = Path(tags_csv)
         self.data_locations = input_dir
         self.output_dir = output_dir
         self.database = BenchmarkDatabase(Path(self.output_dir) / "benchmark.sqlite")
         self.skip_hash_check = skip_hash_check
+        self.intermediate_store = intermediate_store
+        self.parquet_sink = parquet_sink
 
         self._preprocessors: List[Preprocessor] = [
             Preprocessor(name="entire_file", instance=FlattenSampler()),
@@ -57,6 +75,26 @@ class Benchmark:
             Preprocessor(name="linear_random_25%", instance=LinearSampler(fraction=0.25, patch_dim=18)),
             Preprocessor(name="linear_random_50%", instance=LinearSampler(fraction=0.5, patch_dim=18)),
             Preprocessor(name="linear_random_75%", instance=LinearSampler(fraction=0.75, patch_dim=18)),
+            Preprocessor(name="patch_stratified_10%", instance=StratifiedPatchSampler(fraction=0.1, patch_dim=18)),
+            Preprocessor(name="patch_stratified_25%", instance=StratifiedPatchSampler(fraction=0.25, patch_dim=18)),
+            Preprocessor(name="patch_jittered_10%",
+                         instance=StratifiedPatchSampler(fraction=0.1, patch_dim=18, jitter=True)),
+            Preprocessor(name="patch_jittered_25%",
+                         instance=StratifiedPatchSampler(fraction=0.25, patch_dim=18, jitter=True)),
+            Preprocessor(name="linear_stratified_10%", instance=StratifiedLinearSampler(fraction=0.1)),
+            Preprocessor(name="linear_stratified_25%", instance=StratifiedLinearSampler(fraction=0.25)),
+            Preprocessor(name="linear_jittered_10%", instance=StratifiedLinearSampler(fraction=0.1, jitter=True)),
+            Preprocessor(name="linear_jittered_25%", instance=StratifiedLinearSampler(fraction=0.25, jitter=True)),
+            Preprocessor(name="downsample_mean_2x", instance=DownsampleSampler(factor=2)),
+            Preprocessor(name="downsample_mean_4x", instance=DownsampleSampler(factor=4)),
+            Preprocessor(name="downsample_mean_8x", instance=DownsampleSampler(factor=8)),
+            Preprocessor(name="downsample_decimate_4x", instance=DownsampleSampler(factor=4, method="decimate")),
+            Preprocessor(name="downsample_mean_2x_patch_random_25%",
+                         instance=ChainSampler(stages=[DownsampleSampler(factor=2),
+                                                       PatchSampler(fraction=0.25, patch_dim=18)])),
+            Preprocessor(name="downsample_mean_4x_patch_random_25%",
+                         instance=ChainSampler(stages=[DownsampleSampler(factor=4),
+                                                       PatchSampler(fraction=0.25, patch_dim=18)])),
         ]
 
         self._block_summary_funcs: List[BlockSummaryFunc] = [
@@ -161,7 +199,12 @@ class Benchmark:
             logging.info("Updating benchmark database file tags")
             self.database.update_tags(self._tags_csv)
         logging.info("Updating benchmark database compression results")
-        self.database.update_compression_results(self.client, self._compressors)
+        self.database.update_compression_results(self.client, self._compressors, self.parquet_sink)
+
+    def _record_estimation(self, result: EstimationResult):
+        self.database.update_estimation_result(result)
+        if self.parquet_sink is not None:
+            self.parquet_sink.add_estimation(result)
 
     @staticmethod
     def _load_file(file: InputFile) -> LoadedData | None:
@@ -183,10 +226,14 @@ class Benchmark:
 
     @staticmethod
     def _run_estimator(estimator: Estimator, bsf: BlockSummaryFunc, fsf: FileSummaryFunc,
-                       ppd: PreprocessedData) -> IntermediateEstimationResult | None:
+                       ppd: PreprocessedData,
+                       store: Optional[IntermediateStore] = None) -> IntermediateEstimationResult | None:
         try:
-            return IntermediateEstimationResult.from_preprocessed_data(ppd, estimator.instance.run(ppd.data), estimator,
-                                                                       bsf, fsf)
+            ier = IntermediateEstimationResult.from_preprocessed_data(ppd, estimator.instance.run(ppd.data), estimator,
+                                                                      bsf, fsf)
+            if store is not None:
+                store.save(ier)
+            return ier
         except Exception as e:
             logging.exception(f"Error estimating {ppd.input_file}: {e}")
 
@@ -212,6 +259,177 @@ class Benchmark:
         except Exception as e:
             logging.exception(f"Error running {ier.file_summary_func} on {ier.input_file}: {e}")
 
+    @staticmethod
+    def _run_block_summary_batch(bsf: Optional[BlockSummaryFunc], estimates: list | np.ndarray) -> list:
+        if bsf is None:
+            return list(estimates)
+        memoized = functools.partial(bsf.instance, **(bsf.parameters if bsf.parameters is not None else {}))
+        try:
+            # Same-shape block matrices are summarized for the whole batch in one call
+            return list(np.apply_along_axis(memoized, -1, np.asarray(estimates)))
+        except ValueError:
+            return [np.apply_along_axis(memoized, 1, e) for e in estimates]
+
+    @staticmethod
+    def _run_estimation_batch(preprocessor: Preprocessor, estimator: Estimator,
+                              summary_funcs: List[Tuple[Optional[BlockSummaryFunc], Optional[FileSummaryFunc]]],
+                              files: List[InputFile],
+                              store: Optional[IntermediateStore] = None) -> List[EstimationResult]:
+        results = []
+        same_shape = defaultdict(list)
+        for file in files:
+            loaded = Benchmark._load_file(file)
+            if loaded is None:
+                continue
+            try:
+                ppd = Benchmark._preprocess_file(preprocessor, loaded)
+            except Exception as e:
+                logging.exception(f"Error preprocessing {file}: {e}")
+                continue
+            ppd.data = np.asarray(ppd.data)
+            same_shape[(ppd.data.shape, ppd.data.dtype)].append(ppd)
+
+        for batch in same_shape.values():
+            try:
+                estimates = estimator.instance.estimate_batch(np.stack([ppd.data for ppd in batch]))
+            except Exception as e:
+                logging.exception(f"Error estimating batch of {len(batch)} files: {e}")
+                continue
+
+            if store is not None:
+                for ppd, estimate in zip(batch, estimates):
+                    store.save(IntermediateEstimationResult.from_preprocessed_data(ppd, estimate, estimator, None,
+                                                                                   None))
+
+            for bsf, fsf in summary_funcs:
+                try:
+                    block_summaries = Benchmark._run_block_summary_batch(bsf, estimates)
+                except Exception as e:
+                    logging.exception(f"Error running {bsf} on batch of {len(batch)} files: {e}")
+                    continue
+                for ppd, summary in zip(batch, block_summaries):
+                    result = Benchmark._run_file_summary(
+                        IntermediateEstimationResult.from_preprocessed_data(ppd, summary, estimator, bsf, fsf))
+                    if result is not None:
+                        results.append(result)
+        return results
+
+    def _batch_memory_budget(self) -> int:
+        workers = self.client.scheduler_info()["workers"].values()
+        per_thread = min((w["memory_limit"] or MEMORY_LIMIT) / w["nthreads"] for w in workers)
+        return int(per_thread * BATCH_MEMORY_FRACTION)
+
+    @staticmethod
+    def _memory_batches(files: List[InputFile], budget: int) -> Iterator[List[InputFile]]:
+        # Sorting by size keeps images of the same resolution next to each other so they end up stacked together
+        batch, batch_bytes = [], 0
+        for file in sorted(files, key=lambda f: f.size_bytes):
+            file_bytes = file.size_bytes * BATCH_MEMORY_FACTOR
+            if batch and (batch_bytes + file_bytes > budget or len(batch) >= MAX_BATCH_FILES):
+                yield batch
+                batch, batch_bytes = [], 0
+            batch.append(file)
+            batch_bytes += file_bytes
+        if batch:
+            yield batch
+
+    def run_batched(self):
+        start_time = default_timer()
+        completed_tasks = 0
+
+        estimation_tasks = self.database.get_missing_estimation_results()
+        budget = self._batch_memory_budget()
+        logging.info(f"Batching estimation with a {budget / 2 ** 20:.0f} MiB memory budget per task")
+
+        # One estimator run per (preprocessor, estimator, file), shared by all of its summary functions
+        groups = defaultdict(lambda: (dict(), set()))
+        for task in estimation_tasks:
+            files, summaries = groups[(task.preprocessor_name, task.estimator_name)]
+            files[task.input_file.hash] = task.input_file
+            summaries.add((task.block_summary_func_name, task.file_summary_func_name))
+
+        estimation_results = []
+        for (preprocessor_name, estimator_name), (files, summaries) in groups.items():
+            preprocessor = next(filter(lambda x: x.name == preprocessor_name, self._preprocessors))
+            estimator = next(filter(lambda x: x.name == estimator_name, self._estimators))
+            summary_funcs = [(next(filter(lambda x: x.name == bsf_name, self._block_summary_funcs), None),
+                              next(filter(lambda x: x.name == fsf_name, self._file_summary_funcs), None))
+                             for bsf_name, fsf_name in sorted(summaries)]
+            for batch in self._memory_batches(list(files.values()), budget):
+                estimation_results.append(self.client.submit(self._run_estimation_batch, preprocessor=preprocessor,
+                                                             estimator=estimator, summary_funcs=summary_funcs,
+                                                             files=batch, store=self.intermediate_store))
+
+        for future, results in as_completed(estimation_results, with_results=True):
+            for result in results:
+                completed_tasks += 1
+                try:
+                    self._record_estimation(result)
+                except Exception as e:
+                    logging.exception(f"Input file '{result.input_file.name}' raised exception\n\t{e}")
+            logging.info(
+                f"{completed_tasks}/{len(estimation_tasks)} estimation tasks complete, {completed_tasks / len(estimation_tasks) * 100:.2f}%")
+
+        logging.info(f"Batched estimation completed in {default_timer() - start_time:.3f} seconds")
+        logging.info(f"Benchmark completed in {default_timer() - self._init_time:.3f} seconds")
+
+    @staticmethod
+    def _run_summaries_from_store(store: IntermediateStore, preprocessor: Preprocessor, estimator: Estimator,
+                                  summary_funcs: List[Tuple[Optional[BlockSummaryFunc], Optional[FileSummaryFunc]]],
+                                  file: InputFile) -> List[EstimationResult]:
+        results = []
+        stored = store.load(file.hash, preprocessor, estimator)
+        for bsf, fsf in summary_funcs:
+            ier = Benchmark._run_block_summary(
+                IntermediateEstimationResult(result=stored, input_file=file, preprocessor=preprocessor,
+                                             estimator=estimator, block_summary_func=bsf, file_summary_func=fsf))
+            result = Benchmark._run_file_summary(ier) if ier is not None else None
+            if result is not None:
+                results.append(result)
+        return results
+
+    def run_summaries_only(self):
+        """Evaluates missing summary function results from stored estimator outputs, without loading any input"""
+        start_time = default_timer()
+        completed_tasks = 0
+        skipped_tasks = 0
+
+        estimation_tasks = self.database.get_missing_estimation_results()
+
+        groups = defaultdict(set)
+        for task in estimation_tasks:
+            preprocessor = next(filter(lambda x: x.name == task.preprocessor_name, self._preprocessors))
+            estimator = next(filter(lambda x: x.name == task.estimator_name, self._estimators))
+            if not self.intermediate_store.contains(task.input_file.hash, preprocessor, estimator):
+                skipped_tasks += 1
+                continue
+            groups[(task.preprocessor_name, task.estimator_name, task.input_file.hash, task.input_file.path,
+                    task.input_file.name, task.input_file.size_bytes)].add(
+                (task.block_summary_func_name, task.file_summary_func_name))
+
+        estimation_results = []
+        for (preprocessor_name, estimator_name, *file), summaries in groups.items():
+            preprocessor = next(filter(lambda x: x.name == preprocessor_name, self._preprocessors))
+            estimator = next(filter(lambda x: x.name == estimator_name, self._estimators))
+            summary_funcs = [(next(filter(lambda x: x.name == bsf_name, self._block_summary_funcs), None),
+                              next(filter(lambda x: x.name == fsf_name, self._file_summary_funcs), None))
+                             for bsf_name, fsf_name in sorted(summaries)]
+            estimation_results.append(self.client.submit(self._run_summaries_from_store, store=self.intermediate_store,
+                                                         preprocessor=preprocessor, estimator=estimator,
+                                                         summary_funcs=summary_funcs, file=InputFile(*file)))
+
+        for future, results in as_completed(estimation_results, with_results=True):
+            for result in results:
+                completed_tasks += 1
+                try:
+                    self._record_estimation(result)
+                except Exception as e:
+                    logging.exception(f"Input file '{result.input_file.name}' raised exception\n\t{e}")
+
+        if skipped_tasks:
+            logging.warning(f"Skipped {skipped_tasks} estimation tasks without a stored intermediate result")
+        logging.info(f"Summarized {completed_tasks} results in {default_timer() - start_time:.3f} seconds")
+
     def run(self):
         start_time = default_timer()
         completed_tasks = 0
@@ -237,7 +455,7 @@ class Benchmark:
                 except StopIteration:
                     fsf = None
                 estimated = self.client.submit(self._run_estimator, estimator=estimator, bsf=bsf,
-                                               fsf=fsf, ppd=preprocessed)
+                                               fsf=fsf, ppd=preprocessed, store=self.intermediate_store)
 
                 block_summarized = self.client.submit(self._run_block_summary, ier=estimated)
 
@@ -248,10 +466,12 @@ class Benchmark:
                 logging.info(
                     f"{completed_tasks}/{len(estimation_tasks)} estimation tasks complete, {completed_tasks / len(estimation_tasks) * 100:.2f}%")
                 try:
-                    self.database.update_estimation_result(result)
+                    self._record_estimation(result)
                 except Exception as e:
                     logging.exception(f"Input file '{result.input_file.name}' raised exception\n\t{e}")
 
+        for worker, info in self.client.run(sample_index_cache_info).items():
+            logging.debug(f"Sample index cache on {worker}: {info}")
         logging.info(f"Estimation completed in {default_timer() - start_time:.3f} seconds")
         logging.info(f"Benchmark completed in {default_timer() - self._init_time:.3f} seconds")
 
@@ -264,14 +484,41 @@ def main():
     parser.add_argument("-l", "--limit-files", type=int, dest="file_limit", default=0)
     parser.add_argument("-o", "--output-dir", type=str, dest="output_dir", default="./benchmarks")
     parser.add_argument("-t", "--tags-csv", type=str, dest="tags_csv", default=None)
+    parser.add_argument("-b", "--batch", dest="batch", action="store_true",
+                        help="estimate same-shape files in memory-bounded batches")
+    parser.add_argument("--store-intermediate", dest="store_intermediate", action="store_true",
+                        help="keep estimator outputs under <output dir>/intermediate before summarizing them")
+    parser.add_argument("--compress-intermediate", dest="compress_intermediate", action="store_true",
+                        help="store intermediate results compressed (.npz) instead of memory-mappable (.npy)")
+    parser.add_argument("--summaries-only", dest="summaries_only", action="store_true",
+                        help="only evaluate summary functions from stored intermediate results")
+    parser.add_argument("--parquet", dest="parquet", action="store_true",
+                        help="also write new results to a Parquet dataset under <output dir>/parquet")
     args = parser.parse_args()
 
     logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO)
 
-    benchmark = Benchmark(args.dir, args.output_dir, args.tags_csv, args.skip_hash_check)
-    benchmark.update_database()
-
-    benchmark.run()
+    intermediate_store = None
+    if args.store_intermediate or args.summaries_only:
+        intermediate_store = IntermediateStore(Path(args.output_dir) / "intermediate",
+                                               compress=args.compress_intermediate)
+
+    parquet_sink = ParquetSink(Path(args.output_dir) / "parquet") if args.parquet else None
+
+    benchmark = Benchmark(args.dir, args.output_dir, args.tags_csv, args.skip_hash_check, intermediate_store,
+                          parquet_sink)
+    try:
+        benchmark.update_database()
+
+        if args.summaries_only:
+            benchmark.run_summaries_only()
+        elif args.batch:
+            benchmark.run_batched()
+        else:
+            benchmark.run()
+    finally:
+        if parquet_sink is not None:
+            parquet_sink.close()
 
 
 if __name__ == "__main__":
@@ -26,25 +26,140 @@
 #  along with this program.  If not, see <https://www.gnu.org/licenses/>.
 import csv
 import hashlib
+import json
 import logging
 import os
-import pickle
 import sqlite3
+import threading
 from pathlib import Path
 from timeit import default_timer
-from typing import Tuple, List, Optional
+from typing import Tuple, List, Optional, Iterator, Dict
 
 import dask.distributed
+import pyarrow as pa
 
 from estimation_comparison.model import InputFile, Compressor, Estimator, \
     Preprocessor, EstimationResult, CompressionResult, FileSummaryFunc, BlockSummaryFunc, EstimationTask, \
     CompressionTask
+from estimation_comparison.parquet_sink import ParquetSink
+
+
+# How long a connection waits on another one holding a lock before giving up with "database is locked"
+BUSY_TIMEOUT_SECONDS = 30.0
+
+# Tags with an id up to this are kept as bit tag_id - 1 of files.tag_mask, the rest only in file_tags
+TAG_MASK_BITS = 63
+
+# Rows per fetchmany() when building columnar results, bounds how many row tuples are alive at once
+COLUMNAR_CHUNK_ROWS = 65_536
+
+# Arrow types of the columns returned by the dataframe queries, anything else is inferred per chunk
+_arrow_types = {
+    "file_hash": pa.string(),
+    "preprocessor_id": pa.int64(),
+    "estimator_id": pa.int64(),
+    "block_summary_func_id": pa.int64(),
+    "file_summary_func_id": pa.int64(),
+    "compressor_id": pa.int64(),
+    "quality_id": pa.int64(),
+    "metric": pa.float64(),
+    "initial_size": pa.int64(),
+    "final_size": pa.int64(),
+    "percent_size_reduction": pa.float64(),
+    "quality": pa.string(),
+    "tags": pa.string(),
+    "tag": pa.string(),
+    "tag_mask": pa.int64(),
+    "preprocessor": pa.string(),
+    "estimator": pa.string(),
+    "block_summary_func": pa.string(),
+    "file_summary_func": pa.string(),
+    "compressor": pa.string(),
+    "n": pa.int64(),
+    "series_index": pa.int64(),
+}
+
+# Columns identifying a (preprocessor, estimator, bsf, fsf, compressor) series
+_series_columns = ["preprocessor_id", "estimator_id", "block_summary_func_id", "file_summary_func_id", "compressor_id"]
+
+# Sufficient statistics of a series over x = metric and y = percent size reduction, enough for a closed-form linear or
+# quadratic least squares fit
+_statistics_terms = {"n": "1", "sum_x": "x", "sum_y": "y", "sum_xx": "x * x", "sum_xy": "x * y", "sum_yy": "y * y",
+                     "sum_xxx": "x * x * x", "sum_xxxx": "x * x * x * x", "sum_xxy": "x * x * y"}
+
+
+# Every (series, file) point of the file_estimations x files x compression_results join, as materialized in
+# estimation_compressions. Triggers append a condition narrowing it down to the rows touched by a change.
+_estimation_compression_points = """
+    SELECT fe.preprocessor_id,
+           fe.estimator_id,
+           fe.block_summary_func_id,
+           fe.file_summary_func_id,
+           cr.compressor_id,
+           fe.file_hash,
+           fe.metric,
+           f.size_bytes                                               AS initial_size,
+           cr.size_bytes                                              AS final_size,
+           (1.0 - CAST(cr.size_bytes AS REAL) / f.size_bytes) * 100.0 AS percent_size_reduction
+    FROM file_estimations fe
+             INNER JOIN files f ON f.file_hash = fe.file_hash
+             INNER JOIN compression_results cr ON cr.file_hash = fe.file_hash
+    WHERE fe.block_summary_func_id IS NOT NULL
+      AND fe.file_summary_func_id IS NOT NULL
+    """
+
+
+def _placeholders(values) -> str:
+    """(?, ?, ...) for binding a list to an IN, SQLite has no array parameters"""
+    return f"({', '.join('?' * len(values))})"
+
+
+def _statistics_update(row: str, sign: int) -> str:
+    """Adds (sign 1) or removes (sign -1) the NEW or OLD estimation_compressions row to/from series_statistics"""
+    statistics = ", ".join(f"{sign} * ({t})" for t in _statistics_terms.values())
+    updates = ", ".join(f"{c} = {c} + excluded.{c}" for c in _statistics_terms)
+    # Removing the last point of a series leaves only rounding residue behind, drop the row instead
+    key = " AND ".join(f"{c} = {row}.{c}" for c in _series_columns)
+    cleanup = f"DELETE FROM series_statistics WHERE {key} AND n = 0;" if sign < 0 else ""
+    return f"""
+        INSERT INTO series_statistics
+        SELECT {", ".join(f"{row}.{c}" for c in _series_columns)}, {statistics}
+        FROM (SELECT {row}.metric AS x, {row}.percent_size_reduction AS y)
+        WHERE y IS NOT NULL
+        ON CONFLICT ({", ".join(_series_columns)}) DO UPDATE SET {updates};
+        {cleanup}
+        """
 
 
 class BenchmarkDatabase:
-    def __init__(self, db_path: Path):
-        self.con = sqlite3.connect(db_path)
-        self._create_tables()
+    def __init__(self, db_path: Path, read_only: bool = False):
+        """With read_only set the schema is left alone and every thread gets its own read-only connection, so
+        dashboards can query from their server threads while a benchmark is writing to the same file"""
+        self.db_path = Path(db_path)
+        self.read_only = read_only
+        self._local = threading.local()
+        if not read_only:
+            # WAL lets readers keep going during write transactions, NORMAL syncs only at checkpoints in WAL mode
+            self.con.execute("PRAGMA journal_mode = WAL")
+            self.con.execute("PRAGMA synchronous = NORMAL")
+            self._create_tables()
+            self._migrate()
+
+    @property
+    def con(self) -> sqlite3.Connection:
+        """Connection of the calling thread"""
+        con = getattr(self._local, "con", None)
+        if con is None:
+            if self.read_only:
+                con = sqlite3.connect(f"{self.db_path.resolve().as_uri()}?mode=ro", uri=True,
+                                      timeout=BUSY_TIMEOUT_SECONDS)
+            else:
+                con = sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT_SECONDS)
+            # REPLACE conflict resolution only fires the delete triggers that keep estimation_compressions and
+            # series_statistics current with this on
+            con.execute("PRAGMA recursive_triggers = ON")
+            self._local.con = con
+        return con
 
     def _create_tables(self):
         self.con.execute(
@@ -80,7 +195,7 @@ class BenchmarkDatabase:
             (
                 compressor_id INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL,
                 name          TEXT                              NOT NULL UNIQUE,
-                parameters    BLOB
+                config_hash   TEXT UNIQUE
             )
             """)
         self.con.commit()
@@ -118,7 +233,7 @@ class BenchmarkDatabase:
             (
                 estimator_id    INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL,
                 name            TEXT                              NOT NULL UNIQUE,
-                parameters      BLOB,
+                config_hash     TEXT UNIQUE,
                 summarize_block BOOLEAN                           NOT NULL,
                 summarize_file  BOOLEAN                           NOT NULL
             )
@@ -145,7 +260,7 @@ class BenchmarkDatabase:
             (
                 preprocessor_id INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL,
                 name            TEXT                              NOT NULL UNIQUE,
-                parameters      BLOB
+                config_hash     TEXT UNIQUE
             )
             """)
         self.con.commit()
@@ -155,7 +270,7 @@ class BenchmarkDatabase:
             (
                 block_summary_id INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL,
                 name             TEXT                              NOT NULL UNIQUE,
-                parameters       BLOB
+                config_hash      TEXT UNIQUE
             )
             """)
         self.con.execute(
@@ -170,7 +285,7 @@ class BenchmarkDatabase:
             (
                 file_summary_id INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL,
                 name            TEXT                              NOT NULL UNIQUE,
-                parameters      BLOB
+                config_hash     TEXT UNIQUE
             )
             """)
         self.con.execute(
@@ -180,81 +295,352 @@ class BenchmarkDatabase:
             """)
         self.con.commit()
 
-    def update_estimators(self, estimators: List[Estimator]):
-        try:
-            estimator_list = []
-            for e in estimators:
-                estimator_list.append(
-                    {"name": e.name, "parameters": pickle.dumps(e.instance.traits(), protocol=pickle.HIGHEST_PROTOCOL),
-                     "summarize_block": e.summarize_block, "summarize_file": e.summarize_file})
+    # Config tables, their id column and the result columns that reference them
+    _config_tables = {
+        "estimators": ("estimator_id", [("file_estimations", "estimator_id")]),
+        "preprocessors": ("preprocessor_id", [("file_estimations", "preprocessor_id")]),
+        "compressors": ("compressor_id", [("compression_results", "compressor_id")]),
+        "block_summary_funcs": ("block_summary_id", [("file_estimations", "block_summary_func_id")]),
+        "file_summary_funcs": ("file_summary_id", [("file_estimations", "file_summary_func_id")]),
+    }
 
-            self.con.executemany(
+    def _migrate(self):
+        version = self.con.execute("PRAGMA user_version").fetchone()[0]
+        if version < 1:
+            # Config identity moved from pickled traits() blobs to a hash of the canonical parameters. Existing rows
+            # get a NULL hash and adopt the hash of whichever config is registered under their name next.
+            for table in self._config_tables:
+                columns = [row[1] for row in self.con.execute(f"PRAGMA table_info({table})")]
+                if "config_hash" not in columns:
+                    self.con.execute(f"ALTER TABLE {table} ADD COLUMN config_hash TEXT")
+                    self.con.execute(f"CREATE UNIQUE INDEX {table}_config_hash ON {table} (config_hash)")
+                if "parameters" in columns:
+                    self.con.execute(f"ALTER TABLE {table} DROP COLUMN parameters")
+            self.con.execute("PRAGMA user_version = 1")
+            self.con.commit()
+        if version < 2:
+            # Re-runs could insert the same compression result twice, keep the most recent one
+            self.con.execute(
+                """
+                DELETE
+                FROM compression_results
+                WHERE rowid NOT IN (SELECT MAX(rowid) FROM compression_results GROUP BY file_hash, compressor_id)
+                """)
+            self.con.execute(
+                """
+                CREATE UNIQUE INDEX IF NOT EXISTS compression_results_file_compressor
+                    ON compression_results (file_hash, compressor_id)
+                """)
+            # Covering indexes for the per-series lookups done by get_solo_* and get_plot_dataframe
+            self.con.execute(
                 """
-                INSERT OR IGNORE INTO estimators(name, parameters, summarize_block, summarize_file)
-                VALUES (:name, :parameters, :summarize_block, :summarize_file)
-                """, estimator_list)
+                CREATE INDEX IF NOT EXISTS compression_results_compressor_file
+                    ON compression_results (compressor_id, file_hash, size_bytes)
+                """)
+            self.con.execute(
+                """
+                CREATE INDEX IF NOT EXISTS file_estimations_series
+                    ON file_estimations (preprocessor_id, estimator_id, block_summary_func_id, file_summary_func_id,
+                                         file_hash, metric)
+                """)
+            self.con.execute("CREATE INDEX IF NOT EXISTS files_name ON files (name)")
+            self.con.execute("PRAGMA user_version = 2")
             self.con.commit()
+        if version < 3:
+            self.con.execute(
+                f"""
+                CREATE TABLE IF NOT EXISTS series_statistics
+                (
+                    preprocessor_id       INTEGER NOT NULL,
+                    estimator_id          INTEGER NOT NULL,
+                    block_summary_func_id INTEGER NOT NULL,
+                    file_summary_func_id  INTEGER NOT NULL,
+                    compressor_id         INTEGER NOT NULL,
+                    {", ".join(f"{c} {'INTEGER' if c == 'n' else 'REAL'} NOT NULL" for c in _statistics_terms)},
+                    PRIMARY KEY ({", ".join(_series_columns)})
+                )
+                """)
+            self.con.execute(
+                f"""
+                INSERT INTO series_statistics
+                SELECT {", ".join(_series_columns)}, {", ".join(f"SUM({t})" for t in _statistics_terms.values())}
+                FROM (SELECT *, metric AS x, percent_size_reduction AS y FROM ({_estimation_compression_points}))
+                WHERE y IS NOT NULL
+                GROUP BY {", ".join(_series_columns)}
+                """)
+            self.con.execute("PRAGMA user_version = 3")
+            self.con.commit()
+        if version < 4:
+            self.con.execute(
+                """
+                CREATE TABLE IF NOT EXISTS estimation_compressions
+                (
+                    preprocessor_id        INTEGER NOT NULL,
+                    estimator_id           INTEGER NOT NULL,
+                    block_summary_func_id  INTEGER NOT NULL,
+                    file_summary_func_id   INTEGER NOT NULL,
+                    compressor_id          INTEGER NOT NULL,
+                    file_hash              TEXT    NOT NULL,
+                    metric                 REAL    NOT NULL,
+                    initial_size           INTEGER NOT NULL,
+                    final_size             INTEGER,
+                    percent_size_reduction REAL,
+                    PRIMARY KEY (preprocessor_id, estimator_id, block_summary_func_id, file_summary_func_id,
+                                 compressor_id, file_hash)
+                ) WITHOUT ROWID
+                """)
+            self.con.execute(
+                """
+                CREATE INDEX IF NOT EXISTS estimation_compressions_file
+                    ON estimation_compressions (file_hash, compressor_id)
+                """)
+            self.con.execute(f"INSERT INTO estimation_compressions {_estimation_compression_points}")
+            # series_statistics used to be kept from the source tables directly (user_version 3)
+            for source in ("file_estimations", "compression_results", "files"):
+                for action in ("insert", "delete"):
+                    self.con.execute(f"DROP TRIGGER IF EXISTS {source}_{action}_statistics")
+            self.con.execute("DROP TRIGGER IF EXISTS files_resize_remove_statistics")
+            self.con.execute("DROP TRIGGER IF EXISTS files_resize_add_statistics")
+            for name, (event, body) in self._derived_triggers.items():
+                self.con.execute(f"CREATE TRIGGER IF NOT EXISTS {name} AFTER {event} BEGIN {body} END")
+            self.con.execute("PRAGMA user_version = 4")
+            self.con.commit()
+        if version < 5:
+            self.con.execute(
+                """
+                CREATE TABLE IF NOT EXISTS data_revision
+                (
+                    id       INTEGER PRIMARY KEY CHECK (id = 0),
+                    revision INTEGER NOT NULL
+                )
+                """)
+            self.con.execute("INSERT OR IGNORE INTO data_revision (id, revision) VALUES (0, 0)")
+            for name, event in self._revision_events.items():
+                self.con.execute(
+                    f"""
+                    CREATE TRIGGER IF NOT EXISTS {name}_revision AFTER {event}
+                    BEGIN UPDATE data_revision SET revision = revision + 1; END
+                    """)
+            self.con.execute("PRAGMA user_version = 5")
+            self.con.commit()
+        if version < 6:
+            # The primary key leads with file_hash, tag lookups need the other order
+            self.con.execute("CREATE INDEX IF NOT EXISTS file_tags_tag_file ON file_tags (tag_id, file_hash)")
+            self.con.execute("PRAGMA user_version = 6")
+            self.con.commit()
+        if version < 7:
+            columns = [row[1] for row in self.con.execute("PRAGMA table_info(files)")]
+            if "tag_mask" not in columns:
+                self.con.execute("ALTER TABLE files ADD COLUMN tag_mask INTEGER NOT NULL DEFAULT 0")
+            self.con.execute(
+                f"""
+                UPDATE files
+                SET tag_mask = (SELECT COALESCE(SUM(1 << (tag_id - 1)), 0)
+                                FROM file_tags ft
+                                WHERE ft.file_hash = files.file_hash
+                                  AND tag_id <= {TAG_MASK_BITS})
+                """)
+            for name, (event, body) in self._tag_mask_triggers.items():
+                self.con.execute(f"CREATE TRIGGER IF NOT EXISTS {name} AFTER {event} BEGIN {body} END")
+            self.con.execute("PRAGMA user_version = 7")
+            self.con.commit()
+        if version < 8:
+            # files_update_revision used to fire on every update of files, including unchanged upserts
+            self.con.execute("DROP TRIGGER IF EXISTS files_update_revision")
+            self.con.execute(
+                f"""
+                CREATE TRIGGER files_update_revision AFTER {self._revision_events["files_update"]}
+                BEGIN UPDATE data_revision SET revision = revision + 1; END
+                """)
+            self.con.execute("PRAGMA user_version = 8")
+            self.con.commit()
+        if version < 9:
+            # Revisions restart at 0 in a recreated database, the id tells it apart from the old file at that path
+            columns = [row[1] for row in self.con.execute("PRAGMA table_info(data_revision)")]
+            if "database_id" not in columns:
+                self.con.execute("ALTER TABLE data_revision ADD COLUMN database_id TEXT")
+            self.con.execute("UPDATE data_revision SET database_id = lower(hex(randomblob(16))) "
+                             "WHERE database_id IS NULL")
+            self.con.execute("PRAGMA user_version = 9")
+            self.con.commit()
+
+    # Triggers keeping estimation_compressions in step with its source tables, and series_statistics with it
+    _derived_triggers = {
+        "file_estimations_insert_points": (
+            "INSERT ON file_estimations",
+            f"INSERT OR REPLACE INTO estimation_compressions {_estimation_compression_points} AND fe.rowid = NEW.rowid;"),
+        "file_estimations_delete_points": (
+            "DELETE ON file_estimations",
+            """
+            DELETE
+            FROM estimation_compressions
+            WHERE preprocessor_id = OLD.preprocessor_id
+              AND estimator_id = OLD.estimator_id
+              AND block_summary_func_id = OLD.block_summary_func_id
+              AND file_summary_func_id = OLD.file_summary_func_id
+              AND file_hash = OLD.file_hash;
+            """),
+        "compression_results_insert_points": (
+            "INSERT ON compression_results",
+            f"INSERT OR REPLACE INTO estimation_compressions {_estimation_compression_points} AND cr.rowid = NEW.rowid;"),
+        "compression_results_delete_points": (
+            "DELETE ON compression_results",
+            "DELETE FROM estimation_compressions WHERE file_hash = OLD.file_hash AND compressor_id = OLD.compressor_id;"),
+        "files_insert_points": (
+            "INSERT ON files",
+            f"""
+            INSERT OR REPLACE INTO estimation_compressions {_estimation_compression_points}
+                AND f.file_hash = NEW.file_hash;
+            """),
+        "files_delete_points": (
+            "DELETE ON files",
+            "DELETE FROM estimation_compressions WHERE file_hash = OLD.file_hash;"),
+        "files_resize_points": (
+            "UPDATE OF size_bytes ON files WHEN OLD.size_bytes IS NOT NEW.size_bytes",
+            f"""
+            DELETE FROM estimation_compressions WHERE file_hash = OLD.file_hash;
+            INSERT OR REPLACE INTO estimation_compressions {_estimation_compression_points}
+                AND f.file_hash = NEW.file_hash;
+            """),
+        "estimation_compressions_insert_statistics": (
+            "INSERT ON estimation_compressions", _statistics_update("NEW", 1)),
+        "estimation_compressions_delete_statistics": (
+            "DELETE ON estimation_compressions", _statistics_update("OLD", -1)),
+    }
+
+    # Keep files.tag_mask in step with file_tags
+    _tag_mask_triggers = {
+        "file_tags_insert_mask": (
+            f"INSERT ON file_tags WHEN NEW.tag_id <= {TAG_MASK_BITS}",
+            "UPDATE files SET tag_mask = tag_mask | (1 << (NEW.tag_id - 1)) WHERE file_hash = NEW.file_hash;"),
+        "file_tags_delete_mask": (
+            f"DELETE ON file_tags WHEN OLD.tag_id <= {TAG_MASK_BITS}",
+            "UPDATE files SET tag_mask = tag_mask & ~(1 << (OLD.tag_id - 1)) WHERE file_hash = OLD.file_hash;"),
+    }
+
+    # Changes that can alter the result of a plot query, each bumps data_revision
+    _revision_events = {
+        "estimation_compressions_insert": "INSERT ON estimation_compressions",
+        "estimation_compressions_delete": "DELETE ON estimation_compressions",
+        # Only the columns plot queries read, path changes when a data set is moved
+        "files_update": "UPDATE OF name, size_bytes, quality_id, tag_mask ON files "
+                        "WHEN OLD.name IS NOT NEW.name OR OLD.size_bytes IS NOT NEW.size_bytes "
+                        "OR OLD.quality_id IS NOT NEW.quality_id OR OLD.tag_mask IS NOT NEW.tag_mask",
+        "file_tags_insert": "INSERT ON file_tags",
+        "file_tags_delete": "DELETE ON file_tags",
+        "file_tags_update": "UPDATE ON file_tags",
+        "tag_types_update": "UPDATE ON tag_types",
+        **{f"{table}_update": f"UPDATE OF name ON {table}" for table in _config_tables},
+    }
+
+    def _update_configs(self, table: str, configs: List[dict]):
+        """Registers configs by hash: a known hash under a new name is renamed and keeps its results, a known name
+        with a new hash drops the results of the old config so the planner recomputes exactly those. The whole batch
+        is resolved before anything is written, so configs may swap names."""
+        id_column, result_columns = self._config_tables[table]
+        extra_columns = [k for k in configs[0].keys() if k not in ("name", "config_hash")] if configs else []
+
+        for key, kind in (("config_hash", "parameters"), ("name", "name")):
+            seen = {}
+            for config in configs:
+                if config[key] in seen:
+                    raise ValueError(f"{table} entries '{seen[config[key]]}' and '{config['name']}' have the same "
+                                     f"{kind}, give each config distinct parameters and a distinct name")
+                seen[config[key]] = config["name"]
+
+        rows = self.con.execute(f"SELECT {id_column}, name, config_hash FROM {table}").fetchall()
+        id_by_hash = {config_hash: row_id for row_id, _, config_hash in rows if config_hash is not None}
+        row_by_name = {name: (row_id, config_hash) for row_id, name, config_hash in rows}
+        name_by_id = {row_id: name for row_id, name, _ in rows}
+        batch_hashes = {config["config_hash"] for config in configs}
+
+        renames = []  # (id, old name, new name)
+        rehashes = []  # (id, config, drop results)
+        inserts = []
+        claimed = set()
+        for config in configs:
+            if config["config_hash"] in id_by_hash:
+                row_id = id_by_hash[config["config_hash"]]
+                if name_by_id[row_id] != config["name"]:
+                    renames.append((row_id, name_by_id[row_id], config["name"]))
+                claimed.add(row_id)
+            elif config["name"] in row_by_name and row_by_name[config["name"]][1] not in batch_hashes:
+                row_id, old_hash = row_by_name[config["name"]]
+                rehashes.append((row_id, config, old_hash is not None))
+                claimed.add(row_id)
+            else:
+                inserts.append(config)
+        # Rows still holding a name the batch gives to another row
+        stale = [row_by_name[config["name"]][0] for config in configs
+                 if config["name"] in row_by_name and row_by_name[config["name"]][0] not in claimed]
+
+        def drop_results(config_id: int):
+            for result_table, column in result_columns:
+                deleted = self.con.execute(f"DELETE FROM {result_table} WHERE {column} = ?", (config_id,)).rowcount
+                if deleted:
+                    logging.info(f"Dropped {deleted} stale {result_table} rows of {table} id {config_id}")
+
+        with self.con:
+            for row_id in stale:
+                drop_results(row_id)
+                self.con.execute(f"DELETE FROM {table} WHERE {id_column} = ?", (row_id,))
+            # Through temporary names, so rows can take each other's names without hitting UNIQUE
+            for row_id, _, _ in renames:
+                self.con.execute(f"UPDATE {table} SET name = ? WHERE {id_column} = ?",
+                                 (f"~renaming {row_id}", row_id))
+            for row_id, old_name, new_name in renames:
+                logging.info(f"Renaming {table} entry '{old_name}' to '{new_name}'")
+                self.con.execute(f"UPDATE {table} SET name = ? WHERE {id_column} = ?", (new_name, row_id))
+            for row_id, config, changed in rehashes:
+                if changed:
+                    logging.info(f"Parameters of {table} entry '{config['name']}' changed")
+                    drop_results(row_id)
+                assignments = ", ".join(f"{c} = :{c}" for c in ["config_hash", *extra_columns])
+                self.con.execute(f"UPDATE {table} SET {assignments} WHERE {id_column} = :id",
+                                 {**config, "id": row_id})
+            columns = ["name", "config_hash", *extra_columns]
+            self.con.executemany(
+                f"INSERT INTO {table}({', '.join(columns)}) VALUES({', '.join(':' + c for c in columns)})", inserts)
+
+    def update_estimators(self, estimators: List[Estimator]):
+        try:
+            self._update_configs("estimators", [
+                {"name": e.name, "config_hash": e.config_hash, "summarize_block": e.summarize_block,
+                 "summarize_file": e.summarize_file} for e in estimators])
         except sqlite3.Error as e:
             logging.exception(e)
 
     def update_preprocessors(self, preprocessors: List[Preprocessor]):
         try:
-            preprocessor_list = []
-            for p in preprocessors:
-                preprocessor_list.append(
-                    {"name": p.name, "parameters": pickle.dumps(p.instance.traits(), protocol=pickle.HIGHEST_PROTOCOL)})
-
-            self.con.executemany("INSERT OR IGNORE INTO preprocessors(name, parameters) VALUES(:name, :parameters)",
-                                 preprocessor_list)
-            self.con.commit()
+            self._update_configs("preprocessors", [{"name": p.name, "config_hash": p.config_hash}
+                                                   for p in preprocessors])
         except sqlite3.Error as e:
             logging.exception(e)
 
     def update_compressors(self, compressors: List[Compressor]):
         try:
-            compressor_list = []
-            for c in compressors:
-                compressor_list.append(
-                    {"name": c.name, "parameters": pickle.dumps(c.instance.traits(), protocol=pickle.HIGHEST_PROTOCOL)})
-
-            self.con.executemany("INSERT OR IGNORE INTO compressors(name, parameters) VALUES(:name, :parameters)",
-                                 compressor_list)
-            self.con.commit()
+            self._update_configs("compressors", [{"name": c.name, "config_hash": c.config_hash} for c in compressors])
         except sqlite3.Error as e:
             logging.exception(e)
 
     def update_block_summary_funcs(self, block_funcs: List[BlockSummaryFunc]):
         try:
-            block_func_list = []
-            for f in block_funcs:
-                block_func_list.append(
-                    {"name": f.name, "parameters": pickle.dumps(f.parameters, protocol=pickle.HIGHEST_PROTOCOL)})
-
-            self.con.executemany(
-                "INSERT OR IGNORE INTO block_summary_funcs(name, parameters) VALUES(:name, :parameters)",
-                block_func_list)
-            self.con.commit()
+            self._update_configs("block_summary_funcs", [{"name": f.name, "config_hash": f.config_hash}
+                                                         for f in block_funcs])
         except sqlite3.Error as e:
             logging.exception(e)
 
     def update_file_summary_funcs(self, file_funcs: List[FileSummaryFunc]):
         try:
-            file_func_list = []
-            for f in file_funcs:
-                file_func_list.append(
-                    {"name": f.name, "parameters": pickle.dumps(f.parameters, protocol=pickle.HIGHEST_PROTOCOL)})
-
-            self.con.executemany(
-                "INSERT OR IGNORE INTO file_summary_funcs(name, parameters) VALUES(:name, :parameters)",
-                file_func_list)
-            self.con.commit()
+            self._update_configs("file_summary_funcs", [{"name": f.name, "config_hash": f.config_hash}
+                                                        for f in file_funcs])
         except sqlite3.Error as e:
             logging.exception(e)
 
     def update_file(self, file: InputFile):
         self.con.execute(
             """
-                INSERT OR ABORT INTO files
+                INSERT OR ABORT INTO files (file_hash, path, name, size_bytes, quality_id)
                 VALUES (:hash, :path, :name, :size_bytes, :quality_id)
                 """, (file.hash, file.path, file.name, file.size_bytes, 1))
         self.con.commit()
@@ -262,10 +648,8 @@ class BenchmarkDatabase:
     def update_files(self, client: dask.distributed.Client, locations):
         hash_tasks = []
         duplicate_files = 0
-
-        # noinspection SqlWithoutWhere
-        self.con.execute("DELETE FROM files")
-        self.con.commit()
+        seen_hashes = set()
+        stale_hashes = {row[0] for row in self.con.execute("SELECT file_hash FROM files")}
 
         # Glob 'em, hash 'em, and INSERT 'em
         for s in locations:
@@ -277,72 +661,96 @@ class BenchmarkDatabase:
                 hash_tasks.append(future)
 
         for future, result in dask.distributed.as_completed(hash_tasks, with_results=True):
-            try:
-                self.update_file(InputFile(result, future.context[0], future.context[1], future.context[2]))
-            except sqlite3.IntegrityError as e:
-                logging.debug(f"Ignoring file '{future.context[1]}': {e}")
+            if result is None:
+                continue
+            if result in seen_hashes:
+                logging.debug(f"Ignoring file '{future.context[1]}': hash collision")
                 duplicate_files += 1
+                continue
+            seen_hashes.add(result)
+            self._upsert_file(result, *future.context)
+            self.con.commit()
+
+        self.con.executemany("DELETE FROM files WHERE file_hash = ?", [(h,) for h in stale_hashes - seen_hashes])
+        self.con.commit()
 
         if duplicate_files:
             logging.warning(
                 f"Ignored {duplicate_files} files with hash collisions. Debug mode (-v) can provide additional details")
         logging.info(f"Finished hashing {len(hash_tasks)} files")
 
+    def _upsert_file(self, file_hash: str, path: str, name: str, size_bytes: int):
+        # Upsert instead of deleting and re-inserting every file, which would run the estimation_compressions
+        # triggers over every stored result twice. Unchanged files are not written at all, so a rerun over the same
+        # data set leaves the data revision alone.
+        self.con.execute(
+            """
+            INSERT INTO files (file_hash, path, name, size_bytes, quality_id)
+            VALUES (?, ?, ?, ?, 1)
+            ON CONFLICT (file_hash) DO UPDATE SET path       = excluded.path,
+                                                  name       = excluded.name,
+                                                  size_bytes = excluded.size_bytes
+            WHERE files.path IS NOT excluded.path
+               OR files.name IS NOT excluded.name
+               OR files.size_bytes IS NOT excluded.size_bytes
+            """, (file_hash, path, name, size_bytes))
+
+    @staticmethod
+    def _tag_rows(reader: csv.DictReader) -> Iterator[Tuple[str, str, str]]:
+        """(file name, quality, tag) for every tag of every row of the RAISE CSV"""
+        for row in reader:
+            tags: List[str] = (row["Keywords"] + (row["Tags"] if "Tags" in row.keys() else "")
+                               ).replace(";", "").split(" ")
+            for tag in tags:
+                yield "RAISE/" + row["File"], row["Image Quality"].lower(), tag.lower()
+
     def update_tags(self, tags_csv: Path):
         try:
             with open(tags_csv, "r") as f:
-                reader = csv.DictReader(f)
-                unique_tags = set()
-                unique_formats = set()
-                file_tags: List[Tuple[str, str]] = []
-                file_formats: List[Tuple[str, str]] = []
-                for row in reader:
-                    tags: List[str] = (row["Keywords"] + (row["Tags"] if "Tags" in row.keys() else "")
-                                       ).replace(";", "").split(" ")
-                    format_name: str = row["Image Quality"]
-                    file_formats.append((format_name.lower(), "RAISE/" + row["File"]))
-
-                    unique_formats.add((format_name.lower(),))
-                    unique_tags.update(map(lambda x: (x.lower(),), tags))
-
-                    for tag in tags:
-                        file_tags.append(("RAISE/" + row["File"], tag.lower()))
-
-                self.con.executemany("INSERT OR IGNORE INTO image_qualities(name) VALUES(?)", unique_formats)
-                self.con.commit()
-
-                self.con.executemany("INSERT OR IGNORE INTO tag_types(tag_name) VALUES(?)", unique_tags)
-                self.con.commit()
-
-                self.con.executemany(
-                    """
-                    UPDATE files
-                    SET quality_id = (SELECT quality_id FROM image_qualities WHERE name = ?)
-                    WHERE file_hash = (SELECT file_hash FROM files WHERE files.name = ?)
-                    """, file_formats)
-                self.con.commit()
-
-                self.con.executemany(
-                    """
-                    INSERT OR IGNORE INTO file_tags
-                    VALUES ((SELECT file_hash FROM files WHERE ? = files.name),
-                            (SELECT tag_id from tag_types WHERE ? = tag_types.tag_name))
-                    """, file_tags)
-                self.con.commit()
+                self.con.execute("CREATE TEMP TABLE IF NOT EXISTS staged_tags (name TEXT, quality TEXT, tag TEXT)")
+                self.con.execute("DELETE FROM staged_tags")
+                # One transaction: stream the CSV in, then resolve names to ids with joins on indexed columns
+                with self.con:
+                    self.con.executemany("INSERT INTO staged_tags VALUES (?, ?, ?)", self._tag_rows(csv.DictReader(f)))
+                    self.con.execute(
+                        "INSERT OR IGNORE INTO image_qualities(name) SELECT DISTINCT quality FROM staged_tags")
+                    self.con.execute("INSERT OR IGNORE INTO tag_types(tag_name) SELECT DISTINCT tag FROM staged_tags")
+                    # The last row of a file wins, as it did when rows were applied one by one
+                    self.con.execute(
+                        """
+                        UPDATE files
+                        SET quality_id = iq.quality_id
+                        FROM (SELECT name, quality
+                              FROM staged_tags
+                              WHERE rowid IN (SELECT MAX(rowid) FROM staged_tags GROUP BY name)) s
+                                 INNER JOIN image_qualities iq ON iq.name = s.quality
+                        WHERE files.name = s.name
+                          AND files.quality_id IS NOT iq.quality_id
+                        """)
+                    self.con.execute(
+                        """
+                        INSERT OR IGNORE INTO file_tags
+                        SELECT DISTINCT f.file_hash, tt.tag_id
+                        FROM staged_tags s
+                                 INNER JOIN files f ON f.name = s.name
+                                 INNER JOIN tag_types tt ON tt.tag_name = s.tag
+                        """)
+                self.con.execute("DROP TABLE staged_tags")
         except OSError:
             logging.exception(f"Error reading {tags_csv}")
 
     def update_compression_result(self, new_result: CompressionResult):
         try:
             self.con.execute(
-                """INSERT INTO compression_results
+                """INSERT OR REPLACE INTO compression_results
                    VALUES (:hash, (SELECT compressor_id FROM compressors WHERE name = :compressor_name), :size_bytes)
                 """, (new_result.input_file.hash, new_result.compressor.name, new_result.compressed_size_bytes))
             self.con.commit()
         except sqlite3.Error as e:
             logging.exception(e)
 
-    def update_compression_results(self, client: dask.distributed.Client, compressors: List[Compressor]):
+    def update_compression_results(self, client: dask.distributed.Client, compressors: List[Compressor],
+                                   sink: Optional[ParquetSink] = None):
         ratio_start_time = default_timer()
         compression_tasks = []
         submitted_compression_tasks = 0
@@ -360,6 +768,8 @@ class BenchmarkDatabase:
                 self.update_compression_result(
                     CompressionResult(input_file=result.input_file, compressor=result.compressor,
                                       compressed_size_bytes=result.compressed_size_bytes))
+                if sink is not None:
+                    sink.add_compression(result)
                 completed_compression_tasks += 1
                 logging.info(
                     f"{completed_compression_tasks}/{submitted_compression_tasks} tasks complete, {completed_compression_tasks / submitted_compression_tasks * 100:.2f}%")
@@ -481,7 +891,13 @@ class BenchmarkDatabase:
                     LEFT JOIN file_estimations ON
                     (file_estimations.file_hash = permutations.fh AND
                      file_estimations.preprocessor_id = permutations.preprocessor_id AND
-                     file_estimations.estimator_id = permutations.estimator_id)) r
+                     file_estimations.estimator_id = permutations.estimator_id AND
+                     file_estimations.block_summary_func_id = (SELECT block_summary_id
+                                                               FROM block_summary_funcs
+                                                               WHERE name = permutations.block_summary_func_name) AND
+                     file_estimations.file_summary_func_id = (SELECT file_summary_id
+                                                              FROM file_summary_funcs
+                                                              WHERE name = permutations.file_summary_func_name))) r
                 WHERE r.metric IS NULL
                 """
         ).fetchall():
@@ -550,6 +966,30 @@ class BenchmarkDatabase:
     def get_tags(self) -> List[Tuple[int, str]]:
         return self.con.execute("SELECT tag_id, tag_name FROM tag_types").fetchall()
 
+    def get_revision(self) -> int:
+        """Counter bumped by every change that can alter a plot query's result, for keying cached results"""
+        return self.con.execute("SELECT revision FROM data_revision").fetchone()[0]
+
+    def get_database_id(self) -> str:
+        """Random id given to the database when it is created, revisions only identify data together with it"""
+        return self.con.execute("SELECT database_id FROM data_revision").fetchone()[0]
+
+    def get_tag_bits(self) -> Dict[str, int]:
+        """Bit of each tag in the tag_mask column, for filtering in NumPy. Tags beyond TAG_MASK_BITS have none."""
+        return {name: 1 << (tag_id - 1) for tag_id, name in
+                self.con.execute("SELECT tag_id, tag_name FROM tag_types WHERE tag_id <= ?", (TAG_MASK_BITS,))}
+
+    def _tag_filter(self, tags: List[str]) -> Tuple[str, tuple]:
+        """Condition on files f having any of the tags, and its parameters"""
+        ids = [row[0] for row in
+               self.con.execute(f"SELECT tag_id FROM tag_types WHERE tag_name IN {_placeholders(tags)}", tags)]
+        mask = sum(1 << (tag_id - 1) for tag_id in ids if tag_id <= TAG_MASK_BITS)
+        overflow = [tag_id for tag_id in ids if tag_id > TAG_MASK_BITS]
+        if not overflow:
+            return "(f.tag_mask & ?) != 0", (mask,)
+        return (f"((f.tag_mask & ?) != 0 OR f.file_hash IN (SELECT file_hash FROM file_tags "
+                f"WHERE tag_id IN {_placeholders(overflow)}))", (mask, *overflow))
+
     def get_qualities(self) -> List[Tuple[int, str]]:
         return self.con.execute("SELECT quality_id, name FROM image_qualities").fetchall()
 
@@ -599,96 +1039,232 @@ class BenchmarkDatabase:
                      CROSS JOIN preprocessors
             """).fetchall()
 
-    def get_all_estimations_dataframe(self):
+    @staticmethod
+    def _result(cursor: sqlite3.Cursor, columnar: bool):
+        """(description, rows), or with columnar set a pyarrow.Table built chunk by chunk that .to_pandas() or
+        .column(name).to_numpy() turn into typed columns without another pass over row tuples"""
+        if not columnar:
+            return cursor.description, cursor.fetchall()
+
+        tables = list(BenchmarkDatabase._chunks(cursor))
+        if not tables:
+            names = [item[0] for item in cursor.description]
+            return pa.table([pa.array([], type=_arrow_types.get(name, pa.null())) for name in names], names=names)
+        # Inferred types can differ between chunks, e.g. a chunk of only NULLs
+        return pa.concat_tables(tables, promote_options="permissive")
+
+    @staticmethod
+    def _chunks(cursor: sqlite3.Cursor) -> Iterator[pa.Table]:
+        names = [item[0] for item in cursor.description]
+        types = [_arrow_types.get(name) for name in names]
+        while rows := cursor.fetchmany(COLUMNAR_CHUNK_ROWS):
+            yield pa.table([pa.array(column, type=t) for column, t in zip(zip(*rows), types)], names=names)
+
+    def iter_named_estimations(self) -> Iterator[pa.Table]:
+        """Every estimation result with config names instead of ids, in chunks of COLUMNAR_CHUNK_ROWS"""
+        return self._chunks(self.con.execute(
+            """
+            SELECT fe.file_hash,
+                   p.name   AS preprocessor,
+                   e.name   AS estimator,
+                   bsf.name AS block_summary_func,
+                   fsf.name AS file_summary_func,
+                   fe.metric
+            FROM file_estimations fe
+                     INNER JOIN preprocessors p ON p.preprocessor_id = fe.preprocessor_id
+                     INNER JOIN estimators e ON e.estimator_id = fe.estimator_id
+                     INNER JOIN block_summary_funcs bsf ON bsf.block_summary_id = fe.block_summary_func_id
+                     INNER JOIN file_summary_funcs fsf ON fsf.file_summary_id = fe.file_summary_func_id
+            """))
+
+    def iter_named_compressions(self) -> Iterator[pa.Table]:
+        """Every compression result with compressor names instead of ids, in chunks of COLUMNAR_CHUNK_ROWS"""
+        return self._chunks(self.con.execute(
+            """
+            SELECT cr.file_hash,
+                   c.name                                                     AS compressor,
+                   f.size_bytes                                               AS initial_size,
+                   cr.size_bytes                                              AS final_size,
+                   (1.0 - CAST(cr.size_bytes AS REAL) / f.size_bytes) * 100.0 AS percent_size_reduction
+            FROM compression_results cr
+                     INNER JOIN compressors c ON c.compressor_id = cr.compressor_id
+                     INNER JOIN files f ON f.file_hash = cr.file_hash
+            """))
+
+    def get_series_statistics(self, preprocessor: str, estimator: str, compressor: str, block_summary_fn: str,
+                              file_summary_fn: str) -> Optional[Tuple]:
+        return self.con.execute(
+            f"""
+            SELECT {", ".join(_statistics_terms)}
+            FROM series_statistics
+            WHERE preprocessor_id = (SELECT preprocessor_id FROM preprocessors WHERE name = ?)
+              AND estimator_id = (SELECT estimator_id FROM estimators WHERE name = ?)
+              AND compressor_id = (SELECT compressor_id FROM compressors WHERE name = ?)
+              AND block_summary_func_id = (SELECT block_summary_id FROM block_summary_funcs WHERE name = ?)
+              AND file_summary_func_id = (SELECT file_summary_id FROM file_summary_funcs WHERE name = ?)
+            """, (preprocessor, estimator, compressor, block_summary_fn, file_summary_fn)).fetchone()
+
+    def get_all_series_statistics(self, columnar: bool = False):
+        cursor = self.con.execute(
+            f"""
+            SELECT p.name   AS preprocessor,
+                   e.name   AS estimator,
+                   bsf.name AS block_summary_func,
+                   fsf.name AS file_summary_func,
+                   c.name   AS compressor,
+                   {", ".join(f"s.{c}" for c in _statistics_terms)}
+            FROM series_statistics s
+                     INNER JOIN preprocessors p ON p.preprocessor_id = s.preprocessor_id
+                     INNER JOIN estimators e ON e.estimator_id = s.estimator_id
+                     INNER JOIN block_summary_funcs bsf ON bsf.block_summary_id = s.block_summary_func_id
+                     INNER JOIN file_summary_funcs fsf ON fsf.file_summary_id = s.file_summary_func_id
+                     INNER JOIN compressors c ON c.compressor_id = s.compressor_id
+            """)
+        return self._result(cursor, columnar)
+
+    def get_all_estimations_dataframe(self, columnar: bool = False):
         cursor = self.con.execute(
             """
-            SELECT compression_results.file_hash,
+            SELECT file_hash,
                    preprocessor_id,
                    estimator_id,
                    compressor_id,
                    metric,
-                   files.size_bytes               AS initial_size,
-                   compression_results.size_bytes AS final_size
-            FROM compression_results
-                     INNER JOIN file_estimations ON compression_results.file_hash = file_estimations.file_hash
-                     INNER JOIN files ON compression_results.file_hash = files.file_hash
-            WHERE metric IS NOT NULL
+                   initial_size,
+                   final_size,
+                   percent_size_reduction
+            FROM estimation_compressions
             """)
-        return cursor.description, cursor.fetchall()
+        return self._result(cursor, columnar)
 
-    def get_solo_tag_plot_dataframe(self, preprocessor: str, estimator: str, compressor: str, tag: str, quality: str):
+    def get_solo_tag_plot_dataframe(self, preprocessor: str, estimator: str, compressor: str, tag: str, quality: str,
+                                    columnar: bool = False):
+        tag_filter, tag_parameters = self._tag_filter([tag])
         cursor = self.con.execute(
-            """
-            WITH files_with_tag AS (SELECT file_hash
-                                    FROM file_tags ft
-                                             JOIN tag_types tt ON ft.tag_id = tt.tag_id
-                                    GROUP BY file_hash
-                                    HAVING SUM(CASE WHEN tag_name = ? THEN 1 ELSE 0 END) > 0),
-                 filtered_files AS (SELECT f.*
-                                    FROM files f
-                                             INNER JOIN files_with_tag fwt ON fwt.file_hash = f.file_hash)
-            SELECT fe.file_hash,
-                   fe.metric,
-                   ff.size_bytes AS initial_size,
-                   cr.size_bytes AS final_size,
-                   iq.name       AS quality
-            FROM file_estimations fe
-                     INNER JOIN filtered_files ff ON ff.file_hash = fe.file_hash
-                     INNER JOIN compression_results cr ON cr.file_hash = fe.file_hash
-                     INNER JOIN image_qualities iq ON iq.quality_id = ff.quality_id
-            WHERE metric IS NOT NULL
-              AND fe.preprocessor_id = (SELECT preprocessor_id FROM preprocessors WHERE name = ?)
-              AND fe.estimator_id = (SELECT estimator_id FROM estimators WHERE name = ?)
-              AND cr.compressor_id = (SELECT compressor_id FROM compressors WHERE name = ?)
+            f"""
+            SELECT ec.file_hash,
+                   ec.metric,
+                   ec.initial_size,
+                   ec.final_size,
+                   ec.percent_size_reduction,
+                   iq.name AS quality
+            FROM estimation_compressions ec
+                     INNER JOIN files f ON f.file_hash = ec.file_hash
+                     INNER JOIN image_qualities iq ON iq.quality_id = f.quality_id
+            WHERE {tag_filter}
+              AND ec.preprocessor_id = (SELECT preprocessor_id FROM preprocessors WHERE name = ?)
+              AND ec.estimator_id = (SELECT estimator_id FROM estimators WHERE name = ?)
+              AND ec.compressor_id = (SELECT compressor_id FROM compressors WHERE name = ?)
               AND iq.name = ?
-            ORDER BY ff.name
-            """, (tag, preprocessor, estimator, compressor, quality))
-        return cursor.description, cursor.fetchall()
+            ORDER BY f.name
+            """, (*tag_parameters, preprocessor, estimator, compressor, quality))
+        return self._result(cursor, columnar)
+
+    def get_multi_tag_plot_dataframe(self, preprocessor: str, estimator: str, compressor: str, tags: List[str],
+                                     qualities: List[str], columnar: bool = False):
+        """get_solo_tag_plot_dataframe for every (tag, quality) pair at once, rows are labelled with their tag and
+        files with several of the tags appear once per tag"""
+        cursor = self.con.execute(
+            f"""
+            SELECT tt.tag_name AS tag,
+                   ec.file_hash,
+                   ec.metric,
+                   ec.initial_size,
+                   ec.final_size,
+                   ec.percent_size_reduction,
+                   iq.name     AS quality
+            FROM tag_types tt
+                     -- file_tags.tag_id has no type affinity, unary + drops the INTEGER affinity of tag_types.tag_id
+                     -- so the comparison can use file_tags_tag_file
+                     INNER JOIN file_tags ft ON ft.tag_id = +tt.tag_id
+                     INNER JOIN files f ON f.file_hash = ft.file_hash
+                     INNER JOIN image_qualities iq ON iq.quality_id = f.quality_id
+                     INNER JOIN estimation_compressions ec ON ec.file_hash = ft.file_hash
+            WHERE tt.tag_name IN {_placeholders(tags)}
+              AND iq.name IN {_placeholders(qualities)}
+              AND ec.preprocessor_id = (SELECT preprocessor_id FROM preprocessors WHERE name = ?)
+              AND ec.estimator_id = (SELECT estimator_id FROM estimators WHERE name = ?)
+              AND ec.compressor_id = (SELECT compressor_id FROM compressors WHERE name = ?)
+            ORDER BY tt.tag_name, f.name
+            """, (*tags, *qualities, preprocessor, estimator, compressor))
+        return self._result(cursor, columnar)
 
     def get_solo_plot_dataframe(self, preprocessor: str, estimator: str, compressor: str, block_summary_fn: str,
-                                file_summary_fn: str):
+                                file_summary_fn: str, columnar: bool = False):
         cursor = self.con.execute(
             """
-            SELECT fe.file_hash,
-                   fe.metric,
-                   f.size_bytes  as initial_size,
-                   cr.size_bytes as final_size
-            FROM file_estimations fe
-                     INNER JOIN files f ON f.file_hash = fe.file_hash
-                     INNER JOIN compression_results cr ON cr.file_hash = fe.file_hash
-            WHERE metric IS NOT NULL
-              AND fe.preprocessor_id = (SELECT preprocessor_id FROM preprocessors WHERE name = ?)
-              AND fe.estimator_id = (SELECT estimator_id FROM estimators WHERE name = ?)
-              AND cr.compressor_id = (SELECT compressor_id FROM compressors WHERE name = ?)
-              AND fe.block_summary_func_id = (SELECT block_summary_id FROM block_summary_funcs WHERE name = ?)
-              AND fe.file_summary_func_id = (SELECT file_summary_id FROM file_summary_funcs WHERE name = ?)
-            ORDER BY name
-            """, (preprocessor, estimator, compressor, block_summary_fn, file_summary_fn))
-        return cursor.description, cursor.fetchall()
+            SELECT ec.file_hash,
+                   ec.metric,
+                   ec.initial_size,
+                   ec.final_size,
+                   ec.percent_size_reduction
+            FROM estimation_compressions ec
+                     -- CROSS JOIN keeps the series primary key as the outer loop instead of walking files by name
+                     CROSS JOIN files f ON f.file_hash = ec.file_hash
+            WHERE ec.preprocessor_id = (SELECT preprocessor_id FROM preprocessors WHERE name = ?)
+              AND ec.estimator_id = (SELECT estimator_id FROM estimators WHERE name = ?)
+              AND ec.block_summary_func_id = (SELECT block_summary_id FROM block_summary_funcs WHERE name = ?)
+              AND ec.file_summary_func_id = (SELECT file_summary_id FROM file_summary_funcs WHERE name = ?)
+              AND ec.compressor_id = (SELECT compressor_id FROM compressors WHERE name = ?)
+            ORDER BY f.name
+            """, (preprocessor, estimator, block_summary_fn, file_summary_fn, compressor))
+        return self._result(cursor, columnar)
+
+    def get_series_points(self, series: List[Tuple[str, str, str, str, str]], columnar: bool = False):
+        """metric and percent_size_reduction of every (preprocessor, estimator, block_summary_fn, file_summary_fn,
+        compressor) series in one read. Rows carry the index of their series in the list and come in
+        get_solo_plot_dataframe's order within a series."""
+        cursor = self.con.execute(
+            """
+            WITH requested AS (SELECT key                         AS series_index,
+                                      json_extract(value, '$[0]') AS preprocessor,
+                                      json_extract(value, '$[1]') AS estimator,
+                                      json_extract(value, '$[2]') AS block_summary_func,
+                                      json_extract(value, '$[3]') AS file_summary_func,
+                                      json_extract(value, '$[4]') AS compressor
+                               FROM json_each(?))
+            SELECT r.series_index,
+                   ec.metric,
+                   ec.percent_size_reduction
+            FROM requested r
+                     INNER JOIN preprocessors p ON p.name = r.preprocessor
+                     INNER JOIN estimators e ON e.name = r.estimator
+                     INNER JOIN block_summary_funcs bsf ON bsf.name = r.block_summary_func
+                     INNER JOIN file_summary_funcs fsf ON fsf.name = r.file_summary_func
+                     INNER JOIN compressors c ON c.name = r.compressor
+                     INNER JOIN estimation_compressions ec
+                                ON ec.preprocessor_id = p.preprocessor_id
+                                    AND ec.estimator_id = e.estimator_id
+                                    AND ec.block_summary_func_id = bsf.block_summary_id
+                                    AND ec.file_summary_func_id = fsf.file_summary_id
+                                    AND ec.compressor_id = c.compressor_id
+                     INNER JOIN files f ON f.file_hash = ec.file_hash
+            ORDER BY r.series_index, f.name
+            """, (json.dumps(series),))
+        return self._result(cursor, columnar)
 
     def get_solo_plot_dataframe_with_tags(self, preprocessor: str, estimator: str, compressor: str,
                                           block_summary_fn: str,
-                                          file_summary_fn: str):
+                                          file_summary_fn: str,
+                                          columnar: bool = False):
+        """get_solo_plot_dataframe plus the tag_mask of each file, see get_tag_bits"""
         cursor = self.con.execute(
             """
-            SELECT fe.file_hash,
-                   fe.metric,
-                   f.size_bytes                                                                               as initial_size,
-                   cr.size_bytes                                                                              as final_size,
-                   GROUP_CONCAT(DISTINCT (SELECT tag_name FROM tag_types where ft.tag_id = tag_types.tag_id)) as tags
-            FROM file_estimations fe
-                     INNER JOIN files f ON f.file_hash = fe.file_hash
-                     INNER JOIN compression_results cr ON cr.file_hash = fe.file_hash
-                     LEFT JOIN file_tags ft ON f.file_hash = ft.file_hash
-            WHERE metric IS NOT NULL
-              AND fe.preprocessor_id = (SELECT preprocessor_id FROM preprocessors WHERE name = ?)
-              AND fe.estimator_id = (SELECT estimator_id FROM estimators WHERE name = ?)
-              AND cr.compressor_id = (SELECT compressor_id FROM compressors WHERE name = ?)
-              AND fe.block_summary_func_id = (SELECT block_summary_id FROM block_summary_funcs WHERE name = ?)
-              AND fe.file_summary_func_id = (SELECT file_summary_id FROM file_summary_funcs WHERE name = ?)
-            GROUP BY fe.file_hash
-            """, (preprocessor, estimator, compressor, block_summary_fn, file_summary_fn))
-        return cursor.description, cursor.fetchall()
+            SELECT ec.file_hash,
+                   ec.metric,
+                   ec.initial_size,
+                   ec.final_size,
+                   ec.percent_size_reduction,
+                   f.tag_mask
+            FROM estimation_compressions ec
+                     CROSS JOIN files f ON f.file_hash = ec.file_hash
+            WHERE ec.preprocessor_id = (SELECT preprocessor_id FROM preprocessors WHERE name = ?)
+              AND ec.estimator_id = (SELECT estimator_id FROM estimators WHERE name = ?)
+              AND ec.block_summary_func_id = (SELECT block_summary_id FROM block_summary_funcs WHERE name = ?)
+              AND ec.file_summary_func_id = (SELECT file_summary_id FROM file_summary_funcs WHERE name = ?)
+              AND ec.compressor_id = (SELECT compressor_id FROM compressors WHERE name = ?)
+            """, (preprocessor, estimator, block_summary_fn, file_summary_fn, compressor))
+        return self._result(cursor, columnar)
 
     def get_plot_dataframe(self,
                            preprocessors: List[str],
@@ -697,41 +1273,40 @@ class BenchmarkDatabase:
                            block_summary_fns: List[str],
                            file_summary_fns: List[str],
                            qualities: List[str],
-                           tags: List[str]):
+                           tags: Optional[List[str]] = None,
+                           columnar: bool = False):
+        """Every point of the given series whose file has one of the qualities and, unless tags is None, one of the
+        tags. Rows carry the tag_mask of their file, see get_tag_bits."""
+        tag_filter, tag_parameters = self._tag_filter(tags) if tags is not None else ("1", ())
         cursor = self.con.execute(
-            """
-            WITH preprocessor_ids AS (SELECT preprocessor_id FROM preprocessors WHERE name IN ?),
-                 estimator_ids AS (SELECT estimator_id FROM estimators WHERE name IN ?),
-                 compressor_ids AS (SELECT compressor_id FROM compressors WHERE name IN ?),
-                 block_summary_func_ids AS (SELECT block_summary_id FROM block_summary_funcs WHERE name IN ?),
-                 file_summary_func_ids AS (SELECT file_summary_id FROM file_summary_funcs WHERE name IN ?),
-                 quality_ids AS (SELECT quality_id FROM image_qualities WHERE name IN ?),
-                 tag_ids AS (SELECT tag_id FROM tag_types WHERE tag_name IN ?)
-            SELECT fe.file_hash,
-                   fe.preprocessor_id,
-                   fe.estimator_id,
-                   cr.compressor_id,
-                   fe.block_summary_func_id,
-                   fe.file_summary_func_id,
-                   fe.metric,
+            f"""
+            SELECT ec.file_hash,
+                   ec.preprocessor_id,
+                   ec.estimator_id,
+                   ec.compressor_id,
+                   ec.block_summary_func_id,
+                   ec.file_summary_func_id,
+                   ec.metric,
                    f.quality_id,
-                   f.size_bytes                                                                               as initial_size,
-                   cr.size_bytes                                                                              as final_size,
-                   GROUP_CONCAT(DISTINCT (SELECT tag_name FROM tag_types where ft.tag_id = tag_types.tag_id)) as tags
-            FROM file_estimations fe
-                     INNER JOIN files f ON f.file_hash = fe.file_hash
-                     INNER JOIN compression_results cr ON cr.file_hash = fe.file_hash
-                     LEFT JOIN file_tags ft ON f.file_hash = ft.file_hash
-            WHERE metric IS NOT NULL
-              AND fe.preprocessor_id IN preprocessor_ids
-              AND fe.estimator_id IN estimator_ids
-              AND cr.compressor_id IN compressor_ids
-              AND fe.block_summary_func_id IN block_summary_func_ids
-              AND fe.file_summary_func_id IN file_summary_func_ids
-              AND f.quality_id IN quality_ids
-            GROUP BY fe.file_hash
-            """, (preprocessors, estimators, compressors, block_summary_fns, file_summary_fns, qualities, tags))
-        return cursor.description, cursor.fetchall()
+                   ec.initial_size,
+                   ec.final_size,
+                   ec.percent_size_reduction,
+                   f.tag_mask
+            FROM estimation_compressions ec
+                     INNER JOIN files f ON f.file_hash = ec.file_hash
+            WHERE ec.preprocessor_id IN (SELECT preprocessor_id FROM preprocessors
+                                         WHERE name IN {_placeholders(preprocessors)})
+              AND ec.estimator_id IN (SELECT estimator_id FROM estimators WHERE name IN {_placeholders(estimators)})
+              AND ec.compressor_id IN (SELECT compressor_id FROM compressors WHERE name IN {_placeholders(compressors)})
+              AND ec.block_summary_func_id IN (SELECT block_summary_id FROM block_summary_funcs
+                                               WHERE name IN {_placeholders(block_summary_fns)})
+              AND ec.file_summary_func_id IN (SELECT file_summary_id FROM file_summary_funcs
+                                              WHERE name IN {_placeholders(file_summary_fns)})
+              AND f.quality_id IN (SELECT quality_id FROM image_qualities WHERE name IN {_placeholders(qualities)})
+              AND {tag_filter}
+            """, (*preprocessors, *estimators, *compressors, *block_summary_fns, *file_summary_fns, *qualities,
+                  *tag_parameters))
+        return self._result(cursor, columnar)
 
     @staticmethod
     def _hash_file(p: Path) -> Optional[str]:
@@ -0,0 +1,74 @@
+#  Copyright (C) 2025 Julian Nowaczek.
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import logging
+import os
+import tempfile
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from estimation_comparison.model import IntermediateEstimationResult, Preprocessor, Estimator
+
+
+class IntermediateStore:
+    """Per-file estimator outputs, stored before any block or file summary function is applied
+
+    Every (preprocessor, estimator, file) result is a separate shard under
+    <root>/<preprocessor config hash>/<estimator config hash>/<file hash prefix>/<file hash>.npy, so shards can be
+    written concurrently by workers and read back memory-mapped, and changing a config's parameters never serves a
+    stale shard. With compress=True shards are written as compressed .npz instead, which are smaller
+    on disk but have to be decompressed into memory on read.
+    """
+
+    def __init__(self, root: Path, compress: bool = False):
+        self.root = Path(root)
+        self.compress = compress
+
+    def _shard(self, file_hash: str, preprocessor: Preprocessor, estimator: Estimator) -> Path:
+        return self.root / preprocessor.config_hash / estimator.config_hash / file_hash[:2] / file_hash
+
+    def contains(self, file_hash: str, preprocessor: Preprocessor, estimator: Estimator) -> bool:
+        shard = self._shard(file_hash, preprocessor, estimator)
+        return shard.with_suffix(".npy").exists() or shard.with_suffix(".npz").exists()
+
+    def save(self, ier: IntermediateEstimationResult):
+        shard = self._shard(ier.input_file.hash, ier.preprocessor, ier.estimator)
+        if self.contains(ier.input_file.hash, ier.preprocessor, ier.estimator):
+            return
+        shard.parent.mkdir(parents=True, exist_ok=True)
+        suffix = ".npz" if self.compress else ".npy"
+
+        # Write next to the shard and rename so readers never see a partially written file
+        fd, tmp_path = tempfile.mkstemp(dir=shard.parent, suffix=suffix)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                if self.compress:
+                    np.savez_compressed(f, result=np.asarray(ier.result))
+                else:
+                    np.save(f, np.asarray(ier.result))
+            os.replace(tmp_path, shard.with_suffix(suffix))
+        except OSError as e:
+            logging.exception(f"Error storing intermediate result for {ier.input_file}: {e}")
+            Path(tmp_path).unlink(missing_ok=True)
+
+    def load(self, file_hash: str, preprocessor: Preprocessor, estimator: Estimator) -> Optional[np.ndarray]:
+        shard = self._shard(file_hash, preprocessor, estimator)
+        if shard.with_suffix(".npy").exists():
+            return np.load(shard.with_suffix(".npy"), mmap_mode="r")
+        if shard.with_suffix(".npz").exists():
+            with np.load(shard.with_suffix(".npz")) as shards:
+                return shards["result"]
+        return None
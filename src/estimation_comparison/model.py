@@ -12,10 +12,14 @@
 #
 #  You should have received a copy of the GNU General Public License
 #  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import hashlib
+import json
 from dataclasses import dataclass
 from typing import Self, Callable, Optional
 
 import numpy as np
+# noinspection PyProtectedMember
+from traitlets import HasTraits
 
 from estimation_comparison.data_collection.compressor.general import GeneralCompressorBase
 from estimation_comparison.data_collection.compressor.image import ImageCompressorBase
@@ -23,8 +27,30 @@ from estimation_comparison.data_collection.estimator import EstimatorBase
 from estimation_comparison.data_collection.preprocessor import BaseSampler
 
 
+def canonical_parameters(value: any) -> any:
+    """Reduces a config to plain JSON types: algorithms to their class name and trait values, functions to their
+    qualified name. Equal configs always give the same result, whatever order their parameters were set in."""
+    if isinstance(value, HasTraits):
+        return {"class": type(value).__qualname__,
+                "traits": {k: canonical_parameters(v) for k, v in sorted(value.trait_values().items())}}
+    if isinstance(value, dict):
+        return {str(k): canonical_parameters(v) for k, v in sorted(value.items())}
+    if isinstance(value, (list, tuple)):
+        return [canonical_parameters(v) for v in value]
+    if isinstance(value, np.generic):
+        return value.item()
+    if callable(value):
+        return f"{value.__module__}.{value.__qualname__}"
+    return value
+
+
+def config_hash(*parts: any) -> str:
+    canonical = json.dumps(canonical_parameters(list(parts)), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
 # Benchmark config classes
-# Also used in database model
+# Also used in database model, where the config hash identifies a config independently of its name
 
 @dataclass
 class Estimator:
@@ -33,18 +59,30 @@ class Estimator:
     summarize_block: bool = False
     summarize_file: bool = False
 
+    @property
+    def config_hash(self) -> str:
+        return config_hash(self.instance, self.summarize_block, self.summarize_file)
+
 
 @dataclass
 class Compressor:
     name: str
     instance: GeneralCompressorBase | ImageCompressorBase
 
+    @property
+    def config_hash(self) -> str:
+        return config_hash(self.instance)
+
 
 @dataclass
 class Preprocessor:
     name: str
     instance: BaseSampler[np.ndarray]
 
+    @property
+    def config_hash(self) -> str:
+        return config_hash(self.instance)
+
 
 @dataclass
 class BlockSummaryFunc:
@@ -52,6 +90,10 @@ class BlockSummaryFunc:
     instance: Callable
     parameters: Optional[dict] = None
 
+    @property
+    def config_hash(self) -> str:
+        return config_hash(self.instance, self.parameters)
+
 
 @dataclass
 class FileSummaryFunc:
@@ -59,6 +101,10 @@ class FileSummaryFunc:
     instance: Callable
     parameters: Optional[dict] = None
 
+    @property
+    def config_hash(self) -> str:
+        return config_hash(self.instance, self.parameters)
+
 
 # Database model classes
 
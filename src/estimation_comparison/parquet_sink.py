@@ -0,0 +1,153 @@
+#  Copyright (C) 2025 Julian Nowaczek.
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import uuid
+from collections import defaultdict
+from pathlib import Path
+from typing import Optional, Dict, List, Tuple
+from urllib.parse import quote
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from estimation_comparison.model import EstimationResult, CompressionResult
+
+# Rows per Parquet row group, and so the number of rows buffered per partition before anything is written
+ROW_GROUP_ROWS = 65_536
+
+# Dataset name -> (partition column, schema of the columns stored in the files)
+DATASETS = {
+    "estimations": ("estimator", pa.schema([("file_hash", pa.string()),
+                                            ("preprocessor", pa.string()),
+                                            ("block_summary_func", pa.string()),
+                                            ("file_summary_func", pa.string()),
+                                            ("metric", pa.float64())])),
+    "compressions": ("compressor", pa.schema([("file_hash", pa.string()),
+                                              ("initial_size", pa.int64()),
+                                              ("final_size", pa.int64()),
+                                              ("percent_size_reduction", pa.float64())])),
+}
+
+
+class ParquetSink:
+    """Estimation and compression results as hive partitioned Parquet datasets
+
+    Results land in <root>/estimations/estimator=<name>/ and <root>/compressions/compressor=<name>/, each sink writing
+    its own part-<run id>.parquet per partition so runs never rewrite each other's files. Rows are buffered per
+    partition and written in row groups of row_group_rows, the files are only complete once the sink is closed.
+    """
+
+    def __init__(self, root: Path, row_group_rows: int = ROW_GROUP_ROWS):
+        self.root = Path(root)
+        self.row_group_rows = row_group_rows
+        self._run = uuid.uuid4().hex
+        self._writers: Dict[Tuple[str, str], pq.ParquetWriter] = {}
+        self._rows: Dict[Tuple[str, str], List[tuple]] = defaultdict(list)
+        self._tables: Dict[Tuple[str, str], List[pa.Table]] = defaultdict(list)
+        self._buffered: Dict[Tuple[str, str], int] = defaultdict(int)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def add_estimation(self, result: EstimationResult):
+        value = result.value[0] if isinstance(result.value, list) and len(result.value) == 1 else result.value
+        self._add("estimations", result.estimator.name,
+                  (result.input_file.hash, result.preprocessor.name,
+                   result.block_summary_func.name if result.block_summary_func else "none",
+                   result.file_summary_func.name if result.file_summary_func else "none", float(value)))
+
+    def add_compression(self, result: CompressionResult):
+        initial_size = result.input_file.size_bytes
+        final_size = result.compressed_size_bytes
+        self._add("compressions", result.compressor.name,
+                  (result.input_file.hash, initial_size, final_size, (1.0 - final_size / initial_size) * 100.0))
+
+    def write(self, dataset: str, table: pa.Table):
+        """Appends a table with the dataset's columns and its partition column"""
+        column, schema = DATASETS[dataset]
+        for partition in pc.unique(table[column]).to_pylist():
+            key = (dataset, partition)
+            part = table.filter(pc.equal(table[column], partition)).select(schema.names).cast(schema)
+            self._tables[key].append(part)
+            self._buffered[key] += part.num_rows
+            if self._buffered[key] >= self.row_group_rows:
+                self._flush(key, final=False)
+
+    def _add(self, dataset: str, partition: str, row: tuple):
+        key = (dataset, partition)
+        self._rows[key].append(row)
+        self._buffered[key] += 1
+        if self._buffered[key] >= self.row_group_rows:
+            self._flush(key, final=False)
+
+    def _flush(self, key: Tuple[str, str], final: bool):
+        dataset, partition = key
+        column, schema = DATASETS[dataset]
+        tables = self._tables.pop(key, [])
+        rows = self._rows.pop(key, [])
+        if rows:
+            tables.append(pa.table([pa.array(c, type=f.type) for c, f in zip(zip(*rows), schema)], schema=schema))
+        if not tables:
+            return
+        table = pa.concat_tables(tables)
+
+        # Only write whole row groups until the sink is closed, the remainder waits for more rows
+        written = table.num_rows if final else table.num_rows - table.num_rows % self.row_group_rows
+        if written < table.num_rows:
+            self._tables[key].append(table.slice(written))
+        self._buffered[key] = table.num_rows - written
+        if written == 0:
+            return
+
+        if key not in self._writers:
+            path = self.root / dataset / f"{column}={quote(partition, safe='')}" / f"part-{self._run}.parquet"
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self._writers[key] = pq.ParquetWriter(path, schema)
+        self._writers[key].write_table(table.slice(0, written), row_group_size=self.row_group_rows)
+
+    def close(self):
+        for key in set(self._rows) | set(self._tables):
+            self._flush(key, final=True)
+        for writer in self._writers.values():
+            writer.close()
+        self._writers.clear()
+
+
+def read_dataset(root: Path, dataset: str, columns: Optional[List[str]] = None,
+                 row_filter: Optional[pc.Expression] = None) -> pa.Table:
+    """Reads a dataset written by ParquetSink. Only the requested columns are read, a filter on the partition column
+    skips whole directories and the rest of it is checked against row group statistics before decoding."""
+    column, _ = DATASETS[dataset]
+    partitioning = ds.partitioning(pa.schema([(column, pa.string())]), flavor="hive")
+    return ds.dataset(Path(root) / dataset, format="parquet", partitioning=partitioning).to_table(
+        columns=columns, filter=row_filter)
+
+
+def read_series(root: Path, preprocessor: str, estimator: str, compressor: str, block_summary_fn: str,
+                file_summary_fn: str) -> pa.Table:
+    """The Parquet equivalent of BenchmarkDatabase.get_solo_plot_dataframe"""
+    estimations = read_dataset(root, "estimations", columns=["file_hash", "metric"],
+                               row_filter=(pc.field("estimator") == estimator) &
+                                          (pc.field("preprocessor") == preprocessor) &
+                                          (pc.field("block_summary_func") == block_summary_fn) &
+                                          (pc.field("file_summary_func") == file_summary_fn))
+    compressions = read_dataset(root, "compressions",
+                                columns=["file_hash", "initial_size", "final_size", "percent_size_reduction"],
+                                row_filter=pc.field("compressor") == compressor)
+    return estimations.join(compressions, "file_hash", join_type="inner")
@@ -0,0 +1,60 @@
+#  Copyright (C) 2025 Julian Nowaczek.
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import argparse
+import logging
+import sys
+from pathlib import Path
+from timeit import default_timer
+
+from estimation_comparison.database import BenchmarkDatabase
+from estimation_comparison.parquet_sink import ParquetSink
+
+
+def export(database: BenchmarkDatabase, sink: ParquetSink):
+    for name, chunks in [("estimations", database.iter_named_estimations()),
+                         ("compressions", database.iter_named_compressions())]:
+        rows = 0
+        for chunk in chunks:
+            sink.write(name, chunk)
+            rows += chunk.num_rows
+        logging.info(f"Exported {rows} {name}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert a benchmark database into the Parquet datasets written by "
+                                                 "benchmark --parquet")
+    parser.add_argument("-v", "--verbose", dest="verbose", action="store_true")
+    parser.add_argument("-i", "--input_dir", type=Path, dest="input_dir", default="./benchmarks",
+                        help="directory to load benchmark.sqlite from")
+    parser.add_argument("-o", "--output_dir", type=Path, dest="output_dir", default=None,
+                        help="dataset directory, <input dir>/parquet by default")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO)
+
+    output_dir = args.output_dir if args.output_dir is not None else args.input_dir / "parquet"
+    # Results written by benchmark --parquet are part of the database as well, exporting on top would duplicate them
+    if output_dir.exists() and any(output_dir.iterdir()):
+        logging.error(f"'{output_dir}' is not empty, export into a new directory")
+        sys.exit(1)
+
+    start_time = default_timer()
+    with ParquetSink(output_dir) as sink:
+        export(BenchmarkDatabase(args.input_dir / "benchmark.sqlite", read_only=True), sink)
+    logging.info(f"Export completed in {default_timer() - start_time:.3f} seconds")
+
+
+if __name__ == "__main__":
+    main()
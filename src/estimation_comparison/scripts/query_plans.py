@@ -0,0 +1,149 @@
+#  Copyright (C) 2025 Julian Nowaczek.
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import argparse
+import itertools
+import logging
+import random
+import tempfile
+from pathlib import Path
+from timeit import default_timer
+
+from estimation_comparison.database import BenchmarkDatabase
+
+# Indexes added by migration 2, dropped to get the "before" numbers
+SCHEMA_INDEXES = ["compression_results_file_compressor", "compression_results_compressor_file",
+                  "file_estimations_series", "files_name"]
+
+# get_solo_plot_dataframe before estimation_compressions existed
+JOIN_QUERY = """
+    SELECT fe.file_hash,
+           fe.metric,
+           f.size_bytes  as initial_size,
+           cr.size_bytes as final_size
+    FROM file_estimations fe
+             CROSS JOIN files f ON f.file_hash = fe.file_hash
+             INNER JOIN compression_results cr ON cr.file_hash = fe.file_hash
+    WHERE metric IS NOT NULL
+      AND fe.preprocessor_id = (SELECT preprocessor_id FROM preprocessors WHERE name = ?)
+      AND fe.estimator_id = (SELECT estimator_id FROM estimators WHERE name = ?)
+      AND cr.compressor_id = (SELECT compressor_id FROM compressors WHERE name = ?)
+      AND fe.block_summary_func_id = (SELECT block_summary_id FROM block_summary_funcs WHERE name = ?)
+      AND fe.file_summary_func_id = (SELECT file_summary_id FROM file_summary_funcs WHERE name = ?)
+    ORDER BY name
+    """
+SERIES = ("preprocessor_3", "estimator", "compressor_5", "bsf_7", "mean")
+TAGS = ["tag_1", "tag_2", "tag_3", "tag_4"]
+
+
+def populate(db: BenchmarkDatabase, file_count: int, preprocessor_count: int, block_summary_count: int,
+             compressor_count: int):
+    rng = random.Random(1337)
+    db.con.executemany("INSERT INTO preprocessors(name) VALUES (?)",
+                       [(f"preprocessor_{i}",) for i in range(preprocessor_count)])
+    db.con.execute("INSERT INTO estimators(name, summarize_block, summarize_file) VALUES ('estimator', 1, 1)")
+    db.con.executemany("INSERT INTO block_summary_funcs(name) VALUES (?)",
+                       [(f"bsf_{i}",) for i in range(block_summary_count)])
+    db.con.execute("INSERT INTO file_summary_funcs(name) VALUES ('mean')")
+    db.con.executemany("INSERT INTO compressors(name) VALUES (?)", [(f"compressor_{i}",) for i in range(compressor_count)])
+    db.con.executemany("INSERT INTO tag_types(tag_name) VALUES (?)", [(f"tag_{i}",) for i in range(8)])
+
+    files = [(f"{i:064x}", f"/data/RAISE/{i}.TIF", f"RAISE/{i}.TIF", 36_000_000, 1) for i in range(file_count)]
+    db.con.executemany("INSERT INTO files (file_hash, path, name, size_bytes, quality_id) VALUES (?, ?, ?, ?, ?)",
+                       files)
+    db.con.executemany("INSERT INTO file_tags VALUES (?, ?)",
+                       [(f[0], tag) for f in files for tag in rng.sample(range(1, 9), 2)])
+    db.con.executemany("INSERT INTO compression_results VALUES (?, ?, ?)",
+                       [(f[0], c, rng.randrange(10_000_000, 36_000_000))
+                        for f, c in itertools.product(files, range(1, compressor_count + 1))])
+    db.con.executemany("INSERT INTO file_estimations VALUES (?, ?, 1, ?, 2, ?)",
+                       ((f[0], p, b, rng.random()) for f, p, b in
+                        itertools.product(files, range(1, preprocessor_count + 1),
+                                          range(2, block_summary_count + 2))))
+    db.con.commit()
+
+
+def time_queries(db: BenchmarkDatabase, repeats: int, materialized: bool):
+    if materialized:
+        queries = {
+            "get_solo_plot_dataframe": lambda: db.get_solo_plot_dataframe(*SERIES),
+            "get_solo_tag_plot_dataframe": lambda: db.get_solo_tag_plot_dataframe("preprocessor_3", "estimator",
+                                                                                  "compressor_5", "tag_2", "unknown"),
+            "get_solo_tag_plot_dataframe (x4 tags)": lambda: [
+                db.get_solo_tag_plot_dataframe("preprocessor_3", "estimator", "compressor_5", tag, "unknown")
+                for tag in TAGS],
+            "get_multi_tag_plot_dataframe (4 tags)": lambda: db.get_multi_tag_plot_dataframe(
+                "preprocessor_3", "estimator", "compressor_5", TAGS, ["unknown"]),
+        }
+    else:
+        queries = {"series join": lambda: db.con.execute(JOIN_QUERY, SERIES).fetchall()}
+    queries["files by name (x1000)"] = lambda: [db.con.execute("SELECT file_hash FROM files WHERE name = ?",
+                                                               (f"RAISE/{i}.TIF",)).fetchone() for i in range(1000)]
+    for name, query in queries.items():
+        start = default_timer()
+        for _ in range(repeats):
+            query()
+        logging.info(f"{name}: {(default_timer() - start) / repeats * 1000:.1f} ms")
+
+
+def explain(db: BenchmarkDatabase, query: str, parameters):
+    for row in db.con.execute(f"EXPLAIN QUERY PLAN {query}", parameters).fetchall():
+        logging.info(f"  {row[3]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the series queries with and without the schema indexes, "
+                                                 "and against the materialized estimation_compressions table")
+    parser.add_argument("-f", "--files", type=int, dest="files", default=10_000)
+    parser.add_argument("-p", "--preprocessors", type=int, dest="preprocessors", default=10)
+    parser.add_argument("-b", "--block-summary-funcs", type=int, dest="block_summary_funcs", default=10)
+    parser.add_argument("-c", "--compressors", type=int, dest="compressors", default=11)
+    parser.add_argument("-r", "--repeats", type=int, dest="repeats", default=3)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = BenchmarkDatabase(Path(tmp) / "benchmark.sqlite")
+        start = default_timer()
+        populate(db, args.files, args.preprocessors, args.block_summary_funcs, args.compressors)
+        logging.info(f"{db.con.execute('SELECT COUNT(*) FROM file_estimations').fetchone()[0]} estimation rows, "
+                     f"{db.con.execute('SELECT COUNT(*) FROM compression_results').fetchone()[0]} compression rows, "
+                     f"{db.con.execute('SELECT COUNT(*) FROM estimation_compressions').fetchone()[0]} "
+                     f"materialized rows in {default_timer() - start:.1f} s")
+
+        index_sql = [row[0] for row in db.con.execute(
+            f"SELECT sql FROM sqlite_master WHERE name IN ({', '.join('?' * len(SCHEMA_INDEXES))})", SCHEMA_INDEXES)]
+        for index in SCHEMA_INDEXES:
+            db.con.execute(f"DROP INDEX {index}")
+        db.con.execute("ANALYZE")
+        logging.info("Join without indexes:")
+        explain(db, JOIN_QUERY, SERIES)
+        time_queries(db, args.repeats, False)
+
+        for sql in index_sql:
+            db.con.execute(sql)
+        db.con.execute("ANALYZE")
+        logging.info("Join with indexes:")
+        explain(db, JOIN_QUERY, SERIES)
+        time_queries(db, args.repeats, False)
+
+        logging.info("Materialized:")
+        explain(db, "SELECT * FROM estimation_compressions WHERE preprocessor_id = 4 AND estimator_id = 1 "
+                    "AND block_summary_func_id = 8 AND file_summary_func_id = 2 AND compressor_id = 6", ())
+        time_queries(db, args.repeats, True)
+
+
+if __name__ == "__main__":
+    main()
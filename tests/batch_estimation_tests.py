@@ -0,0 +1,76 @@
+#  Copyright (C) 2025 Julian Nowaczek.
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+from imagecodecs import tiff_encode
+
+from estimation_comparison.data_collection.estimator import Autocorrelation
+from estimation_comparison.data_collection.estimator.byte_count_gte import ByteCountGte
+from estimation_comparison.data_collection.preprocessor import FlattenSampler
+from estimation_comparison.data_collection.scripts.benchmark import Benchmark
+from estimation_comparison.data_collection.summary_stats import autocorrelation_lag
+from estimation_comparison.model import Estimator, Preprocessor, InputFile, BlockSummaryFunc, FileSummaryFunc
+
+
+class BatchedEstimationTests(unittest.TestCase):
+    preprocessor = Preprocessor(name="entire_file", instance=FlattenSampler())
+    lag_1 = BlockSummaryFunc(name="lag_1", instance=autocorrelation_lag, parameters={"lag": 1})
+    mean = FileSummaryFunc(name="mean", instance=np.mean)
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        rng = np.random.default_rng(1337)
+        self.files = []
+        for index, shape in enumerate([(36, 54, 3), (36, 54, 3), (54, 36, 3), (18, 18, 3)]):
+            path = Path(self.dir.name) / f"{index}.tiff"
+            path.write_bytes(tiff_encode(rng.integers(0, 256, size=shape, dtype=np.uint8)))
+            self.files.append(InputFile(hash=str(index), path=str(path), name=path.name,
+                                        size_bytes=path.stat().st_size))
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def single(self, estimator, bsf, fsf, file):
+        ppd = Benchmark._preprocess_file(self.preprocessor, Benchmark._load_file(file))
+        ier = Benchmark._run_block_summary(Benchmark._run_estimator(estimator, bsf, fsf, ppd))
+        return Benchmark._run_file_summary(ier).value
+
+    def test_autocorrelation_matches_single(self):
+        estimator = Estimator(name="autocorrelation_972", instance=Autocorrelation(block_size=972),
+                              summarize_block=True, summarize_file=True)
+        results = Benchmark._run_estimation_batch(self.preprocessor, estimator, [(self.lag_1, self.mean)],
+                                                  self.files)
+        self.assertEqual(len(self.files), len(results))
+        for result in results:
+            self.assertAlmostEqual(self.single(estimator, self.lag_1, self.mean, result.input_file), result.value)
+
+    def test_bytecount_matches_single(self):
+        estimator = Estimator(name="bytecount_file_gte", instance=ByteCountGte())
+        results = Benchmark._run_estimation_batch(self.preprocessor, estimator, [(None, None)], self.files)
+        self.assertEqual(len(self.files), len(results))
+        for result in results:
+            self.assertEqual(self.single(estimator, None, None, result.input_file), result.value)
+
+    def test_memory_batches(self):
+        files = [InputFile(hash=str(i), path="", name="", size_bytes=size) for i, size in enumerate([3, 1, 2, 2])]
+        batches = list(Benchmark._memory_batches(files, budget=4 * 32))
+        self.assertEqual([[1, 2], [2], [3]], [[f.size_bytes for f in batch] for batch in batches])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+#  Copyright (C) 2025 Julian Nowaczek.
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from estimation_comparison.analysis.kfold import split_series
+from estimation_comparison.model import InputFile
+from tests.populated_database import PopulatedDatabaseTestCase
+
+
+class ColumnarResultTests(PopulatedDatabaseTestCase):
+    file_count = 10
+    series = ("entire_file", "entropy", "gzip_9", "none", "none")
+
+    def input_file(self, i):
+        return InputFile(f"h{i}", "p", f"n{i}", 1000 + i)
+
+    def test_matches_records(self):
+        desc, rec = self.db.get_solo_plot_dataframe(*self.series)
+        expected = pd.DataFrame.from_records(rec, columns=[item[0] for item in desc])
+        # Small chunks so the table is assembled from several fetchmany() calls
+        with mock.patch("estimation_comparison.database.COLUMNAR_CHUNK_ROWS", 3):
+            table = self.db.get_solo_plot_dataframe(*self.series, columnar=True)
+        self.assertEqual(pa.float64(), table.schema.field("percent_size_reduction").type)
+        self.assertEqual(pa.int64(), table.schema.field("final_size").type)
+        pd.testing.assert_frame_equal(expected, table.to_pandas(), check_dtype=False)
+
+    def test_empty_result_is_typed(self):
+        table = self.db.get_solo_plot_dataframe("entire_file", "entropy", "missing", "none", "none", columnar=True)
+        self.assertEqual(0, table.num_rows)
+        self.assertEqual(pa.float64(), table.schema.field("metric").type)
+        self.assertEqual(pa.string(), table.schema.field("file_hash").type)
+
+    def test_series_points_match_solo(self):
+        # get_series_points takes the compressor last
+        solo = ("entire_file", "entropy", "none", "none", "gzip_9")
+        series = [solo, ("entire_file", "entropy", "none", "none", "missing"), solo]
+        points = split_series(self.db.get_series_points(series, columnar=True), len(series))
+        self.assertEqual(3, len(points))
+        self.assertEqual(0, len(points[1][0]))
+        expected = self.db.get_solo_plot_dataframe(*self.series, columnar=True)
+        for metric, percent_size_reduction in (points[0], points[2]):
+            np.testing.assert_array_equal(expected["metric"].to_numpy(), metric)
+            np.testing.assert_array_equal(expected["percent_size_reduction"].to_numpy(), percent_size_reduction)
+
+
+if __name__ == '__main__':
+    unittest.main()
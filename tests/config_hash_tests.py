@@ -0,0 +1,118 @@
+#  Copyright (C) 2025 Julian Nowaczek.
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import sqlite3
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+from estimation_comparison.data_collection.estimator import Autocorrelation
+from estimation_comparison.data_collection.preprocessor import FlattenSampler, PatchSampler
+from estimation_comparison.data_collection.summary_stats import autocorrelation_lag
+from estimation_comparison.database import BenchmarkDatabase
+from estimation_comparison.model import Estimator, Preprocessor, InputFile, BlockSummaryFunc, FileSummaryFunc, \
+    EstimationResult
+
+
+class ConfigHashTests(unittest.TestCase):
+    def test_parameter_order_independent(self):
+        self.assertEqual(Preprocessor("a", PatchSampler(fraction=0.5, patch_dim=9)).config_hash,
+                         Preprocessor("b", PatchSampler(patch_dim=9, fraction=0.5)).config_hash)
+
+    def test_parameters_change_hash(self):
+        self.assertNotEqual(Estimator("a", Autocorrelation(block_size=972)).config_hash,
+                            Estimator("a", Autocorrelation(block_size=1024)).config_hash)
+        self.assertNotEqual(BlockSummaryFunc("a", autocorrelation_lag, {"lag": 1}).config_hash,
+                            BlockSummaryFunc("a", autocorrelation_lag, {"lag": 3}).config_hash)
+
+
+class ConfigIdentityTests(unittest.TestCase):
+    preprocessor = Preprocessor("entire_file", FlattenSampler())
+    lag = BlockSummaryFunc("lag_1", autocorrelation_lag, {"lag": 1})
+    mean = FileSummaryFunc("mean", np.mean)
+    file = InputFile("h1", "p", "n", 10)
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.db = BenchmarkDatabase(Path(self.dir.name) / "benchmark.sqlite")
+        self.db.update_preprocessors([self.preprocessor])
+        self.db.update_block_summary_funcs([self.lag])
+        self.db.update_file_summary_funcs([self.mean])
+        self.db.update_file(self.file)
+
+    def tearDown(self):
+        self.db.con.close()
+        self.dir.cleanup()
+
+    def estimate(self, estimator):
+        self.db.update_estimators([estimator])
+        self.db.update_estimation_result(
+            EstimationResult(0.5, self.file, self.preprocessor, estimator, self.lag, self.mean))
+
+    def test_rename_reuses_results(self):
+        self.estimate(Estimator("ac", Autocorrelation(block_size=8), True, True))
+        self.db.update_estimators([Estimator("ac_8", Autocorrelation(block_size=8), True, True)])
+        self.assertEqual([(1, "ac_8")], self.db.get_estimators())
+        self.assertEqual([], self.db.get_missing_estimation_results())
+
+    def test_changed_parameters_recompute(self):
+        self.estimate(Estimator("ac", Autocorrelation(block_size=8), True, True))
+        self.db.update_estimators([Estimator("ac", Autocorrelation(block_size=16), True, True)])
+        self.assertEqual(1, len(self.db.get_missing_estimation_results()))
+
+    def test_unchanged_reuses_results(self):
+        self.estimate(Estimator("ac", Autocorrelation(block_size=8), True, True))
+        self.db.update_estimators([Estimator("ac", Autocorrelation(block_size=8), True, True)])
+        self.assertEqual([], self.db.get_missing_estimation_results())
+
+    def test_swapped_names_keep_results(self):
+        self.db.update_estimators([Estimator("ac_a", Autocorrelation(block_size=8), True, True),
+                                   Estimator("ac_b", Autocorrelation(block_size=16), True, True)])
+        for estimator in (Estimator("ac_a", Autocorrelation(block_size=8), True, True),
+                          Estimator("ac_b", Autocorrelation(block_size=16), True, True)):
+            self.estimate(estimator)
+        self.db.update_estimators([Estimator("ac_b", Autocorrelation(block_size=8), True, True),
+                                   Estimator("ac_a", Autocorrelation(block_size=16), True, True)])
+        self.assertEqual([(1, "ac_b"), (2, "ac_a")], sorted(self.db.get_estimators()))
+        self.assertEqual([], self.db.get_missing_estimation_results())
+
+    def test_duplicate_parameters_rejected(self):
+        self.estimate(Estimator("ac", Autocorrelation(block_size=8), True, True))
+        with self.assertRaisesRegex(ValueError, "'ac' and 'ac_copy' have the same parameters"):
+            self.db.update_estimators([Estimator("ac", Autocorrelation(block_size=8), True, True),
+                                       Estimator("ac_copy", Autocorrelation(block_size=8), True, True)])
+        self.assertEqual([(1, "ac")], self.db.get_estimators())
+        self.assertEqual([], self.db.get_missing_estimation_results())
+
+    def test_migrate_parameter_blobs(self):
+        path = Path(self.dir.name) / "legacy.sqlite"
+        con = sqlite3.connect(path)
+        con.execute("CREATE TABLE compressors (compressor_id INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL, "
+                    "name TEXT NOT NULL UNIQUE, parameters BLOB)")
+        con.execute("INSERT INTO compressors(name, parameters) VALUES ('gzip_9', x'00')")
+        con.commit()
+        con.close()
+
+        db = BenchmarkDatabase(path)
+        columns = [row[1] for row in db.con.execute("PRAGMA table_info(compressors)")]
+        self.assertIn("config_hash", columns)
+        self.assertNotIn("parameters", columns)
+        self.assertEqual([(1, "gzip_9")], db.get_compressors())
+        db.con.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
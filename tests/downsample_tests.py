@@ -0,0 +1,60 @@
+#  Copyright (C) 2025 Julian Nowaczek.
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import unittest
+
+import numpy as np
+
+from estimation_comparison.data_collection.preprocessor import DownsampleSampler, ChainSampler, PatchSampler
+
+
+class DownsampleTests(unittest.TestCase):
+    half = DownsampleSampler(factor=2)
+    decimate = DownsampleSampler(factor=2, method="decimate")
+
+    def test_mean_rgb(self):
+        data = np.arange(4 * 4 * 3, dtype=np.uint8).reshape((4, 4, 3))
+        result = self.half.run(data)
+        self.assertEqual((2, 2, 3), result.shape)
+        self.assertEqual(np.uint8, result.dtype)
+        expected = np.rint(data.reshape((2, 2, 2, 2, 3)).mean(axis=(1, 3)) + 1e-9).astype(np.uint8)
+        np.testing.assert_array_equal(expected, result)
+
+    def test_mean_crops_partial_blocks(self):
+        data = np.ones((5, 7), dtype=np.uint8)
+        result = self.half.run(data)
+        self.assertEqual((2, 3), result.shape)
+        np.testing.assert_array_equal(np.ones((2, 3), dtype=np.uint8), result)
+
+    def test_mean_float(self):
+        data = np.asarray([[0.0, 1.0], [2.0, 3.0]])
+        np.testing.assert_array_equal(np.asarray([[1.5]]), self.half.run(data))
+
+    def test_decimate(self):
+        data = np.arange(16, dtype=np.uint8).reshape((4, 4))
+        np.testing.assert_array_equal(np.asarray([[0, 2], [8, 10]], dtype=np.uint8), self.decimate.run(data))
+
+    def test_factor_too_large(self):
+        with self.assertRaises(ValueError):
+            DownsampleSampler(factor=8).run(np.zeros((4, 16, 3), dtype=np.uint8))
+
+    def test_chain(self):
+        data = np.zeros((72, 72, 3), dtype=np.uint8)
+        chain = ChainSampler(stages=[DownsampleSampler(factor=2), PatchSampler(fraction=0.25, patch_dim=18)])
+        # 36x36 after downsampling is four 18x18 patches, one of which is kept
+        self.assertEqual(18 * 18 * 3, chain.run(data).shape[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
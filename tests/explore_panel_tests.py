@@ -0,0 +1,153 @@
+#  Copyright (C) 2025 Julian Nowaczek.
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import asyncio
+import importlib
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+from bokeh.document import Document
+from bokeh.document.events import ColumnDataChangedEvent
+from bokeh.models import Band
+
+from estimation_comparison.analysis import panel_data
+from estimation_comparison.analysis.panel_model import Series
+from estimation_comparison.data_collection.compressor.general import GzipCompressor
+from estimation_comparison.database import BenchmarkDatabase
+from estimation_comparison.model import InputFile, EstimationResult, Compressor, CompressionResult
+from tests.populated_database import PopulatedDatabaseTestCase
+
+
+class PlotEditorTests(PopulatedDatabaseTestCase):
+    compressors = [Compressor("gzip_1", GzipCompressor(level=1)), Compressor("gzip_9", GzipCompressor(level=9))]
+
+    @classmethod
+    def setUpClass(cls):
+        # The app opens benchmarks/benchmark.sqlite relative to where it is served from
+        cls.app_dir = tempfile.TemporaryDirectory()
+        (Path(cls.app_dir.name) / "benchmarks").mkdir()
+        BenchmarkDatabase(Path(cls.app_dir.name) / "benchmarks" / "benchmark.sqlite").con.close()
+        cwd = os.getcwd()
+        os.chdir(cls.app_dir.name)
+        try:
+            cls.explore_panel = importlib.import_module("estimation_comparison.analysis.explore_panel")
+        finally:
+            os.chdir(cwd)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.app_dir.cleanup()
+
+    def setUp(self):
+        super().setUp()
+        read_only = BenchmarkDatabase(self.db.db_path, read_only=True)
+        self.addCleanup(read_only.con.close)
+        patcher = mock.patch.object(self.explore_panel, "db", read_only)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        panel_data.cache = panel_data.SeriesCache(panel_data.CACHE_BYTES)
+
+        self.editor = self.explore_panel.PlotEditor(value=self.explore_panel.SeriesPlots(value=[]))
+        self.document = Document()
+        self.document.add_root(self.editor._figure)
+        self.events = []
+        self.document.on_change(self.events.append)
+
+    def apply(self, *series: Series):
+        self.events.clear()
+        asyncio.run(self.editor._apply(list(series)))
+
+    def sources(self):
+        return [glyphs.source for glyphs in self.editor._glyphs]
+
+    def touched(self, models) -> bool:
+        return any(getattr(event, "model", None) in models for event in self.events)
+
+    def test_add_and_remove(self):
+        first = Series(preprocessor="entire_file", estimator="entropy", compressor="gzip_1", block_summary_fn="none",
+                       file_summary_fn="none")
+        second = Series(preprocessor="entire_file", estimator="entropy", compressor="gzip_9", block_summary_fn="none",
+                        file_summary_fn="none", lin_fit_show=True)
+        self.apply(first)
+        source = self.sources()[0]
+        self.assertEqual({"percent_size_reduction", "metric"}, set(source.data))
+        self.assertEqual(20, len(source.data["metric"]))
+
+        self.apply(first, second)
+        self.assertIs(source, self.sources()[0])
+        self.assertFalse(self.touched([source, self.editor._glyphs[0].scatter]))
+        self.assertEqual(3, len(self.editor._figure.renderers))
+        self.assertEqual(2, len(self.editor._legend.items))
+
+        self.apply(first)
+        self.assertFalse(self.touched([source, self.editor._glyphs[0].scatter]))
+        self.assertEqual([self.editor._glyphs[0].scatter], self.editor._figure.renderers)
+        self.assertEqual(1, len(self.editor._legend.items))
+        self.assertFalse(any(isinstance(r, Band) for r in self.editor._figure.center))
+
+        self.apply()
+        self.assertEqual([], self.editor._figure.renderers)
+        self.assertEqual([], self.editor._legend.items)
+
+    def test_toggle_fits(self):
+        plain = Series(preprocessor="entire_file", estimator="entropy", compressor="gzip_1", block_summary_fn="none",
+                       file_summary_fn="none")
+        fitted = Series(preprocessor="entire_file", estimator="entropy", compressor="gzip_1", block_summary_fn="none",
+                        file_summary_fn="none", lin_fit_show=True)
+        self.apply(plain)
+        source = self.sources()[0]
+
+        self.apply(fitted)
+        self.assertIs(source, self.sources()[0])
+        changed = [event for event in self.events if isinstance(event, ColumnDataChangedEvent)]
+        self.assertEqual(1, len(changed))
+        self.assertEqual({"lin_fit", "lin_conf_lower", "lin_conf_upper"}, set(changed[0].cols))
+        expected = panel_data.fit_columns(
+            self.explore_panel.db.get_solo_plot_dataframe("entire_file", "entropy", "gzip_1", "none", "none",
+                                                          columnar=True).to_pandas()
+            .sort_values("percent_size_reduction"), "lin")
+        np.testing.assert_allclose(np.sort(expected["lin_fit"]), np.sort(source.data["lin_fit"]))
+        line, band = self.editor._glyphs[0].fits["lin"]
+        self.assertTrue(line.visible and band.visible)
+
+        # Hiding and showing again only flips visibility
+        self.apply(plain)
+        self.assertFalse(line.visible or band.visible)
+        self.apply(fitted)
+        self.assertTrue(line.visible and band.visible)
+        self.assertFalse(any(isinstance(event, ColumnDataChangedEvent) for event in self.events))
+
+    def test_new_results_rebuild_series(self):
+        series = Series(preprocessor="entire_file", estimator="entropy", compressor="gzip_1", block_summary_fn="none",
+                        file_summary_fn="none")
+        self.apply(series)
+        source = self.sources()[0]
+        f = InputFile("h20", "p", "n20", 1000)
+        self.db.update_file(f)
+        self.db.update_estimation_result(EstimationResult(1.0, f, self.preprocessor, self.estimators[0], None, None))
+        self.db.update_compression_result(CompressionResult(f, self.compressors[0], 500))
+        self.db.con.commit()
+
+        self.apply(series)
+        self.assertIsNot(source, self.sources()[0])
+        self.assertEqual(21, len(self.sources()[0].data["metric"]))
+        self.assertEqual(1, len(self.editor._figure.renderers))
+
+
+if __name__ == '__main__':
+    unittest.main()
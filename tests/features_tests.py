@@ -0,0 +1,154 @@
+#  Copyright (C) 2025 Julian Nowaczek.
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+
+from estimation_comparison.analysis import features
+from estimation_comparison.analysis.features import FeatureMatrixCache, build_feature_matrix
+from estimation_comparison.data_collection.compressor.general import GzipCompressor
+from estimation_comparison.data_collection.estimator import ByteCount, Entropy
+from estimation_comparison.database import BenchmarkDatabase
+from estimation_comparison.model import Estimator, InputFile, EstimationResult, Compressor, CompressionResult
+from tests.populated_database import PopulatedDatabaseTestCase
+
+
+class FeatureMatrixTests(PopulatedDatabaseTestCase):
+    estimators = [Estimator("entropy", Entropy(), False, False), Estimator("bytecount", ByteCount(), False, False)]
+    compressors = [Compressor("gzip_1", GzipCompressor(level=1)), Compressor("gzip_9", GzipCompressor(level=9))]
+
+    # bytecount is missing for some files, gzip_9 for others
+    def metric(self, i, estimator):
+        return super().metric(i, estimator) if estimator.name == "entropy" or i % 4 else None
+
+    def final_size(self, i, compressor):
+        return super().final_size(i, compressor) if compressor.name == "gzip_1" or i % 3 else None
+
+    def assert_matches_series(self, matrix):
+        self.assertEqual(np.float32, matrix.x.dtype)
+        self.assertEqual(["gzip_1", "gzip_9"], matrix.compressors)
+        self.assertEqual({"entropy", "bytecount"}, set(matrix.features["estimator"]))
+        for estimator in ("entropy", "bytecount"):
+            for compressor in matrix.compressors:
+                data = self.db.get_solo_plot_dataframe("entire_file", estimator, compressor, "none", "none",
+                                                       columnar=True).to_pandas()
+                rows = matrix.files.get_indexer(data["file_hash"])
+                x = matrix.feature("entire_file", estimator, "none", "none")
+                y = matrix.target(compressor)
+                np.testing.assert_array_equal(data["metric"].to_numpy(np.float32), x[rows])
+                np.testing.assert_array_equal(data["percent_size_reduction"].to_numpy(np.float32), y[rows])
+                # Every other row lacks the metric or the size reduction
+                self.assertEqual(len(data), np.sum(~np.isnan(x) & ~np.isnan(y)))
+
+    def test_matches_series(self):
+        self.assert_matches_series(build_feature_matrix(self.db))
+
+    def test_cache(self):
+        cache = FeatureMatrixCache(Path(self.dir.name) / "features")
+        with mock.patch.object(features, "build_feature_matrix", wraps=build_feature_matrix) as build:
+            first = cache.load(self.db)
+            self.assert_matches_series(first)
+            self.assertIsInstance(first.x, np.memmap)
+            cache.load(self.db)
+            self.assertEqual(1, build.call_count)
+
+            f = InputFile("h20", "p", "n20", 1000)
+            self.db.update_file(f)
+            self.db.update_estimation_result(
+                EstimationResult(1.0, f, self.preprocessor, self.estimators[0], None, None))
+            self.db.update_compression_result(CompressionResult(f, self.compressors[0], 500))
+            self.db.con.commit()
+            second = cache.load(self.db)
+            self.assertEqual(2, build.call_count)
+
+        self.assertIn("h20", second.files)
+        self.assert_matches_series(second)
+        self.assertEqual([str(self.db.get_revision())], [p.name for p in cache._directory(self.db).iterdir()])
+
+    def test_cache_per_database(self):
+        cache = FeatureMatrixCache(Path(self.dir.name) / "features")
+        cache.load(self.db)
+        other = BenchmarkDatabase(Path(self.dir.name) / "other.sqlite")
+        # Same revision as the first database, but none of its results
+        other.con.execute("UPDATE data_revision SET revision = ?", (self.db.get_revision(),))
+        other.con.commit()
+        self.assertEqual(0, len(cache.load(other).files))
+        self.assertEqual(20, len(cache.load(self.db).files))
+        other.con.close()
+
+    def test_cache_recreated_database(self):
+        cache = FeatureMatrixCache(Path(self.dir.name) / "features")
+        cache.load(self.db)
+        revision = self.db.get_revision()
+        self.db.con.close()
+        for suffix in ("", "-wal", "-shm"):
+            Path(f"{self.db.db_path}{suffix}").unlink(missing_ok=True)
+
+        self.db = BenchmarkDatabase(self.db.db_path)
+        self.addCleanup(self.db.con.close)
+        self.db.update_preprocessors([self.preprocessor])
+        self.db.update_estimators(self.estimators)
+        self.db.update_compressors(self.compressors)
+        for i in range(3):
+            f = InputFile(f"r{i}", "p", f"r{i}", 1000)
+            self.db.update_file(f)
+            self.db.update_estimation_result(
+                EstimationResult(100.0 + i, f, self.preprocessor, self.estimators[0], None, None))
+            self.db.update_compression_result(CompressionResult(f, self.compressors[0], 500))
+        # Same path and same revision as the cached build, but other data
+        self.db.con.execute("UPDATE data_revision SET revision = ?", (revision,))
+        self.db.con.commit()
+        matrix = cache.load(self.db)
+        self.assertEqual(["r0", "r1", "r2"], sorted(matrix.files))
+        np.testing.assert_array_equal([100, 101, 102],
+                                      np.sort(matrix.feature("entire_file", "entropy", "none", "none")))
+
+    def test_database_id(self):
+        database_id = self.db.get_database_id()
+        self.assertRegex(database_id, "^[0-9a-f]{32}$")
+        self.db.con.execute("ALTER TABLE data_revision DROP COLUMN database_id")
+        self.db.con.execute("PRAGMA user_version = 8")
+        self.db.con.commit()
+        migrated = BenchmarkDatabase(self.db.db_path)
+        self.assertRegex(migrated.get_database_id(), "^[0-9a-f]{32}$")
+        self.assertNotEqual(database_id, migrated.get_database_id())
+        reopened = BenchmarkDatabase(self.db.db_path, read_only=True)
+        self.assertEqual(migrated.get_database_id(), reopened.get_database_id())
+        migrated.con.close()
+        reopened.con.close()
+
+    def test_empty_database(self):
+        empty = BenchmarkDatabase(Path(self.dir.name) / "empty.sqlite")
+        empty.update_preprocessors([self.preprocessor])
+        empty.update_estimators(self.estimators)
+        empty.update_compressors(self.compressors)
+        matrix = FeatureMatrixCache(Path(self.dir.name) / "features").load(empty)
+        self.assertEqual((0, 0), matrix.x.shape)
+        self.assertEqual((0, 2), matrix.y.shape)
+        self.assertEqual(["gzip_1", "gzip_9"], matrix.compressors)
+        empty.con.close()
+
+    def test_cache_read_only(self):
+        self.db.con.commit()
+        cache = FeatureMatrixCache(Path(self.dir.name) / "features")
+        read_only = BenchmarkDatabase(self.db.db_path, read_only=True)
+        np.testing.assert_array_equal(build_feature_matrix(self.db).x, cache.load(read_only).x)
+        read_only.con.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
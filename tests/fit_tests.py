@@ -0,0 +1,59 @@
+#  Copyright (C) 2025 Julian Nowaczek.
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import unittest
+
+import numpy as np
+
+from estimation_comparison.analysis.fit import linear_fit, quadratic_fit, polynomial_fit
+
+
+class PolynomialFitTests(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(1337)
+        self.x = np.sort(rng.uniform(0, 80, 300))
+        self.y = 7 - 0.05 * self.x + 0.0004 * self.x ** 2 + rng.normal(0, 0.3, self.x.shape)
+        self.weights = rng.uniform(0.5, 2, self.x.shape)
+        self.new_x = np.linspace(-10, 100, 23)
+
+    def test_matches_lmfit(self):
+        for fit in (linear_fit, quadratic_fit):
+            for weights in (None, self.weights):
+                expected = fit(self.x, self.y, weights, use_lmfit=True)
+                actual = fit(self.x, self.y, weights)
+                self.assertEqual(expected.best_values.keys(), actual.best_values.keys())
+                for name, value in expected.best_values.items():
+                    self.assertAlmostEqual(value, actual.best_values[name], delta=1e-7 * max(abs(value), 1))
+                np.testing.assert_allclose(expected.best_fit, actual.best_fit, rtol=1e-8)
+                self.assertAlmostEqual(expected.redchi, actual.redchi, places=8)
+                for x in (self.x, self.new_x):
+                    np.testing.assert_allclose(expected.eval_uncertainty(x=x, sigma=2),
+                                               actual.eval_uncertainty(x=x, sigma=2), rtol=1e-4)
+
+    def test_eval(self):
+        result = polynomial_fit(self.x, self.y, 2)
+        np.testing.assert_allclose(result.best_fit, result.eval())
+        c, b, a = result.best_values["c"], result.best_values["b"], result.best_values["a"]
+        np.testing.assert_allclose(c + b * self.new_x + a * self.new_x ** 2, result.eval(self.new_x))
+
+    def test_too_few_points(self):
+        result = linear_fit(self.x[:2], self.y[:2])
+        np.testing.assert_allclose(self.y[:2], result.best_fit)
+        self.assertTrue(np.isnan(result.eval_uncertainty(sigma=2)).all())
+        result = quadratic_fit(np.ones(5), self.y[:5])
+        np.testing.assert_allclose(np.full(5, self.y[:5].mean()), result.best_fit)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+#  Copyright (C) 2025 Julian Nowaczek.
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import math
+import random
+import unittest
+
+import numpy as np
+
+from estimation_comparison.data_collection.preprocessor import PatchSampler
+from estimation_comparison.data_collection.preprocessor.index_cache import SampleIndexCache, sample_index_cache
+from estimation_comparison.data_collection.preprocessor.linear_sample import LinearSampler
+
+
+class SampleIndexCacheTests(unittest.TestCase):
+    def setUp(self):
+        sample_index_cache.cache_clear()
+
+    def test_hit_on_same_shape(self):
+        sampler = PatchSampler(patch_dim=2, fraction=0.5)
+        data = np.arange(8 * 8 * 3, dtype=np.uint8).reshape((8, 8, 3))
+        first = sampler.run(data)
+        second = sampler.run(data + 1)
+        np.testing.assert_array_equal(first + 1, second)
+        info = sample_index_cache.cache_info()
+        self.assertEqual((1, 1, 1), (info.hits, info.misses, info.currsize))
+
+    def test_miss_on_new_shape_or_parameters(self):
+        data = np.zeros((8, 8, 3), dtype=np.uint8)
+        PatchSampler(patch_dim=2, fraction=0.5).run(data)
+        PatchSampler(patch_dim=2, fraction=0.25).run(data)
+        PatchSampler(patch_dim=2, fraction=0.5).run(np.zeros((10, 8, 3), dtype=np.uint8))
+        info = sample_index_cache.cache_info()
+        self.assertEqual((0, 3), (info.hits, info.misses))
+
+    def test_matches_global_random(self):
+        sampler = LinearSampler(patch_len=4, fraction=0.25)
+        data = np.arange(200, dtype=np.uint8)
+        starts = list(filter(lambda x: x + 4 < 200, range(0, 200, 4)))
+        random.seed(1337)
+        expected = np.hstack([data[s:s + 4] for s in random.sample(starts, math.floor(len(starts) * 0.25))])
+        np.testing.assert_array_equal(expected, sampler.run(data))
+
+    def test_bounded(self):
+        cache = SampleIndexCache(maxsize=2)
+        sampler = PatchSampler()
+        for rows in range(3):
+            cache.get(sampler, (rows, 1), lambda shape: np.zeros(shape))
+        cache.get(sampler, (0, 1), lambda shape: np.zeros(shape))
+        info = cache.cache_info()
+        self.assertEqual((0, 4, 2), (info.hits, info.misses, info.currsize))
+
+    def test_read_only(self):
+        cache = SampleIndexCache()
+        indexes = cache.get(PatchSampler(), (2, 2), lambda shape: np.zeros(shape))
+        with self.assertRaises(ValueError):
+            indexes[0, 0] = 1
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+#  Copyright (C) 2025 Julian Nowaczek.
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+from estimation_comparison.data_collection.estimator import Autocorrelation
+from estimation_comparison.data_collection.preprocessor import FlattenSampler
+from estimation_comparison.data_collection.scripts.benchmark import Benchmark
+from estimation_comparison.data_collection.summary_stats import autocorrelation_lag
+from estimation_comparison.intermediate_store import IntermediateStore
+from estimation_comparison.model import Estimator, Preprocessor, InputFile, BlockSummaryFunc, FileSummaryFunc, \
+    IntermediateEstimationResult
+
+
+class IntermediateStoreTests(unittest.TestCase):
+    preprocessor = Preprocessor(name="entire_file", instance=FlattenSampler())
+    estimator = Estimator(name="autocorrelation_8", instance=Autocorrelation(block_size=8), summarize_block=True,
+                          summarize_file=True)
+    file = InputFile(hash="abcdef", path="", name="a.tiff", size_bytes=64)
+    result = np.random.default_rng(1337).random((8, 15))
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def ier(self):
+        return IntermediateEstimationResult(result=self.result, input_file=self.file, preprocessor=self.preprocessor,
+                                            estimator=self.estimator, block_summary_func=None, file_summary_func=None)
+
+    def test_round_trip_memory_mapped(self):
+        store = IntermediateStore(Path(self.dir.name))
+        self.assertIsNone(store.load("abcdef", self.preprocessor, self.estimator))
+        store.save(self.ier())
+        self.assertTrue(store.contains("abcdef", self.preprocessor, self.estimator))
+        loaded = store.load("abcdef", self.preprocessor, self.estimator)
+        self.assertIsInstance(loaded, np.memmap)
+        np.testing.assert_array_equal(self.result, loaded)
+
+    def test_round_trip_compressed(self):
+        store = IntermediateStore(Path(self.dir.name), compress=True)
+        store.save(self.ier())
+        np.testing.assert_array_equal(self.result, store.load("abcdef", self.preprocessor, self.estimator))
+
+    def test_summaries_from_store(self):
+        store = IntermediateStore(Path(self.dir.name))
+        store.save(self.ier())
+        lag_1 = BlockSummaryFunc(name="lag_1", instance=autocorrelation_lag, parameters={"lag": 1})
+        mean = FileSummaryFunc(name="mean", instance=np.mean)
+        results = Benchmark._run_summaries_from_store(store, self.preprocessor, self.estimator, [(lag_1, mean)],
+                                                      self.file)
+        self.assertEqual(1, len(results))
+        self.assertAlmostEqual(np.mean(np.abs(self.result[:, 8])), results[0].value)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+#  Copyright (C) 2025 Julian Nowaczek.
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import unittest
+from unittest import mock
+
+import numpy as np
+from sklearn.linear_model import LinearRegression
+from sklearn.model_selection import KFold, cross_validate, permutation_test_score
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import PolynomialFeatures
+
+from estimation_comparison.analysis import kfold
+from estimation_comparison.analysis.kfold import drop_short_series, kfold_scores, kfold_scores_ragged, \
+    kfold_scores_parallel, permutation_test, permutation_tests_parallel
+
+
+def pipeline(degree):
+    if degree == 1:
+        return make_pipeline(LinearRegression())
+    return make_pipeline(PolynomialFeatures(degree), LinearRegression())
+
+
+def sklearn_scores(x, y, degree):
+    scores = cross_validate(pipeline(degree), x[:, None], y, cv=KFold(n_splits=10, shuffle=True, random_state=1337),
+                            scoring=["r2", "neg_mean_squared_error"])
+    return scores["test_r2"], -scores["test_neg_mean_squared_error"]
+
+
+class KFoldTests(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(1337)
+        self.x = rng.uniform(0, 8, (4, 257))
+        self.y = 100 - 9 * self.x + 0.5 * self.x ** 2 + rng.normal(0, 3, self.x.shape)
+
+    def test_matches_sklearn(self):
+        for degree in (1, 2):
+            scores = kfold_scores(self.x, self.y, degree)
+            self.assertEqual((4, 10), scores.r2.shape)
+            for row in range(4):
+                r2, mse = sklearn_scores(self.x[row], self.y[row], degree)
+                np.testing.assert_allclose(r2, scores.r2[row], rtol=1e-9)
+                np.testing.assert_allclose(mse, scores.mse[row], rtol=1e-9)
+                np.testing.assert_allclose(np.sqrt(mse), scores.rmse[row], rtol=1e-9)
+
+    def test_ragged(self):
+        series = [(self.x[0], self.y[0]), (self.x[1, :100], self.y[1, :100]), (self.x[2], self.y[2])]
+        with mock.patch.object(kfold, "BATCH_SERIES", 1):
+            scores = kfold_scores_ragged(series, degree=2)
+        for (x, y), s in zip(series, scores):
+            r2, mse = sklearn_scores(x, y, 2)
+            np.testing.assert_allclose(r2, s.r2, rtol=1e-9)
+            np.testing.assert_allclose(mse, s.mse, rtol=1e-9)
+
+    def test_constant_metric(self):
+        x = np.full(50, 3.0)
+        y = np.arange(50.0)
+        scores = kfold_scores(x, y, 1)
+        r2, mse = sklearn_scores(x, y, 1)
+        np.testing.assert_allclose(r2, scores.r2[0], rtol=1e-9)
+        np.testing.assert_allclose(mse, scores.mse[0], rtol=1e-9)
+
+    def test_permutation_test_matches_sklearn(self):
+        # A weak relation, so permuted scores land on both sides of the real one
+        y = self.x[0] * 0.05 + np.random.default_rng(7).normal(0, 3, self.x.shape[1])
+        for degree in (1, 2):
+            expected = permutation_test_score(pipeline(degree), self.x[0][:, None], y,
+                                              cv=KFold(n_splits=10, shuffle=True, random_state=1337),
+                                              scoring="neg_root_mean_squared_error", n_permutations=30,
+                                              random_state=1337)
+            with mock.patch.object(kfold, "BATCH_PERMUTATIONS", 7):
+                score, permutation_scores, pvalue = permutation_test(self.x[0], y, degree, n_permutations=30)
+            self.assertAlmostEqual(expected[0], score, places=9)
+            np.testing.assert_allclose(expected[1], permutation_scores, rtol=1e-9)
+            self.assertEqual(expected[2], pvalue)
+
+    def test_drop_short_series(self):
+        names = [("a",), ("b",), ("c",)]
+        points = [(self.x[0], self.y[0]), (self.x[1, :9], self.y[1, :9]), (self.x[2, :0], self.y[2, :0])]
+        with self.assertLogs(level="WARNING") as logs:
+            kept_names, kept_points = drop_short_series(names, points)
+        self.assertEqual([("a",)], kept_names)
+        np.testing.assert_array_equal(self.x[0], kept_points[0][0])
+        self.assertEqual(1, len(kept_points))
+        self.assertEqual(2, len(logs.output))
+
+    def test_process_pool_matches_inline(self):
+        series = [(self.x[row], self.y[row]) for row in range(4)]
+        with mock.patch.object(kfold, "BATCH_SERIES", 3):
+            pooled = kfold_scores_parallel(series, degree=2, jobs=2)
+        for expected, actual in zip(kfold_scores_ragged(series, degree=2), pooled):
+            np.testing.assert_allclose(expected.r2, actual.r2, rtol=1e-12)
+            np.testing.assert_allclose(expected.mse, actual.mse, rtol=1e-12)
+
+        pooled = permutation_tests_parallel(series[:2], n_permutations=5, jobs=2)
+        for (x, y), (score, permutation_scores, pvalue) in zip(series, pooled):
+            expected = permutation_test(x, y, n_permutations=5)
+            self.assertEqual(expected[0], score)
+            np.testing.assert_array_equal(expected[1], permutation_scores)
+            self.assertEqual(expected[2], pvalue)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,168 @@
+#  Copyright (C) 2025 Julian Nowaczek.
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import asyncio
+import functools
+import threading
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from estimation_comparison.analysis import panel_data
+from estimation_comparison.database import BenchmarkDatabase
+from estimation_comparison.model import InputFile, EstimationResult, CompressionResult
+from tests.populated_database import PopulatedDatabaseTestCase
+
+
+class PanelDataTests(PopulatedDatabaseTestCase):
+    series = ("entire_file", "entropy", "gzip_9", "none", "none")
+
+    def setUp(self):
+        super().setUp()
+        self.writer = self.db
+        self.db = BenchmarkDatabase(self.writer.db_path, read_only=True)
+        self.addCleanup(self.db.con.close)
+        panel_data.cache = panel_data.SeriesCache(panel_data.CACHE_BYTES)
+
+    def test_load_series_off_loop(self):
+        threads = []
+        query = self.db.get_solo_plot_dataframe
+
+        def record_thread(*args, columnar):
+            threads.append(threading.current_thread())
+            return query(*args, columnar=columnar)
+
+        with mock.patch.object(self.db, "get_solo_plot_dataframe", record_thread):
+            data = asyncio.run(panel_data.load_series(self.db, "get_solo_plot_dataframe", *self.series,
+                                                      show_linear=True, show_quadratic=True))
+
+        self.assertEqual(1, len(threads))
+        self.assertIsNot(threading.main_thread(), threads[0])
+        self.assertEqual(20, len(data))
+        self.assertTrue(data["percent_size_reduction"].is_monotonic_increasing)
+        for column in ("lin_fit", "lin_conf_lower", "lin_conf_upper", "quad_fit", "quad_conf_lower",
+                       "quad_conf_upper"):
+            self.assertIn(column, data)
+        self.assertTrue((data["lin_conf_lower"] <= data["lin_conf_upper"]).all())
+
+    def test_concurrent_loads(self):
+        async def load_all():
+            return await asyncio.gather(*(panel_data.load_series(self.db, "get_solo_plot_dataframe", *self.series)
+                                          for _ in range(8)))
+
+        frames = asyncio.run(load_all())
+        for data in frames:
+            self.assertTrue(frames[0].equals(data))
+            self.assertNotIn("lin_fit", data)
+
+    def test_cache_hits_until_data_changes(self):
+        load = functools.partial(panel_data.load_series, self.db, "get_solo_plot_dataframe", *self.series,
+                                 show_linear=True)
+        query = self.db.get_solo_plot_dataframe
+        with mock.patch.object(self.db, "get_solo_plot_dataframe", wraps=query) as spy, \
+                mock.patch.object(panel_data, "fit_columns", wraps=panel_data.fit_columns) as fit_spy:
+            first = asyncio.run(load())
+            first["metric"] = 0.0
+            second = asyncio.run(load())
+            self.assertEqual(1, spy.call_count)
+            self.assertEqual(1, fit_spy.call_count)
+            # Handed out frames are copies
+            self.assertFalse((second["metric"] == 0.0).all())
+
+            f = InputFile("h20", "p", "n20", 1000)
+            self.writer.update_file(f)
+            self.writer.update_estimation_result(
+                EstimationResult(1.0, f, self.preprocessor, self.estimators[0], None, None))
+            self.writer.update_compression_result(CompressionResult(f, self.compressors[0], 500))
+            third = asyncio.run(load())
+            self.assertEqual(2, spy.call_count)
+            self.assertEqual(2, fit_spy.call_count)
+            self.assertEqual(21, len(third))
+
+    def test_revision_ignores_unrelated_writes(self):
+        revision = self.db.get_revision()
+        self.writer.update_compressors([self.compressors[0]])
+        self.assertEqual(revision, self.db.get_revision())
+        self.writer.update_compression_result(
+            CompressionResult(InputFile("h0", "p", "n0", 1000), self.compressors[0], 1))
+        self.assertLess(revision, self.db.get_revision())
+
+    def test_revision_ignores_unchanged_files(self):
+        revision = self.db.get_revision()
+        # Rerunning the benchmark upserts every file again, moving the data set only changes paths
+        self.writer._upsert_file("h0", "p", "n0", 1000)
+        self.writer._upsert_file("h1", "elsewhere", "n1", 1000)
+        self.writer.con.execute("UPDATE files SET quality_id = quality_id")
+        self.writer.con.commit()
+        self.assertEqual(revision, self.db.get_revision())
+        self.assertEqual("elsewhere", self.writer.con.execute("SELECT path FROM files WHERE file_hash = 'h1'")
+                         .fetchone()[0])
+        self.writer._upsert_file("h0", "p", "renamed", 1000)
+        self.writer.con.commit()
+        self.assertLess(revision, self.db.get_revision())
+
+    def test_migrate_files_update_revision(self):
+        self.writer.con.execute("DROP TRIGGER files_update_revision")
+        self.writer.con.execute("CREATE TRIGGER files_update_revision AFTER UPDATE ON files "
+                                "BEGIN UPDATE data_revision SET revision = revision + 1; END")
+        self.writer.con.execute("PRAGMA user_version = 7")
+        self.writer.con.commit()
+        migrated = BenchmarkDatabase(self.writer.db_path)
+        revision = migrated.get_revision()
+        migrated.con.execute("UPDATE files SET path = 'elsewhere'")
+        migrated.con.commit()
+        self.assertEqual(revision, migrated.get_revision())
+        migrated.con.close()
+
+    def test_grouped_fits(self):
+        rng = np.random.default_rng(1337)
+        data = pd.DataFrame({"tag": np.repeat(["a", "b"], 10), "percent_size_reduction": rng.uniform(0, 100, 20)})
+        data["metric"] = np.where(data["tag"] == "a", 1.0, -2.0) * data["percent_size_reduction"] + 3.0
+        fit = panel_data._grouped_fit_columns(data, "lin", ("tag",))
+        np.testing.assert_allclose(data["metric"], fit.loc[data.index, "lin_fit"], atol=1e-6)
+
+
+class SeriesCacheTests(unittest.TestCase):
+    @staticmethod
+    def frame(rows: int) -> pd.DataFrame:
+        return pd.DataFrame({"x": np.zeros(rows)})
+
+    def test_evicts_least_recently_used(self):
+        size = int(self.frame(100).memory_usage(deep=True).sum())
+        cache = panel_data.SeriesCache(3 * size)
+        for key in "abc":
+            cache.put(0, key, self.frame(100))
+        cache.get(0, "a")
+        cache.put(0, "d", self.frame(100))
+        self.assertIsNone(cache.get(0, "b"))
+        for key in "acd":
+            self.assertIsNotNone(cache.get(0, key))
+        self.assertEqual(3 * size, cache.bytes)
+
+    def test_oversized_not_cached(self):
+        cache = panel_data.SeriesCache(100)
+        cache.put(0, "a", self.frame(1000))
+        self.assertEqual(0, len(cache))
+
+    def test_new_revision_clears(self):
+        cache = panel_data.SeriesCache(2 ** 20)
+        cache.put(0, "a", self.frame(10))
+        self.assertIsNone(cache.get(1, "a"))
+        self.assertEqual(0, cache.bytes)
+
+
+if __name__ == '__main__':
+    unittest.main()
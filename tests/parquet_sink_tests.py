@@ -0,0 +1,92 @@
+#  Copyright (C) 2025 Julian Nowaczek.
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from estimation_comparison.data_collection.compressor.general import GzipCompressor
+from estimation_comparison.data_collection.estimator import Entropy
+from estimation_comparison.data_collection.preprocessor import FlattenSampler
+from estimation_comparison.database import BenchmarkDatabase
+from estimation_comparison.model import Estimator, Preprocessor, InputFile, EstimationResult, Compressor, \
+    CompressionResult
+from estimation_comparison.parquet_sink import ParquetSink, read_dataset, read_series
+from estimation_comparison.scripts.export_parquet import export
+
+
+class ParquetSinkTests(unittest.TestCase):
+    preprocessor = Preprocessor("patch_random_25%", FlattenSampler())
+    estimators = [Estimator("entropy", Entropy(), False, False), Estimator("entropy_4", Entropy(base=4), False, False)]
+    compressor = Compressor("gzip_9", GzipCompressor(level=9))
+    files = [InputFile(f"h{i:02}", "p", f"n{i}", 1000 + i) for i in range(10)]
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.root = Path(self.dir.name) / "parquet"
+        rng = np.random.default_rng(1337)
+        self.estimations = [EstimationResult(rng.uniform(0, 8), f, self.preprocessor, e, None, None)
+                            for e in self.estimators for f in self.files]
+        self.compressions = [CompressionResult(f, self.compressor, int(rng.integers(100, 900))) for f in self.files]
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_row_groups(self):
+        with ParquetSink(self.root, row_group_rows=4) as sink:
+            for result in self.estimations:
+                sink.add_estimation(result)
+        parts = list((self.root / "estimations" / "estimator=entropy").glob("*.parquet"))
+        self.assertEqual(1, len(parts))
+        metadata = pq.ParquetFile(parts[0]).metadata
+        self.assertEqual([4, 4, 2], [metadata.row_group(i).num_rows for i in range(metadata.num_row_groups)])
+
+    def test_partition_filter(self):
+        with ParquetSink(self.root, row_group_rows=4) as sink:
+            for result in self.estimations:
+                sink.add_estimation(result)
+        table = read_dataset(self.root, "estimations", columns=["file_hash", "metric", "preprocessor"],
+                             row_filter=pc.field("estimator") == "entropy_4").sort_by("file_hash")
+        self.assertEqual(["file_hash", "metric", "preprocessor"], table.column_names)
+        self.assertEqual([r.value for r in self.estimations[10:]], table["metric"].to_pylist())
+        self.assertEqual({"patch_random_25%"}, set(table["preprocessor"].to_pylist()))
+
+    def test_export_matches_database(self):
+        db = BenchmarkDatabase(Path(self.dir.name) / "benchmark.sqlite")
+        db.update_preprocessors([self.preprocessor])
+        db.update_estimators(self.estimators)
+        db.update_compressors([self.compressor])
+        for f in self.files:
+            db.update_file(f)
+        for result in self.estimations:
+            db.update_estimation_result(result)
+        for result in self.compressions:
+            db.update_compression_result(result)
+
+        with ParquetSink(self.root, row_group_rows=4) as sink:
+            export(db, sink)
+        series = ("patch_random_25%", "entropy", "gzip_9", "none", "none")
+        expected = db.get_solo_plot_dataframe(*series, columnar=True).sort_by("file_hash")
+        db.con.close()
+
+        table = read_series(self.root, *series).sort_by("file_hash")
+        self.assertEqual(expected.select(table.column_names), table)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+#  Copyright (C) 2025 Julian Nowaczek.
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import tempfile
+import unittest
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from estimation_comparison.data_collection.compressor.general import GzipCompressor
+from estimation_comparison.data_collection.estimator import Entropy
+from estimation_comparison.data_collection.preprocessor import FlattenSampler
+from estimation_comparison.database import BenchmarkDatabase
+from estimation_comparison.model import Estimator, Preprocessor, InputFile, EstimationResult, Compressor, \
+    CompressionResult
+
+
+class PopulatedDatabaseTestCase(unittest.TestCase):
+    """Gives every test self.db, a benchmark database in the temporary self.dir filled with file_count files and
+    the results of estimators and compressors on them. Subclasses pick these and can override input_file, metric and
+    final_size, where None leaves a result out."""
+    preprocessor = Preprocessor("entire_file", FlattenSampler())
+    estimators = [Estimator("entropy", Entropy(), False, False)]
+    compressors = [Compressor("gzip_9", GzipCompressor(level=9))]
+    file_count = 20
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.rng = np.random.default_rng(1337)
+        self.db = self.create_database(Path(self.dir.name) / "benchmark.sqlite")
+        self.addCleanup(self.db.con.close)
+
+    def create_database(self, path: Path) -> BenchmarkDatabase:
+        db = BenchmarkDatabase(path)
+        db.update_preprocessors([self.preprocessor])
+        db.update_estimators(self.estimators)
+        db.update_compressors(self.compressors)
+        for i in range(self.file_count):
+            f = self.input_file(i)
+            db.update_file(f)
+            for estimator in self.estimators:
+                metric = self.metric(i, estimator)
+                if metric is not None:
+                    db.update_estimation_result(EstimationResult(metric, f, self.preprocessor, estimator, None, None))
+            for compressor in self.compressors:
+                final_size = self.final_size(i, compressor)
+                if final_size is not None:
+                    db.update_compression_result(CompressionResult(f, compressor, final_size))
+        db.con.commit()
+        return db
+
+    def input_file(self, i: int) -> InputFile:
+        return InputFile(f"h{i}", "p", f"n{i}", 1000)
+
+    def metric(self, i: int, estimator: Estimator) -> Optional[float]:
+        return self.rng.uniform(0, 8)
+
+    def final_size(self, i: int, compressor: Compressor) -> Optional[int]:
+        return int(self.rng.integers(100, 900))
@@ -0,0 +1,52 @@
+#  Copyright (C) 2025 Julian Nowaczek.
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import unittest
+
+import numpy as np
+
+from estimation_comparison.analysis.precision import precision_report
+from estimation_comparison.data_collection.estimator import Autocorrelation
+from estimation_comparison.data_collection.estimator.byte_count_gte import ByteCountGte
+from estimation_comparison.data_collection.summary_stats import autocorrelation_lag
+from estimation_comparison.model import BlockSummaryFunc
+
+
+class PrecisionPolicyTests(unittest.TestCase):
+    data = np.random.default_rng(1337).integers(0, 256, size=972 * 16, dtype=np.uint8)
+
+    def test_float32_autocorrelation(self):
+        reference = Autocorrelation(block_size=972).estimate(self.data)
+        single = Autocorrelation(block_size=972, precision="float32").estimate(self.data)
+        self.assertEqual(np.float64, reference.dtype)
+        self.assertEqual(np.float32, single.dtype)
+        np.testing.assert_allclose(reference, single, atol=1e-5)
+
+    def test_constant_block(self):
+        result = Autocorrelation(block_size=4, precision="float32").estimate(np.full(8, 7, dtype=np.uint8))
+        np.testing.assert_array_equal(np.ones((2, 7)), result)
+
+    def test_histogram_matches_unique(self):
+        estimator = ByteCountGte(block_size=972)
+        self.assertEqual(estimator.estimate(self.data.astype(np.int16)), estimator.estimate(self.data))
+
+    def test_report(self):
+        funcs = [BlockSummaryFunc(name="lag_1", instance=autocorrelation_lag, parameters={"lag": 1})]
+        report = precision_report(Autocorrelation(block_size=972), funcs, [self.data])
+        self.assertEqual(["float32"], list(report["precision"]))
+        self.assertLess(report["max metric error"].iloc[0], 1e-5)
+
+
+if __name__ == '__main__':
+    unittest.main()
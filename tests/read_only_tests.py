@@ -0,0 +1,70 @@
+#  Copyright (C) 2025 Julian Nowaczek.
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import sqlite3
+import tempfile
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from estimation_comparison.data_collection.compressor.general import GzipCompressor
+from estimation_comparison.database import BenchmarkDatabase
+from estimation_comparison.model import InputFile, Compressor, CompressionResult
+
+
+class ReadOnlyAccessTests(unittest.TestCase):
+    compressor = Compressor("gzip_9", GzipCompressor(level=9))
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = Path(self.dir.name) / "benchmark.sqlite"
+        self.writer = BenchmarkDatabase(self.path)
+        self.writer.update_compressors([self.compressor])
+        self.reader = BenchmarkDatabase(self.path, read_only=True)
+
+    def tearDown(self):
+        self.writer.con.close()
+        self.dir.cleanup()
+
+    def test_wal_mode(self):
+        self.assertEqual("wal", self.reader.con.execute("PRAGMA journal_mode").fetchone()[0])
+
+    def test_rejects_writes(self):
+        with self.assertRaises(sqlite3.OperationalError):
+            self.reader.con.execute("DELETE FROM compressors")
+
+    def test_connection_per_thread(self):
+        with ThreadPoolExecutor(2) as pool:
+            connections = set(pool.map(lambda _: id(self.reader.con), range(2)))
+        self.assertNotIn(id(self.reader.con), connections)
+
+    def test_read_during_write_transaction(self):
+        f = InputFile("h1", "p", "n", 10)
+        self.writer.update_file(f)
+        self.writer.con.execute("BEGIN IMMEDIATE")
+        self.writer.con.execute("INSERT INTO compression_results VALUES ('h1', 1, 5)")
+
+        result = []
+        thread = threading.Thread(target=lambda: result.append(self.reader.get_compression_results_for_file("h1")))
+        thread.start()
+        thread.join(timeout=5)
+        self.assertEqual([[]], result)
+
+        self.writer.con.commit()
+        self.assertEqual([CompressionResult("h1", "gzip_9", 5)], self.reader.get_compression_results_for_file("h1"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+#  Copyright (C) 2025 Julian Nowaczek.
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import sqlite3
+import tempfile
+import unittest
+from pathlib import Path
+
+from estimation_comparison.data_collection.compressor.general import GzipCompressor
+from estimation_comparison.database import BenchmarkDatabase
+from estimation_comparison.model import Compressor, InputFile, CompressionResult
+
+
+class SchemaIndexTests(unittest.TestCase):
+    compressor = Compressor("gzip_9", GzipCompressor(level=9))
+    file = InputFile("h1", "p", "n", 10)
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_compression_result_replaced(self):
+        db = BenchmarkDatabase(Path(self.dir.name) / "benchmark.sqlite")
+        db.update_compressors([self.compressor])
+        db.update_file(self.file)
+        db.update_compression_result(CompressionResult(self.file, self.compressor, 5))
+        db.update_compression_result(CompressionResult(self.file, self.compressor, 4))
+        self.assertEqual([("h1", 1, 4)], db.con.execute("SELECT * FROM compression_results").fetchall())
+        db.con.close()
+
+    def test_migrate_duplicate_compression_results(self):
+        path = Path(self.dir.name) / "legacy.sqlite"
+        con = sqlite3.connect(path)
+        con.execute("CREATE TABLE compression_results (file_hash NOT NULL, compressor_id NOT NULL, size_bytes INTEGER)")
+        con.executemany("INSERT INTO compression_results VALUES (?, ?, ?)", [("h1", 1, 5), ("h1", 1, 4), ("h2", 1, 3)])
+        con.execute("PRAGMA user_version = 1")
+        con.commit()
+        con.close()
+
+        db = BenchmarkDatabase(path)
+        self.assertEqual([("h1", 1, 4), ("h2", 1, 3)],
+                         db.con.execute("SELECT * FROM compression_results ORDER BY file_hash").fetchall())
+        with self.assertRaises(sqlite3.IntegrityError):
+            db.con.execute("INSERT INTO compression_results VALUES ('h2', 1, 2)")
+        db.con.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+#  Copyright (C) 2025 Julian Nowaczek.
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from estimation_comparison.analysis.features import FeatureMatrixCache
+from estimation_comparison.analysis.screening import pairwise_correlation, screen_correlations, top_configs
+from estimation_comparison.data_collection.compressor.general import GzipCompressor
+from estimation_comparison.data_collection.estimator import ByteCount, Entropy
+from estimation_comparison.database import BenchmarkDatabase
+from estimation_comparison.model import Estimator, Compressor
+from tests.populated_database import PopulatedDatabaseTestCase
+
+
+class PairwiseCorrelationTests(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(1337)
+        self.x = rng.normal(1000, 5, (200, 4))
+        self.y = self.x[:, :3] * [1, -2, 0] + rng.normal(0, 5, (200, 3))
+        self.x[rng.random(self.x.shape) < 0.2] = np.nan
+        self.y[rng.random(self.y.shape) < 0.1] = np.nan
+
+    def test_matches_pandas_pairwise_complete(self):
+        r, n = pairwise_correlation(self.x, self.y)
+        expected = pd.DataFrame(np.hstack([self.x, self.y])).corr().to_numpy()[:4, 4:]
+        np.testing.assert_allclose(expected, r, rtol=1e-9)
+        counts = (~np.isnan(self.x)).astype(int).T @ (~np.isnan(self.y)).astype(int)
+        np.testing.assert_array_equal(counts, n)
+
+    def test_constant_column(self):
+        r, _ = pairwise_correlation(np.ones((10, 1)), np.arange(10.0)[:, None])
+        self.assertTrue(np.isnan(r[0, 0]))
+
+
+class ScreenCorrelationTests(PopulatedDatabaseTestCase):
+    estimators = [Estimator("entropy", Entropy(), False, False), Estimator("bytecount", ByteCount(), False, False)]
+    compressors = [Compressor("gzip_1", GzipCompressor(level=1)), Compressor("gzip_9", GzipCompressor(level=9))]
+    file_count = 30
+
+    def setUp(self):
+        self.sizes = np.random.default_rng(42).integers(100, 900, self.file_count)
+        super().setUp()
+
+    # entropy tracks the compressed size, bytecount is noise and is missing for some files
+    def metric(self, i, estimator):
+        if estimator.name == "entropy":
+            return self.sizes[i] / 100 + self.rng.normal(0, 0.5)
+        return self.rng.uniform(0, 8) if i % 5 else None
+
+    def final_size(self, i, compressor):
+        return int(self.sizes[i] + self.rng.integers(0, 50))
+
+    def test_matches_series(self):
+        screen = screen_correlations(self.db)
+        self.assertEqual(4, len(screen))
+        for row in screen.itertuples(index=False):
+            data = self.db.get_solo_plot_dataframe(row.preprocessor, row.estimator, row.compressor,
+                                                   row.block_summary_func, row.file_summary_func,
+                                                   columnar=True).to_pandas()
+            self.assertEqual(len(data), row.n)
+            # The feature matrix holds float32 metrics
+            self.assertAlmostEqual(data["metric"].corr(data["percent_size_reduction"]), row.pearson, places=6)
+            if row.n == 30:
+                # Ranks span each column's own files, so Spearman is only exact for complete pairs
+                self.assertAlmostEqual(data["metric"].corr(data["percent_size_reduction"], method="spearman"),
+                                       row.spearman, places=9)
+
+    def test_top_configs(self):
+        screen = screen_correlations(self.db)
+        self.assertEqual(["entropy", "entropy"], list(screen["estimator"][:2]))
+        self.assertEqual([("entire_file", "entropy", "none", "none")], top_configs(screen, 1))
+        self.assertEqual(2, len(top_configs(screen, 5)))
+
+    def test_cached(self):
+        cache = FeatureMatrixCache(Path(self.dir.name) / "features")
+        pd.testing.assert_frame_equal(screen_correlations(self.db), screen_correlations(self.db, cache))
+        with mock.patch("estimation_comparison.analysis.features.build_feature_matrix") as build:
+            pd.testing.assert_frame_equal(screen_correlations(self.db), screen_correlations(self.db, cache))
+        build.assert_not_called()
+
+    def test_empty_database(self):
+        empty = BenchmarkDatabase(Path(self.dir.name) / "empty.sqlite")
+        self.assertEqual(0, len(screen_correlations(empty)))
+        self.assertEqual([], top_configs(screen_correlations(empty), 3))
+        empty.con.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+#  Copyright (C) 2025 Julian Nowaczek.
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+from estimation_comparison.analysis.fit import series_fit
+from estimation_comparison.data_collection.compressor.general import GzipCompressor
+from estimation_comparison.database import BenchmarkDatabase
+from estimation_comparison.model import InputFile, EstimationResult, Compressor, CompressionResult
+from tests.populated_database import PopulatedDatabaseTestCase
+
+
+class SeriesStatisticsTests(PopulatedDatabaseTestCase):
+    compressors = [Compressor("gzip_1", GzipCompressor(level=1)), Compressor("gzip_9", GzipCompressor(level=9))]
+    files = [InputFile(f"h{i}", "p", f"n{i}", 1000 + 10 * i) for i in range(20)]
+
+    def input_file(self, i):
+        return self.files[i]
+
+    def estimate(self, f, metric):
+        self.db.update_estimation_result(EstimationResult(metric, f, self.preprocessor, self.estimators[0], None, None))
+
+    def compress(self, f, c, size):
+        self.db.update_compression_result(CompressionResult(f, c, size))
+
+    def points(self, compressor):
+        _, rec = self.db.get_solo_plot_dataframe("entire_file", "entropy", compressor, "none", "none")
+        x = np.array([r[1] for r in rec])
+        y = (1.0 - np.array([r[3] for r in rec]) / np.array([r[2] for r in rec])) * 100.0
+        np.testing.assert_array_equal(y, [r[4] for r in rec])
+        return x, y
+
+    def assertStatisticsMatch(self, compressor):
+        x, y = self.points(compressor)
+        expected = [len(x), x.sum(), y.sum(), (x * x).sum(), (x * y).sum(), (y * y).sum(), (x ** 3).sum(),
+                    (x ** 4).sum(), (x * x * y).sum()]
+        np.testing.assert_allclose(self.db.get_series_statistics("entire_file", "entropy", compressor, "none", "none"),
+                                   expected, rtol=1e-9)
+
+    def test_inserts(self):
+        for c in self.compressors:
+            self.assertStatisticsMatch(c.name)
+
+    def test_replaced_results(self):
+        self.estimate(self.files[3], 7.5)
+        self.compress(self.files[5], self.compressors[0], 10)
+        for c in self.compressors:
+            self.assertStatisticsMatch(c.name)
+
+    def test_file_resized_and_deleted(self):
+        self.db.con.execute("UPDATE files SET size_bytes = 5000 WHERE file_hash = 'h2'")
+        self.db.con.execute("DELETE FROM files WHERE file_hash = 'h7'")
+        for c in self.compressors:
+            self.assertStatisticsMatch(c.name)
+
+    def test_changed_config_drops_series(self):
+        self.db.update_compressors([Compressor("gzip_1", GzipCompressor(level=2))])
+        self.assertIsNone(self.db.get_series_statistics("entire_file", "entropy", "gzip_1", "none", "none"))
+        self.assertStatisticsMatch("gzip_9")
+
+    def test_migration_backfills(self):
+        expected = self.db.get_all_series_statistics()[1]
+        expected_points = self.db.get_all_estimations_dataframe()[1]
+        for (trigger,) in self.db.con.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'").fetchall():
+            self.db.con.execute(f"DROP TRIGGER {trigger}")
+        self.db.con.execute("DROP TABLE series_statistics")
+        self.db.con.execute("DROP TABLE estimation_compressions")
+        self.db.con.execute("PRAGMA user_version = 2")
+        self.db.con.commit()
+        self.db.con.close()
+        self.db = BenchmarkDatabase(Path(self.dir.name) / "benchmark.sqlite")
+        self.addCleanup(self.db.con.close)
+        np.testing.assert_allclose([r[5:] for r in self.db.get_all_series_statistics()[1]],
+                                   [r[5:] for r in expected], rtol=1e-9)
+        self.assertEqual(expected_points, self.db.get_all_estimations_dataframe()[1])
+        self.test_replaced_results()
+
+    def test_series_fit_matches_polyfit(self):
+        x, y = self.points("gzip_9")
+        stats = self.db.get_series_statistics("entire_file", "entropy", "gzip_9", "none", "none")
+        for degree in (1, 2):
+            fit = series_fit(*stats, degree=degree)
+            coefficients = np.polyfit(x, y, degree)
+            residuals = y - np.polyval(coefficients, x)
+            np.testing.assert_allclose(fit.coefficients, coefficients[::-1], rtol=1e-6)
+            self.assertAlmostEqual(np.sqrt(np.mean(residuals ** 2)), fit.rmse, places=6)
+            self.assertAlmostEqual(1 - np.sum(residuals ** 2) / np.sum((y - y.mean()) ** 2), fit.r2, places=9)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+#  Copyright (C) 2025 Julian Nowaczek.
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import unittest
+
+import numpy as np
+
+from estimation_comparison.data_collection.preprocessor import StratifiedPatchSampler, StratifiedLinearSampler
+
+
+class StratifiedPatchSamplerTests(unittest.TestCase):
+    # 8x8 grid of 2x2 patches, every patch is filled with its own index
+    data = np.repeat(np.repeat(np.arange(64, dtype=np.uint8).reshape((8, 8)), 2, axis=0), 2, axis=1)[:, :, None]
+
+    def sampled_patches(self, sampler):
+        return np.unique(sampler.run(self.data))
+
+    def test_grid_quarter(self):
+        sampler = StratifiedPatchSampler(patch_dim=2, fraction=0.25)
+        # One patch from the centre of every 2x2 cell of patches
+        expected = np.asarray([row * 8 + col for row in range(1, 8, 2) for col in range(1, 8, 2)])
+        np.testing.assert_array_equal(expected, self.sampled_patches(sampler))
+
+    def test_jitter_one_patch_per_cell(self):
+        sampler = StratifiedPatchSampler(patch_dim=2, fraction=0.25, jitter=True)
+        patches = self.sampled_patches(sampler)
+        self.assertEqual(16, len(patches))
+        cells = {(p // 8 // 2, p % 8 // 2) for p in patches}
+        self.assertEqual(16, len(cells))
+
+    def test_jitter_deterministic(self):
+        sampler = StratifiedPatchSampler(patch_dim=2, fraction=0.25, jitter=True)
+        np.testing.assert_array_equal(sampler.run(self.data), sampler.run(self.data))
+
+
+class StratifiedLinearSamplerTests(unittest.TestCase):
+    data = np.repeat(np.arange(101, dtype=np.uint8), 4)
+
+    def test_grid_tenth(self):
+        sampler = StratifiedLinearSampler(patch_len=4, fraction=0.1)
+        np.testing.assert_array_equal(np.arange(5, 100, 10), np.unique(sampler.run(self.data)))
+
+    def test_jitter_one_run_per_stratum(self):
+        sampler = StratifiedLinearSampler(patch_len=4, fraction=0.1, jitter=True)
+        runs = np.unique(sampler.run(self.data))
+        np.testing.assert_array_equal(np.arange(10), runs // 10)
+
+    def test_jitter_partial_stratum_uniform(self):
+        # 25 runs in strata of 10, the last stratum only holds runs 20 to 24
+        last = np.asarray([StratifiedLinearSampler(patch_len=1, fraction=0.1, jitter=True, seed=seed)
+                           ._sample_patches((26,))[-1] for seed in range(2000)])
+        counts = np.bincount(last - 20, minlength=5)
+        self.assertEqual(5, len(counts))
+        np.testing.assert_allclose(np.full(5, 400), counts, rtol=0.2)
+
+
+if __name__ == '__main__':
+    unittest.main()
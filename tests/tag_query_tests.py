@@ -0,0 +1,154 @@
+#  Copyright (C) 2025 Julian Nowaczek.
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import itertools
+import unittest
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from estimation_comparison.database import BenchmarkDatabase
+from estimation_comparison.model import InputFile
+from tests.populated_database import PopulatedDatabaseTestCase
+
+
+class TagQueryTests(PopulatedDatabaseTestCase):
+    file_count = 40
+    tags = ["indoor", "outdoor", "people", "nature"]
+    qualities = ["unknown", "high"]
+
+    def setUp(self):
+        super().setUp()
+        self.db.con.execute("INSERT INTO image_qualities(name) VALUES ('high')")
+        self.db.con.executemany("INSERT INTO tag_types(tag_name) VALUES (?)", [(t,) for t in self.tags])
+        for i in range(self.file_count):
+            self.db.con.execute("UPDATE files SET quality_id = ? WHERE file_hash = ?", (1 + i % 2, f"h{i}"))
+            self.db.con.executemany("INSERT INTO file_tags VALUES (?, ?)",
+                                    [(f"h{i}", int(t)) for t in self.rng.choice(np.arange(1, 5), 2, replace=False)])
+        self.db.con.commit()
+
+    def input_file(self, i):
+        return InputFile(f"h{i}", "p", f"n{i:02}", 1000)
+
+    def test_multi_tag_matches_solo(self):
+        data = self.db.get_multi_tag_plot_dataframe("entire_file", "entropy", "gzip_9", self.tags[:3],
+                                                     self.qualities, columnar=True).to_pandas()
+        self.assertEqual(set(itertools.product(self.tags[:3], self.qualities)),
+                         set(data.groupby(["tag", "quality"]).groups))
+        for tag, quality in itertools.product(self.tags[:3], self.qualities):
+            expected = self.db.get_solo_tag_plot_dataframe("entire_file", "entropy", "gzip_9", tag, quality,
+                                                           columnar=True).to_pandas()
+            actual = data[(data["tag"] == tag) & (data["quality"] == quality)].drop(columns="tag")
+            pd.testing.assert_frame_equal(expected, actual.reset_index(drop=True))
+
+    def test_multi_tag_uses_tag_index(self):
+        # Enough otherwise untagged files that walking all of them loses to the tag index
+        self.db.con.executemany("INSERT INTO files (file_hash, path, name, size_bytes, quality_id) "
+                                "VALUES (?, 'p', ?, 1000, 1)",
+                                [(f"x{i}", f"x{i}") for i in range(5000)])
+        self.db.con.execute("INSERT INTO tag_types(tag_name) VALUES ('common')")
+        self.db.con.executemany("INSERT INTO file_tags VALUES (?, 5)", [(f"x{i}",) for i in range(5000)])
+        self.db.con.execute("ANALYZE")
+        sql = []
+        self.db.con.set_trace_callback(sql.append)
+        self.db.get_multi_tag_plot_dataframe("entire_file", "entropy", "gzip_9", ["indoor"], ["unknown"])
+        self.db.con.set_trace_callback(None)
+        plan = " ".join(row[3] for row in self.db.con.execute(f"EXPLAIN QUERY PLAN {sql[-1]}"))
+        self.assertIn("file_tags_tag_file", plan)
+
+    def file_tag_masks(self) -> dict:
+        masks = {}
+        for file_hash, tag_id in self.db.con.execute("SELECT file_hash, tag_id FROM file_tags WHERE tag_id <= 63"):
+            masks[file_hash] = masks.get(file_hash, 0) | 1 << (tag_id - 1)
+        return masks
+
+    def stored_tag_masks(self) -> dict:
+        return {h: m for h, m in self.db.con.execute("SELECT file_hash, tag_mask FROM files WHERE tag_mask != 0")}
+
+    def test_tag_mask_follows_file_tags(self):
+        self.assertEqual(self.file_tag_masks(), self.stored_tag_masks())
+        self.db.con.execute("DELETE FROM file_tags WHERE tag_id = 2")
+        self.db.con.execute("INSERT OR IGNORE INTO file_tags VALUES ('h0', 4)")
+        self.assertEqual(self.file_tag_masks(), self.stored_tag_masks())
+
+    def test_tag_mask_backfill(self):
+        expected = self.stored_tag_masks()
+        self.db.con.execute("UPDATE files SET tag_mask = 0")
+        self.db.con.execute("PRAGMA user_version = 6")
+        self.db.con.commit()
+        self.db = BenchmarkDatabase(Path(self.dir.name) / "benchmark.sqlite")
+        self.addCleanup(self.db.con.close)
+        self.assertEqual(expected, self.stored_tag_masks())
+
+    def test_plot_dataframe_filters(self):
+        data = self.db.get_plot_dataframe(["entire_file"], ["entropy"], ["gzip_9"], ["none"], ["none"],
+                                          self.qualities, ["indoor", "people"], columnar=True).to_pandas()
+        bits = self.db.get_tag_bits()
+        wanted = bits["indoor"] | bits["people"]
+        everything = self.db.get_plot_dataframe(["entire_file"], ["entropy"], ["gzip_9"], ["none"], ["none"],
+                                                self.qualities, columnar=True).to_pandas()
+        self.assertEqual(40, len(everything))
+        self.assertEqual(sorted(everything[(everything["tag_mask"] & wanted) != 0]["file_hash"]),
+                         sorted(data["file_hash"]))
+
+        high = self.db.get_plot_dataframe(["entire_file"], ["entropy"], ["gzip_9"], ["none"], ["none"], ["high"],
+                                          columnar=True).to_pandas()
+        self.assertEqual(20, len(high))
+
+    def test_tags_beyond_mask(self):
+        self.db.con.executemany("INSERT INTO tag_types(tag_name) VALUES (?)", [(f"extra_{i}",) for i in range(70)])
+        self.db.con.execute("INSERT INTO file_tags VALUES ('h0', 70)")
+        self.assertNotIn("extra_65", self.db.get_tag_bits())
+        data = self.db.get_plot_dataframe(["entire_file"], ["entropy"], ["gzip_9"], ["none"], ["none"],
+                                          self.qualities, ["extra_65"])[1]
+        self.assertEqual(["h0"], [row[0] for row in data])
+        solo = self.db.get_solo_tag_plot_dataframe("entire_file", "entropy", "gzip_9", "extra_65", "unknown")[1]
+        self.assertEqual(["h0"], [row[0] for row in solo])
+
+    def test_update_tags(self):
+        self.db.con.executemany("INSERT INTO files (file_hash, path, name, size_bytes, quality_id) "
+                                "VALUES (?, 'p', ?, 1000, 1)", [("r1", "RAISE/r1"), ("r2", "RAISE/r2")])
+        self.db.con.commit()
+        csv_path = Path(self.dir.name) / "tags.csv"
+        csv_path.write_text("File,Image Quality,Keywords,Tags\n"
+                            "r1,High,outdoor;,\n"
+                            "r2,Low,indoor; people;, Landmark\n"
+                            "missing,High,outdoor;,\n")
+        self.db.update_tags(csv_path)
+
+        def tags():
+            return self.db.con.execute(
+                """
+                SELECT f.file_hash, iq.name, tt.tag_name, f.tag_mask & (1 << (tt.tag_id - 1)) != 0
+                FROM file_tags ft
+                         JOIN files f USING (file_hash)
+                         JOIN tag_types tt USING (tag_id)
+                         JOIN image_qualities iq USING (quality_id)
+                WHERE f.file_hash LIKE 'r%'
+                ORDER BY 1, 3
+                """).fetchall()
+
+        expected = [("r1", "high", "outdoor", 1), ("r2", "low", "indoor", 1), ("r2", "low", "landmark", 1),
+                    ("r2", "low", "people", 1)]
+        self.assertEqual(expected, tags())
+        # Re-importing the same CSV changes nothing, not even the data revision
+        revision = self.db.get_revision()
+        self.db.update_tags(csv_path)
+        self.assertEqual(expected, tags())
+        self.assertEqual(revision, self.db.get_revision())
+
+
+if __name__ == '__main__':
+    unittest.main()